@@ -24,7 +24,7 @@ import seaborn as sns
 
 
 #Untuk kebutuhan proyek machine learning
-from sklearn.model_selection import train_test_split, GridSearchCV
+from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, LabelEncoder
 from sklearn.metrics import accuracy_score, confusion_matrix, classification_report, mean_squared_error, r2_score
 from sklearn.linear_model import LinearRegression, LogisticRegression
@@ -56,6 +56,29 @@ from lightgbm import LGBMClassifier
 from sklearn.neighbors import KNeighborsRegressor
 #Untuk ekspor data dan penyimpanan model
 import joblib
+import os
+import time
+from sklearn.base import clone
+
+# Modul bersama TUMBUH (cleaning.py, features.py, dst.) ada di root repo, satu folder
+# di atas skrip ini. Di Colab (__file__ tidak ada) upload modul-modul itu ke direktori kerja.
+import sys
+from pathlib import Path
+try:
+    ROOT_DIR = Path(__file__).resolve().parent.parent
+except NameError:
+    ROOT_DIR = Path.cwd()
+sys.path.append(str(ROOT_DIR))
+
+from cleaning import filter_outliers_iqr
+from features import ENGINEERED_FEATURES, FeatureBuilder
+from model_compare import compare_models, prepare_matrices
+from tuning import SEARCH_SPACES, tune_models
+from multi_output import MultiOutputModel, build_pipeline
+from forest_engine import FlatForest
+from lookup import load_lookup_table
+from prediction_table import PredictionTable
+from recommender import SimilarityRecommender
 
 """LOAD DATA"""
 
@@ -95,21 +118,12 @@ df["Commodity"] = df["Commodity"].astype(str).str.strip().str.title() #untuk kmo
 # mengambil kolom numerik
 numeric_features = df.select_dtypes(include=['float64','int64']).columns
 
-# membuat dataframe kosong untuk menampung hasil
-df_clean = pd.DataFrame()
-
-# Loop untuk setiap komoditas
-for komoditas, subset in df.groupby("Commodity"):
-    # Hitung IQR untuk subset (komoditas tertentu)
-    Q1 = subset[numeric_features].quantile(0.25)
-    Q3 = subset[numeric_features].quantile(0.75)
-    IQR = Q3 - Q1
-
-    mask = ~((subset[numeric_features] < (Q1 - 3 * IQR)) |
-             (subset[numeric_features] > (Q3 + 3 * IQR))).any(axis=1)
 
-
-    df_clean = pd.concat([df_clean, subset[mask]])
+# Hapus outlier IQR (3 x IQR) per komoditas dalam satu pass groupby (lihat cleaning.py);
+# group_keys bisa diperluas mis. ["Commodity", "Province"]
+df_clean, laporan_outlier = filter_outliers_iqr(df, numeric_features, group_keys=["Commodity"], multiplier=3)
+print(f"Outlier dibuang: {len(df) - len(df_clean)} dari {len(df)} baris")
+print(laporan_outlier)
 
 #Pada pengujian deployment ke aplikasi ada beberapa data leakage
 
@@ -371,27 +385,14 @@ Hal ini konsisten dengan teori production function Cobb–Douglas, di mana outpu
 # Feature Engineering
 """
 
-# Fitur Interaksi Iklim
-df_clean['Temp_Humid_Interaction'] = df_clean['Temp_C'] * df_clean['Humidity_pct']
-
-# Fitur Indeks Kesuburan Tanah
-df_clean['Soil_Fertility_Index'] = (
-    df_clean['Soil_N_index'] +
-    df_clean['Soil_P_index'] +
-    df_clean['Soil_K_index']
-) / 3
+# Keempat fitur turunan (interaksi iklim, indeks kesuburan tanah, pH kuadrat dan
+# rata-rata harga pupuk) dihitung oleh FeatureBuilder di features.py. Transformer
+# yang sama juga menjadi langkah pertama pipeline di bawah, sehingga aplikasi tidak
+# perlu (dan tidak bisa keliru) menghitung ulang fitur ini sendiri.
 
-#  Fitur Polinomial (Aman)
-df_clean['Soil_pH_sq'] = df_clean['Soil_pH']**2
+df_clean = FeatureBuilder().transform(df_clean)
 
-# Fitur Ekonomi (Aman)
-df_clean['Avg_Fertilizer_Price'] = (
-    df_clean['InputPrice_Urea_RpKg'] +
-    df_clean['InputPrice_SP36_RpKg'] +
-    df_clean['InputPrice_KCl_RpKg']
-) / 3
-
-print(f"Fitur-fitur baru berhasil dibuat: {['Temp_Humid_Interaction', 'Soil_Fertility_Index', 'Soil_pH_sq', 'Avg_Fertilizer_Price']}")
+print(f"Fitur-fitur baru berhasil dibuat: {ENGINEERED_FEATURES}")
 
 """# Data Splitting"""
 
@@ -461,48 +462,26 @@ models_to_test = {
 # Dictionary untuk menyimpan model terbaik untuk setiap target
 best_models = {}
 
-# Loop untuk setiap target prediksi
+# Preprocessing di-fit sekali untuk split ini dan hasilnya dipakai bersama (read-only)
+# oleh semua model & target; setiap (model, target) dilatih paralel di pool proses.
+
+waktu_mulai = time.perf_counter()
+Xt_train, Xt_test, _ = prepare_matrices(preprocessor, X_train, X_test)
+comparison_all = compare_models(models_to_test, Xt_train, Xt_test, y_train, y_test, target_cols)
+print(f"Perbandingan {len(comparison_all)} (model, target) selesai dalam {time.perf_counter() - waktu_mulai:.1f} s")
+
 for target_col in target_cols:
     print("-" * 50)
     print(f"Memproses Target: {target_col}")
-    results = []
-
-    # Loop untuk setiap model dalam kamus
-    for name, model in models_to_test.items():
-        pipeline = Pipeline(steps=[
-            ('preprocessor', preprocessor),
-            ('model', model)
-        ])
-
 
-        #  Ambil target yang sesuai dari y_train
-        y_train_target = y_train[target_col]
-
-        # melatih pipeline dengan data training
-        pipeline.fit(X_train, y_train_target)
-
-
-        # Setelah dilatih, baru lakukan prediksi
-        y_pred = pipeline.predict(X_test)
-
-        # Evaluasi terhadap y_test yang sesuai
-        r2 = r2_score(y_test[target_col], y_pred)
-        rmse = np.sqrt(mean_squared_error(y_test[target_col], y_pred))
-
-        results.append({
-            "Model": name,
-            "R2_Score": r2,
-            "RMSE": rmse,
-        })
-
-    # Tampilkan tabel perbandingan
-    comparison_df = pd.DataFrame(results).sort_values(by="R2_Score", ascending=False).reset_index(drop=True)
+    # Tampilkan tabel perbandingan (R2, RMSE, waktu fit, latensi prediksi, ukuran model)
+    comparison_df = comparison_all[comparison_all["Target"] == target_col].drop(columns="Target").reset_index(drop=True)
     print("Tabel Perbandingan Model:")
     print(comparison_df.to_string())
 
-    # MEMILIH DAN MENYIMPAN MODEL TERBAIK (Kode ini sudah benar)
+    # MEMILIH DAN MENYIMPAN MODEL TERBAIK
     best_model_name = comparison_df.loc[0, "Model"]
-    best_model_obj = models_to_test[best_model_name]
+    best_models[target_col] = models_to_test[best_model_name]
 
     print(f"\nModel terbaik untuk '{target_col}' adalah: {best_model_name}")
 
@@ -537,13 +516,48 @@ preprocessor = ColumnTransformer(
     ])
 print("Preprocessor berhasil dibuat.")
 
+"""# Tuning Hyperparameter (successive halving)"""
+
+# Konfigurasi acak RandomForest dilatih dengan sedikit pohon, dan hanya 1/3 terbaik
+# per target yang lanjut dengan pohon 3x lebih banyak; trial berjalan paralel dalam
+# anggaran waktu & memori di bawah. Matriks dibuat dari split, FeatureBuilder dan
+# preprocessor final di atas, jadi yang dinilai sama dengan pipeline yang disimpan.
+# Pemenang tuning hanya dipakai jika R2 validasinya mengalahkan RandomForest default
+# (100 pohon) yang sekarang dipakai; data test hanya untuk laporan. Pencarian
+# dibatasi ke RandomForest karena requirements.txt aplikasi hanya memuat
+# scikit-learn (pipeline XGBoost/LightGBM tidak bisa dimuat aplikasi).
+
+MODE_TUNING = True
+TUNING_TIME_BUDGET = 15 * 60   # detik, untuk tahap pencarian
+TUNING_MEMORY_MB = 8000        # total untuk semua worker
+
+tuned_models = {}
+if MODE_TUNING:
+    Xf_train, Xf_test, _ = prepare_matrices(preprocessor, X_train, X_test)
+    tuning_summary, tuned_models, tuning_history = tune_models(
+        Xf_train, Xf_test, y_train_all, y_test_all, prediction_targets,
+        spaces={"Random Forest": SEARCH_SPACES["Random Forest"]},
+        time_budget=TUNING_TIME_BUDGET, memory_budget_mb=TUNING_MEMORY_MB,
+        baseline=RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1),
+    )
+    print("Konfigurasi terbaik per target (dipilih dengan R2 validasi; metrik lain di data test, latensi tanpa preprocessing):")
+    print(tuning_summary.to_string())
+
 # Loop untuk Melatih dan Menyimpan Setiap Model
+final_pipelines = {}
+waktu_mulai = time.perf_counter()
 for target_col in prediction_targets:
     print(f"Memulai pelatihan untuk target: {target_col}...")
 
+    # Model pilihan tuning (hasil tuning atau RandomForest default, lihat kolom Dipakai)
+    model_final = RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1)
+    if target_col in tuned_models:
+        model_final = clone(tuned_models[target_col])
+
     final_pipeline = Pipeline(steps=[
+        ('features', FeatureBuilder()),
         ('preprocessor', preprocessor),
-        ('model', RandomForestRegressor(n_estimators=100, random_state=42, n_jobs=-1))
+        ('model', model_final)
     ])
 
     y_train_target = y_train_all[target_col]
@@ -554,83 +568,81 @@ for target_col in prediction_targets:
     file_name = f'pipeline_{target_col}_final.pkl'
     joblib.dump(final_pipeline, file_name)
     print(f"Pipeline baru berhasil disimpan sebagai: '{file_name}'")
+    if target_col == "Production_KgHa":
+        # Versi terkompilasi (forest_engine.py) yang dipakai aplikasi & service.py jika
+        # ada di S3 (MODEL_FILES["production_forest"]); unggah bersama file .pkl
+        FlatForest.from_pipeline(final_pipeline).save(f'pipeline_{target_col}_final.forest')
+    final_pipelines[target_col] = final_pipeline
 
-
+waktu_terpisah = time.perf_counter() - waktu_mulai
 print("Semua model prediksi telah berhasil dilatih ulang dan disimpan!")
 
-"""# Model Klasifikasi"""
-
-#Mendefinisikan Model Rekomendeasi
-
-
-class SimilarityRecommender:
-
-    def __init__(self):
-        self.dataset = None
-        self.is_fitted = False
-
-    def fit(self, df):
-
-        # Menyimpan salinan data yang bersih dan relevan
-        required_cols = [
-            'Commodity', 'Province', 'Soil_pH', 'Temp_C',
-            'Pupuk_Urea_kgHa', 'Pupuk_SP36_kgHa', 'Pupuk_KCl_kgHa'
-        ]
-
-        # Pastikan semua kolom yang dibutuhkan ada
-        if not all(col in df.columns for col in required_cols):
-            raise ValueError(f"DataFrame harus memiliki kolom: {', '.join(required_cols)}")
-
-        self.dataset = df[required_cols].copy()
-        self.is_fitted = True
-        print("Model SimilarityRecommender berhasil 'dilatih' (mengingat data historis).")
-        return self
-
-    def recommend(self, commodity, province, soil_ph, temp_c):
-
-        if not self.is_fitted:
-            raise RuntimeError("Model harus di-'fit' terlebih dahulu dengan data sebelum memberikan rekomendasi.")
-
-        # 1. Filter data berdasarkan input kategori yang sama persis
-        filter_awal = self.dataset[
-            (self.dataset['Commodity'] == commodity) &
-            (self.dataset['Province'] == province)
-        ]
-
-        if filter_awal.empty:
-            return {"status": "error", "message": f"Tidak ada data historis untuk '{commodity}' di provinsi '{province}'."}
+"""# Model Multi-Output (satu forest untuk tiga target)"""
+
+# Ketiga target memakai preprocessor dan fitur yang sama, jadi cukup satu forest
+# multi-output: dilatih sekali, disimpan sebagai satu file, dan predict_all()
+# menghasilkan ketiga target dari satu penelusuran pohon.
+# Catatan: aplikasi, service.py dan batch_score.py hanya memakai target produksi
+# (pipeline_Production_KgHa_final.forest/.pkl dan tabel prediksi); file multi-output
+# di bawah hanya untuk perbandingan dan belum perlu diunggah ke S3.
+
+MODE_MULTI_OUTPUT = True
+
+if MODE_MULTI_OUTPUT:
+    waktu_mulai = time.perf_counter()
+    model_multi = MultiOutputModel(build_pipeline(clone(preprocessor)), targets=prediction_targets)
+    model_multi.fit(X_train, y_train_all)
+    waktu_multi = time.perf_counter() - waktu_mulai
+
+    file_multi = 'pipeline_multi_output_final.pkl'
+    joblib.dump(model_multi, file_multi)
+    # Versi terkompilasi (lihat forest_engine.py) untuk prediksi cepat di aplikasi
+    FlatForest.from_pipeline(model_multi.pipeline, output_names=prediction_targets).save('pipeline_multi_output_final.forest')
+
+    ukuran_terpisah = sum(os.path.getsize(f'pipeline_{t}_final.pkl') for t in prediction_targets)
+    ukuran_multi = os.path.getsize(file_multi)
+    print(f"Waktu training : terpisah {waktu_terpisah:.1f} s, multi-output {waktu_multi:.1f} s")
+    print(f"Ukuran artefak : terpisah {ukuran_terpisah / 1e6:.1f} MB, multi-output {ukuran_multi / 1e6:.1f} MB")
+
+    # Perbandingan akurasi per target: model terpisah vs multi-output
+    y_pred_multi = model_multi.predict_all(X_test)
+    hasil_perbandingan = []
+    for target_col in prediction_targets:
+        y_pred_terpisah = final_pipelines[target_col].predict(X_test)
+        hasil_perbandingan.append({
+            "Target": target_col,
+            "R2_Terpisah": r2_score(y_test_all[target_col], y_pred_terpisah),
+            "R2_MultiOutput": r2_score(y_test_all[target_col], y_pred_multi[target_col]),
+            "RMSE_Terpisah": np.sqrt(mean_squared_error(y_test_all[target_col], y_pred_terpisah)),
+            "RMSE_MultiOutput": np.sqrt(mean_squared_error(y_test_all[target_col], y_pred_multi[target_col])),
+        })
+    print("Perbandingan Akurasi per Target:")
+    print(pd.DataFrame(hasil_perbandingan).to_string())
 
-        # Filter lebih lanjut berdasarkan rentang kemiripan numerik
-        ph_min, ph_max = soil_ph - 0.5, soil_ph + 0.5
-        temp_min, temp_max = temp_c - 2, temp_c + 2
+"""# Tabel Prediksi Produksi (lookup x grid luas lahan)"""
 
-        filter_lanjutan = filter_awal[
-            (filter_awal['Soil_pH'].between(ph_min, ph_max)) &
-            (filter_awal['Temp_C'].between(temp_min, temp_max))
-        ]
+# Aplikasi hanya mengirim baris lookup_tabel.csv + luas lahan ke model production,
+# jadi semua prediksinya bisa dihitung di sini. Unggah file .tbl ke S3; aplikasi
+# menjawab dengan interpolasi dan baru memuat pipeline untuk luas di luar grid.
+lookup_tabel = load_lookup_table(ROOT_DIR / "lookup_tabel.csv")
 
-        # menentukan dataset mana yang akan digunakan
-        final_df = filter_lanjutan if not filter_lanjutan.empty else filter_awal
-        source_data = "data yang sangat mirip" if not filter_lanjutan.empty else "data provinsi secara umum"
+tabel_prediksi = PredictionTable.build(final_pipelines["Production_KgHa"], lookup_tabel)
+tabel_prediksi.save('tabel_prediksi_produksi.tbl')
+print(f"Tabel prediksi: {tabel_prediksi.values.shape[0]} baris x {tabel_prediksi.values.shape[1]} titik grid")
+print("Galat interpolasi terhadap model (kg/ha):", tabel_prediksi.report)
 
-        # Menghitung dosis pupuk (median lebih aman dari outlier)
-        rekomendasi = {
-            'urea_kg_ha': final_df['Pupuk_Urea_kgHa'].median(),
-            'sp36_kg_ha': final_df['Pupuk_SP36_kgHa'].median(),
-            'kcl_kg_ha': final_df['Pupuk_KCl_kgHa'].median()
-        }
+"""# Model Klasifikasi"""
 
-        return {
-            "status": "success",
-            "rekomendasi": rekomendasi,
-            "sumber_data": f"Berdasarkan {len(final_df)} petani dengan {source_data}."
-        }
+#Mendefinisikan Model Rekomendeasi
+# Class SimilarityRecommender sekarang ada di recommender.py (root repo) dan dipakai
+# bersama dengan app.py.
 
 # Inisialisasi model
 model_rekomendasi_benar = SimilarityRecommender()
 
 # Latih model dengan data bersih Anda
 model_rekomendasi_benar.fit(df_clean)
+print("Model SimilarityRecommender berhasil 'dilatih' (mengingat data historis).")
 
 # Simpan dengan NAMA FILE YANG BENAR
 # Ini akan menimpa file lama Anda yang salah
@@ -639,3 +651,31 @@ joblib.dump(model_rekomendasi_benar, nama_file_rekom)
 
 print(f"Model SimilarityRecommender BERHASIL disimpan sebagai: '{nama_file_rekom}'")
 
+# Simpan juga dalam format kolomnar (tanpa pickle) yang dipakai app.py.
+# File ini yang diunggah ke S3; bisa di-memory-map sehingga cepat dimuat.
+nama_file_rekom_bin = 'model_rekomendasi_pupuk.bin'
+model_rekomendasi_benar.save(nama_file_rekom_bin)
+print(f"Model SimilarityRecommender juga disimpan sebagai: '{nama_file_rekom_bin}'")
+
+
+# Varian k-NN: median berbobot jarak dari 50 petani terdekat per komoditas
+# (pH, suhu, curah hujan, kelembapan), tanpa fallback ke data provinsi.
+# Untuk memakainya di app.py, unggah file ini ke S3 sebagai model_rekomendasi_pupuk.bin.
+model_rekomendasi_knn = SimilarityRecommender(
+    mode="knn", n_neighbors=50,
+    knn_features=('Soil_pH', 'Temp_C', 'Rain_mm', 'Humidity_pct')
+)
+model_rekomendasi_knn.fit(df_clean)
+model_rekomendasi_knn.save('model_rekomendasi_pupuk_knn.bin')
+print("Model SimilarityRecommender (k-NN) disimpan sebagai: 'model_rekomendasi_pupuk_knn.bin'")
+
+"""# Pembaruan Data Mingguan (tanpa training ulang)"""
+
+# Data petani baru cukup ditambahkan ke artefak yang sudah ada. Baris baru disimpan
+# di file delta kecil (model_rekomendasi_pupuk.bin.delta); unggah file ini ke S3 di
+# samping artefak utama, aplikasi mengunduhnya lewat cache model dan menerapkannya
+# saat memuat recommender. Delta terikat ke hash artefak dasar: setelah .bin dibuat
+# ulang, delta lama diabaikan, jadi hapus/ganti juga file delta di S3.
+# df_baru = pd.read_csv("data_petani_baru.csv")
+# model_mingguan = SimilarityRecommender.load('model_rekomendasi_pupuk.bin')
+# model_mingguan.partial_fit(df_baru, delta_path='model_rekomendasi_pupuk.bin.delta')
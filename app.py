@@ -2,73 +2,23 @@
 
 import streamlit as st
 import pandas as pd
-import joblib
-import requests  
-import os       
-import pandas as pd
-import datetime
-import streamlit as st
-from streamlit_gsheets import GSheetsConnection
+import os
+import json
+import numpy as np
 
 
 # MENDEFINISI CLASS MODEL REKOMENDASI
+# Model rekomendasi dimuat dari format kolomnar (.bin) lewat SimilarityRecommender.load.
+# Class tetap di-import ke namespace ini agar pickle lama (__main__.SimilarityRecommender)
+# masih bisa dimuat oleh joblib.
 
-class SimilarityRecommender:
-    def __init__(self):
-        self.dataset = None
-        self.is_fitted = False
-
-    def fit(self, df):
-        
-        required_cols = [
-            'Commodity', 'Province', 'Soil_pH', 'Temp_C',
-            'Pupuk_Urea_kgHa', 'Pupuk_SP36_kgHa', 'Pupuk_KCl_kgHa'
-        ]
-        
-        # Memastikan semua kolom yang dibutuhkan ada
-        if not all(col in df.columns for col in required_cols):
-            raise ValueError(f"DataFrame harus memiliki kolom: {', '.join(required_cols)}")
-            
-        self.dataset = df[required_cols].copy()
-        self.is_fitted = True
-        
-        return self
-
-    def recommend(self, commodity, province, soil_ph, temp_c):
-        
-        if not self.is_fitted:
-            raise RuntimeError("Model harus di-'fit' terlebih dahulu dengan data sebelum memberikan rekomendasi.")
-
-        filter_awal = self.dataset[
-            (self.dataset['Commodity'] == commodity) & 
-            (self.dataset['Province'] == province)
-        ]
-
-        if filter_awal.empty:
-            return {"status": "error", "message": f"Tidak ada data historis untuk '{commodity}' di provinsi '{province}'."}
-
-        ph_min, ph_max = soil_ph - 0.5, soil_ph + 0.5
-        temp_min, temp_max = temp_c - 2, temp_c + 2
-
-        filter_lanjutan = filter_awal[
-            (filter_awal['Soil_pH'].between(ph_min, ph_max)) &
-            (filter_awal['Temp_C'].between(temp_min, temp_max))
-        ]
-
-        final_df = filter_lanjutan if not filter_lanjutan.empty else filter_awal
-        source_data = "data yang sangat mirip" if not filter_lanjutan.empty else "data provinsi secara umum"
-
-        rekomendasi = {
-            'urea_kg_ha': final_df['Pupuk_Urea_kgHa'].median(),
-            'sp36_kg_ha': final_df['Pupuk_SP36_kgHa'].median(),
-            'kcl_kg_ha': final_df['Pupuk_KCl_kgHa'].median()
-        }
-        
-        return {
-            "status": "success",
-            "rekomendasi": rekomendasi,
-            "sumber_data": f"Berdasarkan {len(final_df)} petani dengan {source_data}."
-        }
+from recommender import SimilarityRecommender  # noqa: F401
+from model_store import CACHE_DIR, ModelDownloadError, ModelRegistry, format_timings
+from lookup import FALLBACK_DEFAULTS, LookupIndex, input_frame, input_row, load_lookup_table
+from feedback import FeedbackFeed, make_source
+from prediction_memo import PredictionMemo
+from scenario import MODAL_AWAL, PERAWATAN, SELLING_PRICES, run_scenarios
+from scenario import scale_factor as hitung_scale_factor
 
 
 
@@ -79,75 +29,106 @@ st.set_page_config(page_title="TUMBUH - Prediksi & Rekomendasi Pertanian",
                    page_icon="🌿", layout="wide")
 
 
-S3_BASE_URL = "https://capstone-proyek-tumbuh-2025.s3.ap-southeast-2.amazonaws.com/" 
-
-# Daftar nama file model Anda yang ada di S3
-MODEL_FILES = {
-    "production": "pipeline_Production_KgHa_final.pkl",
-    "capital": "pipeline_Init_Capital_RpHa_final.pkl",
-    "maintenance": "pipeline_Maintenance_Cost_RpHa_final.pkl",
-    "recommender": "model_rekomendasi_pupuk.pkl" # Pastikan nama ini sama persis
-}
+# Model yang benar-benar dipakai halaman ini. "capital" & "maintenance" tetap
+# terdaftar di registry, tetapi baru diunduh jika suatu saat diakses. Prediksi
+# produksi diambil dari tabel prediksi; model produksi (versi terkompilasi
+# "production_forest", atau pipeline "production" jika belum ada) hanya dipakai jika
+# kombinasi/luas lahan tidak ada di tabel.
+USED_MODELS = ["recommender"]
 
-def download_file_from_s3(file_name):
-    """Mengunduh file dari S3 jika belum ada secara lokal."""
-    url = S3_BASE_URL + file_name
-    local_path = file_name  
-
-    if not os.path.exists(local_path):
-        with st.spinner(f"Mengunduh model {file_name}... (hanya pertama kali)"):
-            try:
-                with requests.get(url, stream=True) as r:
-                    r.raise_for_status() 
-                    with open(local_path, 'wb') as f:
-                        for chunk in r.iter_content(chunk_size=8192):
-                            f.write(chunk)
-            except requests.exceptions.RequestException as e:
-                st.error(f"Gagal mengunduh {file_name} dari S3. Cek URL dan Izin S3. Error: {e}")
-                st.stop()
-    return local_path
 
 @st.cache_resource
 def load_models():
     """
-    Mengunduh semua model dari S3 (jika perlu) dan memuatnya ke memori.
+    Membuat registry model (lihat ModelRegistry di model_store.py) yang dipakai
+    bersama oleh semua sesi, lalu memuat model yang dipakai halaman ini secara
+    paralel. Model yang sudah ada di cache lokal hanya direvalidasi ke S3 (ETag),
+    tidak diunduh ulang.
     """
     try:
-        models = {}
-        for key, file_name in MODEL_FILES.items():
-            # 1. Unduh file (jika belum ada)
-            model_path = download_file_from_s3(file_name)
-            # 2. Muat model dari file lokal yang sudah diunduh
-            models[key] = joblib.load(model_path)
-            
-        return models
+        with st.spinner("Mengunduh & memuat model... (unduhan hanya jika model berubah)"):
+            return ModelRegistry().preload(USED_MODELS)
+    except ModelDownloadError as e:
+        st.error(f"Gagal mengunduh {e.file_name} dari S3. Cek URL dan Izin S3. Error: {e.cause}")
+        st.stop()
     except Exception as e:
-        # Menangkap error jika file .pkl korup atau class-nya tidak terdefinisi
-        st.error(f"Gagal memuat model dari file: {e}. Pastikan definisi class 'SimilarityRecommender' ada di atas.")
+        # Artefak di cache rusak atau dibuat dengan versi kode/library yang berbeda
+        st.error(f"Gagal memuat model dari cache lokal ({CACHE_DIR}): {e}. Artefak mungkin rusak atau "
+                 "dibuat dengan versi recommender.py/scikit-learn yang berbeda; hapus cache lalu muat ulang.")
         st.stop()
 
 # Memulai proses load model
 models = load_models()
-st.success("Semua model berhasil dimuat dari AWS S3! 🚀")
+MODEL_SOURCES = {
+    "downloaded": "diunduh dari AWS S3", "resumed": "diunduh dari AWS S3",
+    "hit": "dari cache lokal (masih sama dengan S3)", "offline": "dari cache lokal (S3 tidak terjangkau)",
+    "local": "dari file lokal",
+}
+sumber_model = ", ".join(
+    f"{key} {MODEL_SOURCES.get(t['status'], t['status'])}" for key, t in models.timings().items()
+)
+if any(t["status"] == "offline" for t in models.timings().values()):
+    st.warning(f"Model dimuat tanpa koneksi ke S3: {sumber_model}. Versi terbaru belum bisa dicek.")
+else:
+    st.success(f"Model siap ({sumber_model}); model lain dimuat saat dibutuhkan. 🚀")
+st.caption(f"⏱️ {format_timings(models.timings())}")
+
+with st.expander("🩺 Diagnostik Model"):
+    # Model dimuat saat pertama dipakai; model yang belum dimuat bernilai 0
+    laporan_memori = pd.DataFrame.from_dict(models.memory_report(), orient="index")
+    laporan_memori["file_bytes"] /= 1e6
+    laporan_memori["memory_bytes"] /= 1e6
+    st.dataframe(laporan_memori.rename(columns={
+        "loaded": "Dimuat", "file_bytes": "File (MB)", "memory_bytes": "RAM (MB)", "load_s": "Waktu Muat (s)",
+    }), use_container_width=True)
+
+
+@st.cache_resource
+def load_prediction_table():
+    """Tabel prediksi produksi (lihat prediction_table.py); None jika belum ada di S3."""
+    try:
+        return models["production_table"]
+    except Exception:
+        return None
+
+prediction_table = load_prediction_table()
+
+
+@st.cache_resource
+def load_production_forest():
+    """
+    Model produksi hasil kompilasi forest_engine.py (.forest); None jika belum ada di
+    S3, sehingga pipeline "production" (.pkl) yang dipakai.
+    """
+    try:
+        return models["production_forest"]
+    except Exception:
+        return None
+
+production_forest = load_production_forest()
+
+
+def production_model():
+    """FlatForest jika tersedia; selain itu pipeline "production" (dimuat saat pertama dipakai)."""
+    return production_forest if production_forest is not None else models["production"]
 
 
 
 #  LOAD DATA REFERENSI (LOOKUP TABLE)
 
 
-@st.cache_data
+# Indeks province -> district -> commodity -> record dibangun sekali per proses
+# (cache_resource, tidak di-copy tiap rerun); widget cukup membaca dict terurut.
+@st.cache_resource
 def load_lookup():
     # PENTING: Pastikan file "lookup_tabel.csv" Anda push ke GitHub
     try:
-        lookup = pd.read_csv("lookup_tabel.csv")
-        for col in ["Province", "District", "Commodity"]:
-            lookup[col] = lookup[col].astype(str).str.strip().str.title()
-        return lookup
+        return LookupIndex(load_lookup_table("lookup_tabel.csv"))
     except Exception as e:
         st.warning(f" Gagal memuat lookup_tabel.csv: {e}")
-        return pd.DataFrame()
+        return None
 
-lookup_df = load_lookup()
+lookup_index = load_lookup()
 
 
 #  JUDUL APLIKASI
@@ -162,22 +143,19 @@ st.divider()
 
 #  INPUT DARI PENGGUNA
 
-if lookup_df.empty:
+if not lookup_index:
     st.error("Lookup table tidak ditemukan. Aplikasi tidak dapat berjalan tanpa file lookup_tabel.csv.")
     st.stop()
 
 st.subheader("1. Masukkan Informasi Lahan Anda")
 col1, col2, col3 = st.columns(3)
 with col1:
-    province = st.selectbox("Pilih Provinsi", sorted(lookup_df["Province"].unique()))
+    province = st.selectbox("Pilih Provinsi", lookup_index.provinces())
 with col2:
-    district_options = sorted(lookup_df[lookup_df["Province"] == province]["District"].unique())
+    district_options = lookup_index.districts(province)
     district = st.selectbox("Pilih Kota/Kabupaten", district_options)
 with col3:
-    commodity_options = sorted(lookup_df[
-        (lookup_df["Province"] == province) &
-        (lookup_df["District"] == district)
-    ]["Commodity"].unique())
+    commodity_options = lookup_index.commodities(province, district)
     
     # Handle jika tidak ada komoditas
     if not commodity_options:
@@ -193,54 +171,67 @@ area = st.number_input("Masukkan Luas Lahan (dalam Hektar)", min_value=0.1, max_
 #  AMBIL DATA OTOMATIS DARI LOOKUP
 
 
-row = lookup_df[
-    (lookup_df["Province"] == province) &
-    (lookup_df["District"] == district) &
-    (lookup_df["Commodity"] == commodity)
-]
+defaults = lookup_index.record(province, district, commodity)
 
-if row.empty:
+if defaults is None:
     st.warning("⚠️ Data referensi untuk kombinasi ini tidak ditemukan. Menggunakan nilai default.")
-    defaults = {
-        "Rain_mm": 2000, "Temp_C": 27, "Humidity_pct": 80, "Soil_pH": 6.5,
-        "Soil_N_index": 3, "Soil_P_index": 3, "Soil_K_index": 3,
-        "InputPrice_Urea_RpKg": 7000, "InputPrice_SP36_RpKg": 8000, "InputPrice_KCl_RpKg": 9000,
-        "Year": 2024
-    }
-else:
-    defaults = row.iloc[0].to_dict()
+    defaults = FALLBACK_DEFAULTS
+
 
 
+#  MEMO HASIL PREDIKSI
 
-#  MENYIAPKAN DATA UNTUK MODEL PREDIKSI
 
+# Hasil prediksi + rekomendasi untuk input yang sama dipakai ulang lintas rerun dan
+# sesi (LRU), dan disimpan ke disk agar tetap ada setelah restart. Set
+# TUMBUH_PREDICTION_MEMO="" untuk mematikan penyimpanan ke disk.
+MEMO_PATH = os.environ.get("TUMBUH_PREDICTION_MEMO", os.path.join(CACHE_DIR, "prediction_memo.json")) or None
 
-input_data_prediksi = pd.DataFrame({
-    "Province": [province], "District": [district], "Commodity": [commodity],
-    "Rain_mm": [defaults["Rain_mm"]], "Temp_C": [defaults["Temp_C"]],
-    "Humidity_pct": [defaults["Humidity_pct"]], "Soil_pH": [defaults["Soil_pH"]],
-    "Soil_N_index": [defaults["Soil_N_index"]], "Soil_P_index": [defaults["Soil_P_index"]],
-    "Soil_K_index": [defaults["Soil_K_index"]], "Area_Ha": [area],
-    "InputPrice_Urea_RpKg": [defaults.get("InputPrice_Urea_RpKg", 7000)],
-    "InputPrice_SP36_RpKg": [defaults.get("InputPrice_SP36_RpKg", 8000)],
-    "InputPrice_KCl_RpKg": [defaults.get("InputPrice_KCl_RpKg", 9000)],
-    "Year": [defaults.get("Year", 2024)]
-})
+def memo_version():
+    """
+    Versi model yang benar-benar menghasilkan prediksi + mtime lookup; None selama
+    salah satunya belum diunduh (pipeline "production" dimuat saat pertama dipakai).
+    """
+    keys = ["recommender", "production_forest" if production_forest is not None else "production"]
+    if prediction_table is not None:
+        keys.append("production_table")
+    version = [models.version(key) for key in keys]
+    if None in version:
+        return None
+    version.append(os.path.getmtime("lookup_tabel.csv") if os.path.exists("lookup_tabel.csv") else None)
+    return json.dumps(version)
 
 
-# Membuat fitur
-input_data_prediksi['Temp_Humid_Interaction'] = input_data_prediksi['Temp_C'] * input_data_prediksi['Humidity_pct']
-input_data_prediksi['Soil_Fertility_Index'] = (
-    input_data_prediksi['Soil_N_index'] + 
-    input_data_prediksi['Soil_P_index'] + 
-    input_data_prediksi['Soil_K_index']
-) / 3
-input_data_prediksi['Soil_pH_sq'] = input_data_prediksi['Soil_pH']**2
-input_data_prediksi['Avg_Fertilizer_Price'] = (
-    input_data_prediksi['InputPrice_Urea_RpKg'] + 
-    input_data_prediksi['InputPrice_SP36_RpKg'] + 
-    input_data_prediksi['InputPrice_KCl_RpKg']
-) / 3
+@st.cache_resource
+def load_prediction_memo():
+    # Memo dari versi model/lookup lain tidak dipakai
+    return PredictionMemo(path=MEMO_PATH, version=memo_version())
+
+prediction_memo = load_prediction_memo()
+
+
+def hitung_prediksi(area):
+    # Hanya dijalankan jika input ini belum ada di memo; area sudah dibulatkan seperti kunci memo.
+    # Interpolasi dari tabel prediksi; model hanya dipakai di luar tabel
+    prod = None
+    if prediction_table is not None:
+        prod = prediction_table.lookup(province, district, commodity, area)
+    if prod is None:
+        # Fitur turunan (Temp_Humid_Interaction, Soil_Fertility_Index, Soil_pH_sq,
+        # Avg_Fertilizer_Price) dihitung dengan kode yang sama seperti saat training
+        # (features.py). FlatForest menerima record dict langsung, tanpa DataFrame.
+        input_data_prediksi = input_row(province, district, commodity, area, defaults)
+        if production_forest is not None:
+            prod = production_forest.predict([input_data_prediksi])[0]
+        else:
+            prod = models["production"].predict(input_frame([input_data_prediksi]))[0]
+
+    hasil_rekom = models["recommender"].recommend(
+        commodity=commodity, province=province,
+        soil_ph=defaults["Soil_pH"], temp_c=defaults["Temp_C"],
+        rain_mm=defaults["Rain_mm"], humidity_pct=defaults["Humidity_pct"]
+    )
+    return {"prod": float(prod), "rekomendasi": hasil_rekom}
 
 
     
@@ -253,44 +244,21 @@ if st.button("🚀 Buat Prediksi dan Rekomendasi", type="primary", use_container
     else:
         with st.spinner("⏳ Model sedang menganalisis data..."):
             
-            # ---  PREDIKSI HASIL PANEN 
-            prod = models["production"].predict(input_data_prediksi)[0]
+            # ---  PREDIKSI HASIL PANEN & REKOMENDASI PUPUK (dari memo jika sudah pernah dihitung)
+            hasil = prediction_memo.get_or_compute(province, district, commodity, area, hitung_prediksi)
+            prediction_memo.set_version(memo_version())
+            prod = hasil["prod"]
+            hasil_rekom = hasil["rekomendasi"]
             
             # ---  PREDIKSI BIAYA 
             # cap = models["capital"].predict(input_data_prediksi)[0]     # <-- DIHAPUS
             # maint = models["maintenance"].predict(input_data_prediksi)[0] # <-- DIHAPUS
-
-            # --- REKOMENDASI PUPUK ---
-            hasil_rekom = models["recommender"].recommend(
-                commodity=commodity, province=province,
-                soil_ph=defaults["Soil_pH"], temp_c=defaults["Temp_C"]
-            )
             
 
-            # --- Definisi biaya dasar per hektar (Rp) ---
-            modal_awal_dict = {
-                "Pengolahan Lahan (bajak, garu)": 1500000,
-                "Pembelian Benih/Bibit Unggul": 800000,
-                "Pupuk Dasar (sebelum tanam)": 1000000,
-                "Sewa Lahan (jika menyewa)": 3000000,
-                "Peralatan Kecil (cangkul, semprotan, dll.)": 500000
-            }
-
-            perawatan_dict = {
-                "Pupuk Susulan (Urea, SP-36, KCl)": 1800000,
-                "Pestisida/Herbisida (pengendalian hama/gulma)": 800000,
-                "Tenaga Kerja (tanam, pemeliharaan, panen)": 4000000,
-                "Biaya Pengairan/Irigasi": 600000,
-                "Perbaikan Peralatan": 300000
-            }
-
-            # --- Logika skala ekonomi ---
-            if area <= 2:
-                scale_factor = 1.0
-            elif area <= 10:
-                scale_factor = 0.95
-            else:
-                scale_factor = 0.85 
+            # --- Biaya dasar per hektar (Rp) & faktor skala ekonomi (lihat scenario.py) ---
+            modal_awal_dict = MODAL_AWAL
+            perawatan_dict = PERAWATAN
+            scale_factor = float(hitung_scale_factor(area))
 
             # --- Hitung total biaya ---
             total_modal_calc = sum(modal_awal_dict.values()) * area * scale_factor
@@ -305,6 +273,8 @@ if st.button("🚀 Buat Prediksi dan Rekomendasi", type="primary", use_container
         #  TAMPILKAN HASIL (BAGIAN INI DIUBAH)
     
         st.success(" Analisis Selesai!")
+        memo_info = prediction_memo.info()
+        st.caption(f"⚡ Memo prediksi: hit rate {memo_info['hit_rate']:.0%} ({memo_info['size']} entri)")
         
         col1, col2 = st.columns(2)
         with col1:
@@ -371,6 +341,53 @@ else:
 
 
 
+#  SIMULASI SKENARIO (WHAT-IF)
+
+
+with st.expander("🔮 Simulasi Skenario: Luas Lahan x Tahun x Harga Pupuk"):
+    st.caption(
+        "Semua skenario dihitung sekaligus dalam satu pemanggilan model, "
+        "untuk lokasi dan komoditas yang dipilih di atas."
+    )
+    sc1, sc2, sc3 = st.columns(3)
+    with sc1:
+        area_range = st.slider("Rentang Luas Lahan (Ha)", 0.1, 200.0, (0.5, 20.0), step=0.1)
+        n_area = st.number_input("Jumlah Titik Luas Lahan", min_value=2, max_value=100, value=20, step=1)
+    with sc2:
+        tahun_skenario = st.multiselect("Tahun Proyeksi", list(range(2024, 2031)), default=[2024, 2026, 2028])
+        harga_jual = st.number_input(
+            "Harga Jual (Rp/Kg)", min_value=0, value=SELLING_PRICES.get(commodity, 5000), step=100
+        )
+    with sc3:
+        pengali_harga = st.multiselect(
+            "Pengali Harga Pupuk", [0.8, 0.9, 1.0, 1.1, 1.2, 1.5], default=[0.8, 1.0, 1.2]
+        )
+
+    if st.button("📊 Jalankan Simulasi", key="tombol_skenario"):
+        if commodity == "- (Tidak ada data) -" or not tahun_skenario or not pengali_harga:
+            st.error("Pilih komoditas yang valid, minimal satu tahun dan satu pengali harga pupuk.")
+        else:
+            with st.spinner("⏳ Menghitung skenario..."):
+                skenario = run_scenarios(
+                    production_model(), province, district, commodity, defaults,
+                    areas=np.linspace(area_range[0], area_range[1], int(n_area)),
+                    years=tahun_skenario, price_multipliers=pengali_harga, selling_price=harga_jual,
+                )
+            terbaik = skenario.loc[skenario["Margin_Rp"].idxmax()]
+            st.success(
+                f"{len(skenario):,} skenario dihitung. Margin tertinggi Rp {terbaik['Margin_Rp']:,.0f} "
+                f"pada {terbaik['Area_Ha']:.1f} ha, tahun {terbaik['Year']:.0f}, "
+                f"harga pupuk x{terbaik['Pengali_Harga_Pupuk']:.1f}."
+            )
+            # Margin per luas lahan untuk setiap kombinasi tahun & pengali harga
+            chart = skenario.assign(
+                Skenario=skenario["Year"].astype(str) + " / x" + skenario["Pengali_Harga_Pupuk"].astype(str)
+            ).pivot(index="Area_Ha", columns="Skenario", values="Margin_Rp")
+            st.line_chart(chart)
+            st.dataframe(skenario, hide_index=True, use_container_width=True)
+
+
+
 #  BACAAN & TIPS PER KOMODITAS
 
 
@@ -582,28 +599,39 @@ with tabs[4]:
 st.subheader("🗣️ Feedback dari Pengguna")
 st.caption("Kami sangat menghargai pendapat Anda untuk meningkatkan aplikasi.")
 
-# Link csv dari spreadsheet
+# Link csv dari spreadsheet (bisa diganti file CSV lokal lewat TUMBUH_FEEDBACK_SOURCE)
 CSV_URL = "https://docs.google.com/spreadsheets/d/e/2PACX-1vRAXqqad-A5_bahUZuF615e2siCAW2jU-s5FEcAVfii9DsVLA8UTcxAN-5oiEMVsv3lHgAEmudsTIJg/pub?gid=2097029552&single=true&output=csv"
+FEEDBACK_SOURCE = os.environ.get("TUMBUH_FEEDBACK_SOURCE", CSV_URL)
+
+
+# Satu feed untuk seluruh proses; data diperbarui di background setiap TTL detik
+@st.cache_resource
+def load_feedback_feed():
+    return FeedbackFeed(make_source(FEEDBACK_SOURCE))
 
 #  MEMBACA DATA FEEDBACK
-try:
-    df = pd.read_csv(CSV_URL)
-    df.columns = ["timestamp", "nama", "rating", "komentar"]
-
-    # Menampilkan Semua feedback (berurut)
-    for _, fb in df.iloc[::-1].iterrows():
-        st.markdown(f"""
-        <div style='background-color:#1e1e1e; border-radius:10px; padding:12px; margin-bottom:10px;
-                    border-left:4px solid #00cc99; color:#e0e0e0;'>
-            <p><b>🧑 {fb['nama']}</b> &nbsp;|&nbsp; ⭐ {fb['rating']} &nbsp;|&nbsp; 
-            <i>{fb['timestamp']}</i></p>
-            <p style='font-style:italic;'>{fb['komentar']}</p>
-        </div>
-        """, unsafe_allow_html=True)
-
-except Exception as e:
+feedback_feed = load_feedback_feed()
+# Hanya pembacaan pertama di proses ini yang ditunggu (maks. 2 detik); setelahnya
+# halaman selalu memakai snapshot terakhir tanpa menunggu sheet
+snapshot = feedback_feed.snapshot(wait=2)
+
+if snapshot is None and feedback_feed.last_error is None:
+    st.info("⏳ Feedback sedang dimuat. Muat ulang halaman beberapa saat lagi.")
+elif snapshot is None:
     st.error("⚠️ Gagal membaca data feedback. Pastikan link CSV sudah dipublikasikan.")
-    st.text(e)
+    st.text(feedback_feed.last_error)
+else:
+    # Statistik & HTML halaman dihitung sekali per snapshot (lihat feedback.py)
+    stats = snapshot.stats
+    col1, col2 = st.columns(2)
+    col1.metric("💬 Jumlah Feedback", f"{stats['jumlah']:,}")
+    col2.metric("⭐ Rata-rata Rating", "-" if stats["rata_rata"] is None else f"{stats['rata_rata']:.2f}")
+    st.caption(" • ".join(f"{star}⭐: {n}" for star, n in stats["distribusi"].items()))
+
+    # Menampilkan feedback per halaman (terbaru dulu), satu blok HTML per halaman
+    page = st.number_input(f"Halaman (dari {snapshot.n_pages()})", min_value=1,
+                           max_value=snapshot.n_pages(), value=1, step=1)
+    st.markdown(snapshot.page_html(page), unsafe_allow_html=True)
 
 # TOMBOL KE GOOGLE FORM
 st.link_button(
@@ -0,0 +1,178 @@
+# Skoring batch dari command line (tanpa Streamlit)
+#
+# Membaca CSV berskema input_data_prediksi (Province, District, Commodity, Rain_mm,
+# Temp_C, Humidity_pct, Soil_pH, Soil_*_index, Area_Ha, InputPrice_*, Year) per
+# potongan (chunk), membagi potongan ke pool proses, lalu menulis hasil prediksi
+# produksi dan rekomendasi pupuk ke CSV atau Parquet secara berurutan. Setiap worker
+# memuat model sekali saja; jumlah potongan yang sedang diproses dibatasi sehingga
+# memori tetap kecil walaupun file input berukuran GB.
+#
+# Contoh:
+#   python batch_score.py petani.csv hasil.parquet --workers 8 --chunksize 50000
+
+import argparse
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from lookup import DEFAULT_INPUTS, KEY_COLS, normalize_keys
+from model_store import CACHE_DIR, MODEL_FILES, S3_BASE_URL, fetch_artifact, load_artifact
+
+
+CHUNKSIZE = 50_000
+STAGES = ["baca", "produksi", "rekomendasi", "tulis"]
+
+# Model milik proses worker, dimuat sekali oleh _init_worker
+_worker_models = {}
+
+
+def _init_worker(artifacts):
+    for key, (path, file_name, delta_path) in artifacts.items():
+        _worker_models[key] = load_artifact(path, file_name, delta_path)
+
+
+def score_chunk(chunk):
+    """Prediksi produksi + rekomendasi pupuk untuk satu potongan. Mengembalikan (hasil, timing)."""
+    timing = {}
+    # Nama lokasi/komoditas dinormalkan seperti lookup, agar kuncinya sama dengan aplikasi
+    for col in KEY_COLS:
+        chunk[col] = normalize_keys(chunk[col])
+    for col, value in DEFAULT_INPUTS.items():
+        if col not in chunk.columns:
+            chunk[col] = value
+
+    start = time.perf_counter()
+    production = np.asarray(_worker_models["production"].predict(chunk), dtype=np.float64)
+    timing["produksi"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recommendation = _worker_models["recommender"].recommend_many(chunk)
+    timing["rekomendasi"] = time.perf_counter() - start
+
+    result = chunk.assign(
+        prediksi_produksi_kg_ha=production,
+        prediksi_total_produksi_kg=production * chunk["Area_Ha"].to_numpy(dtype=np.float64),
+    )
+    result = pd.concat([result, recommendation.rename(columns={"status": "status_rekomendasi"})], axis=1)
+    return result, timing
+
+
+class _OutputWriter:
+    """Menulis potongan hasil ke CSV atau Parquet (berdasarkan ekstensi) secara bertahap."""
+
+    def __init__(self, path):
+        self.path = path
+        self.parquet = path.endswith(".parquet")
+        self._writer = None
+        self._schema = None
+        self._first = True
+
+    def write(self, df):
+        if self.parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            if self._writer is None:
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def resolve_artifacts(production=None, recommender=None, base_url=S3_BASE_URL, cache_dir=CACHE_DIR):
+    """
+    Menentukan (path, nama file, path delta) per key: file lokal jika diberikan, selain
+    itu diambil sekali di proses utama lewat model_store.fetch_artifact, sama seperti
+    aplikasi (checksum diperiksa, file delta recommender ikut diambil).
+    """
+    local = {"production": production, "recommender": recommender}
+    artifacts = {}
+    for key, path in local.items():
+        if path:
+            artifacts[key] = (path, os.path.basename(path), None)
+        else:
+            file_name = MODEL_FILES[key]
+            path, delta_path, _ = fetch_artifact(file_name, base_url, cache_dir)
+            artifacts[key] = (path, file_name, delta_path)
+    return artifacts
+
+
+def run(input_path, output_path, artifacts, workers=None, chunksize=CHUNKSIZE):
+    """
+    Menjalankan skoring batch. Mengembalikan statistik: jumlah baris, durasi total
+    dan waktu per tahap (baca/tulis di proses utama, produksi/rekomendasi dijumlah
+    dari semua worker).
+    """
+    workers = workers or os.cpu_count()
+    stages = dict.fromkeys(STAGES, 0.0)
+    n_rows = 0
+    # Potongan yang sedang diproses dibatasi agar memori tidak tumbuh dengan ukuran input
+    max_pending = 2 * workers
+    writer = _OutputWriter(output_path)
+    started = time.perf_counter()
+
+    def collect(future):
+        nonlocal n_rows
+        result, timing = future.result()
+        for stage, seconds in timing.items():
+            stages[stage] += seconds
+        start = time.perf_counter()
+        writer.write(result)
+        stages["tulis"] += time.perf_counter() - start
+        n_rows += len(result)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(artifacts,)) as pool:
+            pending = deque()
+            reader = pd.read_csv(input_path, chunksize=chunksize, dtype={col: str for col in KEY_COLS})
+            while True:
+                start = time.perf_counter()
+                chunk = next(reader, None)
+                stages["baca"] += time.perf_counter() - start
+                if chunk is None:
+                    break
+                pending.append(pool.submit(score_chunk, chunk))
+                if len(pending) >= max_pending:
+                    collect(pending.popleft())
+            while pending:
+                collect(pending.popleft())
+    finally:
+        writer.close()
+
+    return {"rows": n_rows, "seconds": time.perf_counter() - started, "stages": stages, "workers": workers}
+
+
+def format_stats(stats):
+    lines = [
+        f"{stats['rows']:,} baris dalam {stats['seconds']:.1f} s "
+        f"({stats['rows'] / max(stats['seconds'], 1e-9):,.0f} baris/detik, {stats['workers']} worker)"
+    ]
+    for stage, seconds in stats["stages"].items():
+        lines.append(f"  {stage:<12} {seconds:8.2f} s")
+    lines.append("  (produksi & rekomendasi: total waktu semua worker)")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Skoring batch prediksi produksi & rekomendasi pupuk")
+    parser.add_argument("input", help="CSV berskema input_data_prediksi")
+    parser.add_argument("output", help="file hasil (.csv atau .parquet)")
+    parser.add_argument("--workers", type=int, default=None, help="jumlah proses (default: jumlah core)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE)
+    parser.add_argument("--production", help="file model produksi lokal (.pkl/.forest); default dari S3")
+    parser.add_argument("--recommender", help="file model rekomendasi lokal (.bin); default dari S3")
+    args = parser.parse_args()
+
+    artifacts = resolve_artifacts(args.production, args.recommender)
+    print(format_stats(run(args.input, args.output, artifacts, args.workers, args.chunksize)))
@@ -0,0 +1,43 @@
+# Tahap pembersihan data untuk training TUMBUH
+#
+# Penghapusan outlier dengan IQR per kelompok (default per komoditas, karena
+# penghapusan outlier secara global membuat komoditas tertentu hilang). Q1/Q3
+# dihitung untuk semua kelompok sekaligus dengan satu groupby().transform(), lalu
+# satu mask boolean dipakai untuk seluruh DataFrame, tanpa pd.concat per kelompok.
+
+IQR_MULTIPLIER = 3.0
+GROUP_KEYS = ["Commodity"]
+
+
+def iqr_outlier_mask(df, columns, group_keys=GROUP_KEYS, multiplier=IQR_MULTIPLIER):
+    """
+    Mask baris yang dipertahankan: tidak ada nilai di columns yang berada di luar
+    [Q1 - multiplier * IQR, Q3 + multiplier * IQR] kelompoknya. Baris dengan kunci
+    kelompok kosong (NaN) tidak masuk kelompok mana pun sehingga ikut dibuang.
+    """
+    group_keys = list(group_keys)
+    values = df[list(columns)]
+    grouped = values.groupby([df[key] for key in group_keys], sort=False)
+    q1 = grouped.transform("quantile", 0.25)
+    q3 = grouped.transform("quantile", 0.75)
+    iqr = q3 - q1
+    outlier = ((values < q1 - multiplier * iqr) | (values > q3 + multiplier * iqr)).any(axis=1)
+    return ~outlier & df[group_keys].notna().all(axis=1)
+
+
+def filter_outliers_iqr(df, columns, group_keys=GROUP_KEYS, multiplier=IQR_MULTIPLIER):
+    """
+    Membuang outlier IQR per kelompok. Mengembalikan (df_clean, report).
+
+    Urutan baris hasil sama dengan cara lama (loop groupby + pd.concat): kelompok
+    terurut menurut kuncinya, urutan asli dipertahankan di dalam kelompok. report
+    berisi jumlah baris, jumlah yang dibuang dan persentasenya per kelompok.
+    """
+    group_keys = list(group_keys)
+    keep = iqr_outlier_mask(df, columns, group_keys, multiplier)
+    df_clean = df[keep].sort_values(group_keys, kind="stable")
+
+    report = keep.groupby([df[key] for key in group_keys]).agg(rows="size", kept="sum")
+    report["dropped"] = report["rows"] - report["kept"]
+    report["dropped_pct"] = 100 * report["dropped"] / report["rows"]
+    return df_clean, report.drop(columns="kept")
@@ -0,0 +1,122 @@
+# Format file kolomnar sederhana (tanpa pickle) untuk artefak TUMBUH
+#
+# Struktur file:
+#   MAGIC (8 byte) | panjang header (uint32, little endian) | header JSON | data kolom
+# Setiap kolom disimpan sebagai array numpy mentah yang di-align ke 64 byte, sehingga
+# file bisa di-memory-map dan kolom dibaca tanpa salinan. Kolom kategori disimpan
+# sebagai kode integer + daftar kategori di header.
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+MAGIC = b"TUMBUHC\x00"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+
+
+def _code_dtype(n_categories):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories < np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+
+def write_columnar(path, columns, kind, meta=None):
+    """
+    Menulis dict {nama: array/Series/Categorical} ke path secara atomik.
+
+    Kolom bertipe kategori (pd.Categorical atau Series berdtype category) disimpan
+    sebagai kode; kolom lain disimpan apa adanya dengan dtype numpy-nya.
+    """
+    header_cols = []
+    blobs = []
+    offset = 0
+    for name, values in columns.items():
+        entry = {"name": name}
+        if isinstance(values, pd.Series):
+            values = values.array if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy()
+        if isinstance(values, pd.Categorical):
+            entry["categories"] = [str(c) for c in values.categories]
+            array = values.codes.astype(_code_dtype(len(values.categories)))
+        else:
+            array = np.asarray(values)
+            if array.dtype == object:
+                raise TypeError(f"Kolom '{name}' bertipe object; ubah ke kategori terlebih dahulu.")
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+
+        offset = -(-offset // ALIGNMENT) * ALIGNMENT
+        entry.update({"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset})
+        header_cols.append(entry)
+        blobs.append((offset, array))
+        offset += array.nbytes
+
+    header = json.dumps({
+        "format_version": FORMAT_VERSION,
+        "kind": kind,
+        "columns": header_cols,
+        "meta": meta or {},
+    }).encode("utf-8")
+
+    # Data dimulai di kelipatan ALIGNMENT setelah header
+    data_start = -(-(len(MAGIC) + 4 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint32(len(header)).tobytes())
+        f.write(header)
+        for rel_offset, array in blobs:
+            f.seek(data_start + rel_offset)
+            f.write(array.tobytes())
+    os.replace(tmp_path, path)
+
+
+def read_columnar(path, kind, mmap=True):
+    """
+    Membaca file hasil write_columnar. Mengembalikan (columns, meta).
+
+    Dengan mmap=True kolom numerik berupa view read-only di atas memory map (tanpa
+    salinan); kolom kategori dikembalikan sebagai pd.Categorical.
+    """
+    if mmap and os.path.getsize(path) > 0:
+        buffer = np.memmap(path, dtype=np.uint8, mode="r")
+    else:
+        with open(path, "rb") as f:
+            buffer = np.frombuffer(f.read(), dtype=np.uint8)
+
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f"'{path}' bukan file kolomnar TUMBUH.")
+    if len(buffer) < len(MAGIC) + 4:
+        raise ValueError(f"'{path}' terpotong: header tidak lengkap.")
+    header_len = int(buffer[len(MAGIC):len(MAGIC) + 4].view('<u4')[0])
+    header_end = len(MAGIC) + 4 + header_len
+    if header_end > len(buffer):
+        raise ValueError(f"'{path}' terpotong: header tidak lengkap.")
+    header = json.loads(bytes(buffer[len(MAGIC) + 4:header_end]).decode("utf-8"))
+
+    if header.get("format_version") != FORMAT_VERSION:
+        raise ValueError(
+            f"Versi format '{path}' ({header.get('format_version')}) tidak didukung; "
+            f"versi yang didukung: {FORMAT_VERSION}."
+        )
+    if header.get("kind") != kind:
+        raise ValueError(f"'{path}' berisi '{header.get('kind')}', bukan '{kind}'.")
+
+    data_start = -(-header_end // ALIGNMENT) * ALIGNMENT
+    columns = {}
+    for entry in header["columns"]:
+        dtype = np.dtype(entry["dtype"])
+        shape = tuple(entry["shape"])
+        count = int(np.prod(shape))
+        start = data_start + entry["offset"]
+        if start + count * dtype.itemsize > len(buffer):
+            raise ValueError(f"'{path}' terpotong: kolom '{entry['name']}' tidak lengkap.")
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=start).reshape(shape)
+        if "categories" in entry:
+            array = pd.Categorical.from_codes(array, categories=entry["categories"])
+        columns[entry["name"]] = array
+    return columns, header["meta"]
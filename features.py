@@ -0,0 +1,76 @@
+# Fitur turunan (feature engineering) yang dipakai bersama oleh training dan aplikasi
+#
+# Sebelumnya empat fitur turunan ditulis dua kali (di capstone_tumbuh.py dan
+# app.py). FeatureBuilder adalah transformer sklearn yang menjadi langkah pertama
+# pipeline, sehingga fitur dihitung oleh kode yang sama saat training maupun saat
+# prediksi, dan ikut tersimpan di file pipeline.
+
+import numpy as np
+import pandas as pd
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.pipeline import Pipeline
+
+
+BASE_FEATURE_COLS = [
+    'Temp_C', 'Humidity_pct', 'Soil_N_index', 'Soil_P_index', 'Soil_K_index', 'Soil_pH',
+    'InputPrice_Urea_RpKg', 'InputPrice_SP36_RpKg', 'InputPrice_KCl_RpKg',
+]
+ENGINEERED_FEATURES = ['Temp_Humid_Interaction', 'Soil_Fertility_Index', 'Soil_pH_sq', 'Avg_Fertilizer_Price']
+
+
+def engineered_features(columns):
+    """Menghitung fitur turunan dari dict {kolom: array}; mengembalikan dict baru."""
+    col = {name: np.asarray(columns[name], dtype=np.float64) for name in BASE_FEATURE_COLS}
+    return {
+        'Temp_Humid_Interaction': col['Temp_C'] * col['Humidity_pct'],
+        'Soil_Fertility_Index': (col['Soil_N_index'] + col['Soil_P_index'] + col['Soil_K_index']) / 3,
+        'Soil_pH_sq': col['Soil_pH'] ** 2,
+        'Avg_Fertilizer_Price': (
+            col['InputPrice_Urea_RpKg'] + col['InputPrice_SP36_RpKg'] + col['InputPrice_KCl_RpKg']
+        ) / 3,
+    }
+
+
+class FeatureBuilder(TransformerMixin, BaseEstimator):
+    """
+    Menambahkan ENGINEERED_FEATURES ke DataFrame input (kolom yang sudah ada ditimpa).
+
+    Tidak punya parameter hasil fit, jadi bisa langsung dipakai tanpa fit(). Hasilnya
+    dibangun sebagai satu DataFrame dari dict array kolom (dtype asli, termasuk
+    kategorikal, dipertahankan), tanpa assignment kolom satu per satu.
+    """
+
+    def fit(self, X, y=None):
+        _check_columns(X)
+        self.feature_names_in_ = np.asarray(X.columns, dtype=object)
+        self.n_features_in_ = len(X.columns)
+        return self
+
+    def transform(self, X):
+        _check_columns(X)
+        columns = {name: X[name].array for name in X.columns}
+        columns.update(engineered_features(columns))
+        return pd.DataFrame(columns, index=X.index, copy=False)
+
+    def get_feature_names_out(self, input_features=None):
+        names = list(input_features if input_features is not None else self.feature_names_in_)
+        return np.asarray(names + [f for f in ENGINEERED_FEATURES if f not in names], dtype=object)
+
+    def __sklearn_is_fitted__(self):
+        return True
+
+
+def _check_columns(X):
+    missing = [col for col in BASE_FEATURE_COLS if col not in X.columns]
+    if missing:
+        raise ValueError(f"Kolom untuk fitur turunan tidak ditemukan: {', '.join(missing)}")
+
+
+def with_feature_builder(pipeline):
+    """
+    Menambahkan FeatureBuilder di depan pipeline lama (dilatih sebelum FeatureBuilder
+    ada), sehingga pipeline itu juga bisa menerima input tanpa fitur turunan.
+    """
+    if not isinstance(pipeline, Pipeline) or isinstance(pipeline.steps[0][1], FeatureBuilder):
+        return pipeline
+    return Pipeline(steps=[('features', FeatureBuilder())] + pipeline.steps)
@@ -0,0 +1,221 @@
+# Feed feedback pengguna (Google Sheet yang dipublikasikan sebagai CSV)
+#
+# Halaman selalu dirender dari snapshot terakhir yang berhasil dibaca. Setelah TTL
+# lewat, snapshot diperbarui di thread background (satu refresh dalam satu waktu),
+# sehingga lambat/gagalnya endpoint sheet tidak menahan render halaman. Revalidasi
+# bersifat kondisional: ETag/Last-Modified untuk HTTP, mtime/ukuran untuk file lokal,
+# dan isi yang sama persis tidak di-parse ulang.
+#
+# Sumber bisa berupa URL atau path file CSV lokal (pengganti sheet untuk pengujian),
+# lihat make_source().
+#
+# Tampilan feed dirender per halaman (terbaru dulu): HTML kartu disusun sekali per
+# snapshot secara vektor (semua teks di-escape), statistik rating juga dihitung
+# sekali per snapshot, sehingga ukuran halaman tidak ikut tumbuh dengan jumlah
+# feedback.
+
+import hashlib
+import html
+import io
+import os
+import threading
+import time
+
+import pandas as pd
+import requests
+
+
+FEEDBACK_COLUMNS = ["timestamp", "nama", "rating", "komentar"]
+TTL = float(os.environ.get("TUMBUH_FEEDBACK_TTL", 60))
+TIMEOUT = 10
+PAGE_SIZE = 10
+
+CARD_OPEN = (
+    "<div style='background-color:#1e1e1e; border-radius:10px; padding:12px; margin-bottom:10px; "
+    "border-left:4px solid #00cc99; color:#e0e0e0;'>"
+)
+
+
+class HttpSource:
+    """CSV lewat HTTP dengan If-None-Match / If-Modified-Since."""
+
+    def __init__(self, url, timeout=TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+        self._validators = {}
+
+    def fetch(self):
+        """Isi CSV (bytes), atau None jika server menjawab 304 (tidak berubah)."""
+        headers = {}
+        if "etag" in self._validators:
+            headers["If-None-Match"] = self._validators["etag"]
+        if "last_modified" in self._validators:
+            headers["If-Modified-Since"] = self._validators["last_modified"]
+        response = requests.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        self._validators = {
+            key: response.headers[header]
+            for key, header in (("etag", "ETag"), ("last_modified", "Last-Modified"))
+            if header in response.headers
+        }
+        return response.content
+
+
+class FileSource:
+    """CSV dari file lokal; dianggap tidak berubah selama mtime dan ukurannya sama."""
+
+    def __init__(self, path, delay=0.0):
+        self.path = path
+        # Latensi buatan untuk mensimulasikan endpoint yang lambat saat pengujian
+        self.delay = delay
+        self._signature = None
+
+    def fetch(self):
+        if self.delay:
+            time.sleep(self.delay)
+        stat = os.stat(self.path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature == self._signature:
+            return None
+        with open(self.path, "rb") as f:
+            content = f.read()
+        self._signature = signature
+        return content
+
+
+def make_source(location, **kwargs):
+    if location.startswith(("http://", "https://")):
+        return HttpSource(location, **kwargs)
+    return FileSource(location, **kwargs)
+
+
+def parse_feedback(content):
+    df = pd.read_csv(io.BytesIO(content))
+    df.columns = FEEDBACK_COLUMNS
+    return df
+
+
+def feedback_stats(df):
+    """Jumlah feedback, rata-rata rating dan jumlah per bintang (5 -> 1)."""
+    rating = pd.to_numeric(df["rating"], errors="coerce")
+    counts = rating.round().value_counts()
+    return {
+        "jumlah": len(df),
+        "rata_rata": float(rating.mean()) if rating.notna().any() else None,
+        "distribusi": {star: int(counts.get(star, 0)) for star in range(5, 0, -1)},
+    }
+
+
+def render_cards(df):
+    """HTML kartu per feedback (terbaru dulu) sebagai list string, disusun tanpa loop per baris."""
+    newest = df.iloc[::-1]
+    text = {col: newest[col].fillna("").astype(str).map(html.escape) for col in FEEDBACK_COLUMNS}
+    cards = (
+        CARD_OPEN
+        + "<p><b>🧑 " + text["nama"] + "</b> &nbsp;|&nbsp; ⭐ " + text["rating"]
+        + " &nbsp;|&nbsp; <i>" + text["timestamp"] + "</i></p>"
+        + "<p style='font-style:italic;'>" + text["komentar"] + "</p></div>"
+    )
+    return cards.tolist()
+
+
+class FeedbackSnapshot:
+    """
+    Data feedback hasil satu kali baca; version naik setiap isinya berubah. Statistik
+    dan HTML halaman dihitung saat pertama diminta lalu disimpan di snapshot ini.
+    """
+
+    def __init__(self, df, version, digest):
+        self.df = df
+        self.version = version
+        self.digest = digest
+        self.loaded_at = time.time()
+        self._stats = None
+        self._cards = None
+        self._pages = {}
+
+    @property
+    def stats(self):
+        if self._stats is None:
+            self._stats = feedback_stats(self.df)
+        return self._stats
+
+    def n_pages(self, page_size=PAGE_SIZE):
+        return max(1, -(-len(self.df) // page_size))
+
+    def page_html(self, page, page_size=PAGE_SIZE):
+        """Satu blok HTML berisi kartu halaman ke-page (mulai 1, terbaru dulu)."""
+        key = (page, page_size)
+        if key not in self._pages:
+            if self._cards is None:
+                self._cards = render_cards(self.df)
+            start = (page - 1) * page_size
+            self._pages[key] = "".join(self._cards[start:start + page_size])
+        return self._pages[key]
+
+
+class FeedbackFeed:
+    """
+    Cache feedback untuk seluruh proses. snapshot() tidak pernah menunggu jaringan:
+    ia mengembalikan snapshot terakhir (atau None sebelum pembacaan pertama selesai)
+    dan memicu refresh di background jika TTL sudah lewat.
+    """
+
+    def __init__(self, source, ttl=TTL, parse=parse_feedback):
+        self.source = source
+        self.ttl = ttl
+        self.parse = parse
+        self.last_error = None
+        self.stats = {"refreshes": 0, "not_modified": 0, "errors": 0}
+        self._snapshot = None
+        self._checked_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def snapshot(self, wait=0.0):
+        """
+        Snapshot terakhir yang berhasil. Jika belum ada snapshot sama sekali, boleh
+        menunggu pembacaan pertama paling lama wait detik.
+        """
+        self._maybe_refresh()
+        if self._snapshot is None and wait > 0:
+            self._done.wait(wait)
+        return self._snapshot
+
+    def refresh(self):
+        """Membaca sumber sekarang juga (blocking) dan memperbarui snapshot."""
+        try:
+            content = self.source.fetch()
+            if content is None:
+                self.stats["not_modified"] += 1
+            else:
+                digest = hashlib.sha256(content).hexdigest()
+                current = self._snapshot
+                if current is not None and current.digest == digest:
+                    self.stats["not_modified"] += 1
+                else:
+                    version = current.version + 1 if current is not None else 1
+                    self._snapshot = FeedbackSnapshot(self.parse(content), version, digest)
+            self.stats["refreshes"] += 1
+            self.last_error = None
+        except Exception as e:
+            # Snapshot lama tetap dipakai; dicoba lagi setelah TTL berikutnya
+            self.stats["errors"] += 1
+            self.last_error = e
+        finally:
+            with self._lock:
+                self._checked_at = time.monotonic()
+                self._refreshing = False
+            self._done.set()
+        return self._snapshot
+
+    def _maybe_refresh(self):
+        with self._lock:
+            stale = self._checked_at is None or time.monotonic() - self._checked_at >= self.ttl
+            if not stale or self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self.refresh, daemon=True).start()
@@ -0,0 +1,351 @@
+# Mesin inferensi RandomForest berbasis array datar
+#
+# Pipeline sklearn (ColumnTransformer[StandardScaler + OneHotEncoder] -> RandomForest)
+# dikompilasi menjadi beberapa array numpy: fitur, threshold, anak kiri/kanan dan
+# nilai daun dari semua pohon yang digabung. StandardScaler dilipat ke threshold
+# (x_skala <= t  <=>  x <= t * scale + mean), sedangkan kolom one-hot diganti dengan
+# uji kesamaan kategori, sehingga saat prediksi tidak ada transformer sklearn yang
+# dipanggil sama sekali. Semua pohon ditelusuri bersamaan, satu level per langkah.
+
+import numpy as np
+import pandas as pd
+from sklearn.compose import ColumnTransformer, TransformedTargetRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from columnar import read_columnar, write_columnar
+from features import BASE_FEATURE_COLS, ENGINEERED_FEATURES, FeatureBuilder, engineered_features
+
+
+FOREST_KIND = "flat_forest"
+
+# Input sampai ukuran ini dibangun lewat jalur baris (tanpa operasi pandas per kolom).
+# Diukur pada _design_matrix (pipeline 100 pohon, 15 kolom input): 1 baris 0.16 ms vs
+# 0.46 ms (DataFrame) dan 0.06 ms vs 0.55 ms (record); 64 baris 0.45 vs 0.86 ms. Kedua
+# jalur seimbang di sekitar 1000 baris, jadi batas dibiarkan jauh di bawahnya.
+SMALL_BATCH = 64
+# Setiap berapa level pasangan (baris, pohon) yang sudah sampai di daun dibuang
+COMPACT_EVERY = 8
+
+
+class FlatForest:
+    """
+    Hasil kompilasi pipeline RandomForest untuk prediksi cepat tanpa sklearn.
+
+    Kolom input z adalah fitur numerik mentah (tanpa scaling) diikuti indikator
+    kategori (1.0 jika Province/District/Commodity sama dengan kategori kolom itu),
+    persis urutan kolom keluaran ColumnTransformer. Daun menunjuk ke dirinya sendiri
+    dengan threshold +inf.
+    """
+
+    def __init__(self, numeric_features, categorical_features, categories, column_source,
+                 feature, threshold, children, missing_left, value, roots, max_depth,
+                 output_names=None, feature_builder=False):
+        self.numeric_features = list(numeric_features)
+        self.categorical_features = list(categorical_features)
+        self.categories = [list(c) for c in categories]
+        # column_source[j] = (indeks fitur kategori, kode kategori), atau (-1, -1) untuk kolom numerik
+        self.column_source = np.asarray(column_source)
+        self.feature = np.asarray(feature)
+        self.threshold = np.asarray(threshold)
+        self.children = np.asarray(children)
+        self.missing_left = np.asarray(missing_left)
+        self.value = np.asarray(value)
+        self.roots = np.asarray(roots)
+        self.max_depth = int(max_depth)
+        # Fitur turunan dihitung dulu jika pipeline asal diawali FeatureBuilder, atau
+        # jika forest lama memakai fitur itu (FeatureBuilder menghitung ulang nilai yang sama)
+        self.feature_builder = bool(feature_builder) or set(ENGINEERED_FEATURES).issubset(self.numeric_features)
+        self.output_names = list(output_names) if output_names is not None else [
+            f"output_{i}" for i in range(self.value.shape[1])
+        ]
+
+        # Posisi kolom numerik dan indikator di z, dihitung sekali
+        is_cat = self.column_source[:, 0] >= 0
+        self._num_columns = np.flatnonzero(~is_cat)
+        self._cat_columns = np.flatnonzero(is_cat)
+        self._cat_feature = self.column_source[is_cat, 0]
+        self._cat_code = self.column_source[is_cat, 1]
+        self._category_codes = [{c: code for code, c in enumerate(cats)} for cats in self.categories]
+        self._is_leaf = self.children[:, 0] == np.arange(len(self.children))
+        # children[node, arah] sebagai array datar: children_flat[2 * node + ke_kanan]
+        self._children_flat = self.children.ravel()
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def n_outputs(self):
+        return self.value.shape[1]
+
+    @classmethod
+    def from_pipeline(cls, pipeline, output_names=None):
+        """
+        Mengompilasi Pipeline(preprocessor=ColumnTransformer, model=RandomForestRegressor).
+
+        Pipeline boleh diawali FeatureBuilder (lihat features.py). Model juga boleh
+        berupa TransformedTargetRegressor(RandomForest, StandardScaler) (lihat
+        multi_output.py); inverse scaling target dilipat ke nilai daun.
+        """
+        if not isinstance(pipeline, Pipeline):
+            raise TypeError("Hanya sklearn Pipeline yang didukung.")
+        steps = [step for _, step in pipeline.steps]
+        feature_builder = isinstance(steps[0], FeatureBuilder)
+        if feature_builder:
+            steps = steps[1:]
+        if len(steps) != 2:
+            raise TypeError("Pipeline harus berisi (FeatureBuilder opsional,) preprocessor dan model.")
+        preprocessor, model = steps
+        if not isinstance(preprocessor, ColumnTransformer):
+            raise TypeError("Langkah pertama pipeline harus ColumnTransformer.")
+        target_scale, target_offset = 1.0, 0.0
+        if isinstance(model, TransformedTargetRegressor):
+            transformer = model.transformer_
+            if not isinstance(transformer, StandardScaler):
+                raise TypeError("Transformer target selain StandardScaler belum didukung.")
+            # Rata-rata antar pohon komutatif dengan transformasi affine
+            target_scale = 1.0 if transformer.scale_ is None else transformer.scale_
+            target_offset = 0.0 if transformer.mean_ is None else transformer.mean_
+            model = model.regressor_
+        if not hasattr(model, "estimators_"):
+            raise TypeError("Langkah terakhir pipeline harus RandomForest yang sudah di-fit.")
+
+        numeric_features, categorical_features, categories = [], [], []
+        column_source = []
+        scale, offset = [], []
+        for name, transformer, columns in preprocessor.transformers_:
+            output = preprocessor.output_indices_[name]
+            if transformer == "drop" or output.stop == output.start:
+                continue
+            if isinstance(transformer, StandardScaler) or transformer == "passthrough":
+                n = len(columns)
+                mean = np.zeros(n) if transformer == "passthrough" or transformer.mean_ is None else transformer.mean_
+                std = np.ones(n) if transformer == "passthrough" or transformer.scale_ is None else transformer.scale_
+                numeric_features.extend(columns)
+                column_source.extend([(-1, -1)] * n)
+                scale.extend(std)
+                offset.extend(mean)
+            elif isinstance(transformer, OneHotEncoder):
+                if transformer.drop_idx_ is not None:
+                    raise TypeError("OneHotEncoder dengan drop=... belum didukung.")
+                for column, cats in zip(columns, transformer.categories_):
+                    if pd.isna(cats).any():
+                        raise ValueError(f"Kategori NaN pada kolom '{column}' belum didukung.")
+                    feature_index = len(categorical_features)
+                    categorical_features.append(column)
+                    categories.append([str(c) for c in cats])
+                    column_source.extend((feature_index, code) for code in range(len(cats)))
+                    # Indikator 0/1 tidak di-scale
+                    scale.extend([1.0] * len(cats))
+                    offset.extend([0.0] * len(cats))
+            else:
+                raise TypeError(f"Transformer '{name}' ({type(transformer).__name__}) tidak didukung.")
+        scale, offset = np.asarray(scale), np.asarray(offset)
+
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        sizes = np.array([tree.node_count for tree in trees])
+        starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        feature, threshold, children, missing_left, value = [], [], [], [], []
+        for tree, start in zip(trees, starts):
+            node_ids = np.arange(tree.node_count)
+            leaf = tree.children_left < 0
+            f = np.where(leaf, 0, tree.feature)
+            feature.append(f)
+            # Threshold dipindahkan dari ruang hasil scaling ke ruang fitur mentah
+            bound = _float32_bound(np.where(leaf, np.inf, tree.threshold))
+            threshold.append(bound * scale[f] + offset[f])
+            children.append(np.stack([
+                np.where(leaf, node_ids, tree.children_left) + start,
+                np.where(leaf, node_ids, tree.children_right) + start,
+            ], axis=1))
+            missing_left.append(tree.missing_go_to_left.astype(bool) | leaf)
+            value.append(tree.value[:, :, 0] * target_scale + target_offset)
+
+        return cls(
+            numeric_features, categorical_features, categories, column_source,
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=np.concatenate(threshold),
+            children=np.concatenate(children).astype(np.int32),
+            missing_left=np.concatenate(missing_left),
+            value=np.concatenate(value),
+            roots=starts.astype(np.int32),
+            max_depth=max(tree.max_depth for tree in trees),
+            output_names=output_names,
+            feature_builder=feature_builder,
+        )
+
+    def _input_columns(self, X):
+        """
+        Kolom input yang dibutuhkan sebagai dict {nama: array}, dari DataFrame atau
+        list record (dict, mis. lookup.input_row) tanpa membangun DataFrame.
+        """
+        derived = set(ENGINEERED_FEATURES) if self.feature_builder else set()
+        names = [c for c in self.numeric_features if c not in derived] + self.categorical_features
+        if self.feature_builder:
+            names += [c for c in BASE_FEATURE_COLS if c not in names]
+        if not isinstance(X, pd.DataFrame):
+            missing = sorted({c for record in X for c in names if c not in record})
+            if missing:
+                raise KeyError(f"Kolom tidak ada di input: {missing}")
+            return {name: np.array([record[name] for record in X], dtype=object) for name in names}
+
+        # Dicek untuk kedua jalur: get_indexer memberi -1 untuk kolom yang hilang, dan
+        # values[:, -1] diam-diam akan membaca kolom terakhir
+        positions = X.columns.get_indexer(names)
+        if (positions < 0).any():
+            raise KeyError(f"Kolom tidak ada di input: {[c for c, p in zip(names, positions) if p < 0]}")
+        if len(X) <= SMALL_BATCH:
+            # Untuk beberapa baris, overhead pandas per kolom jauh lebih mahal daripada
+            # satu konversi ke array object
+            values = X.to_numpy()
+            return {name: values[:, p] for name, p in zip(names, positions)}
+        return {name: X[name].to_numpy() for name in names}
+
+    def _design_matrix(self, X):
+        """Membangun z (baris x kolom ColumnTransformer) langsung dari input mentah."""
+        columns = self._input_columns(X)
+        # Fitur turunan dihitung dari array yang sama (seperti FeatureBuilder, menimpa
+        # kolom input bernama sama) tanpa membangun DataFrame perantara
+        if self.feature_builder:
+            columns.update(engineered_features(columns))
+        n_rows = len(X)
+        z = np.empty((n_rows, len(self.column_source)), dtype=np.float64)
+        if self.numeric_features:
+            z[:, self._num_columns] = np.column_stack([
+                np.asarray(columns[column], dtype=np.float64) for column in self.numeric_features
+            ])
+        if n_rows <= SMALL_BATCH:
+            codes = np.array([
+                [lookup.get(str(value), -1) for value in columns[column]]
+                for column, lookup in zip(self.categorical_features, self._category_codes)
+            ], dtype=np.int64).reshape(len(self.categorical_features), n_rows).T
+        elif self.categorical_features:
+            codes = np.column_stack([
+                pd.Index(cats).get_indexer(np.asarray(columns[column]).astype(str))
+                for column, cats in zip(self.categorical_features, self.categories)
+            ])
+        else:
+            codes = np.empty((n_rows, 0), dtype=np.int64)
+        # Kategori yang tidak dikenal mendapat kode -1: semua indikatornya 0 (handle_unknown='ignore')
+        z[:, self._cat_columns] = codes[:, self._cat_feature] == self._cat_code
+        return z
+
+    def leaves(self, X):
+        """Indeks daun (baris x pohon) untuk setiap baris X (DataFrame atau list record)."""
+        z = self._design_matrix(X)
+        n_rows, n_columns = z.shape
+        has_nan = bool(np.isnan(z).any())
+        z = z.ravel()
+
+        leaves = np.empty(n_rows * self.n_trees, dtype=np.int64)
+        # Pasangan (baris, pohon) yang belum sampai di daun. Daun menunjuk ke dirinya
+        # sendiri, jadi pasangan yang selesai cukup dibuang setiap COMPACT_EVERY level.
+        position = np.arange(n_rows * self.n_trees)
+        node = np.tile(self.roots, n_rows)
+        row_start = np.repeat(np.arange(n_rows) * n_columns, self.n_trees)
+
+        depth = 0
+        while len(node):
+            if depth % COMPACT_EVERY == 0:
+                done = self._is_leaf[node]
+                if done.any():
+                    leaves[position[done]] = node[done]
+                    active = ~done
+                    position, node, row_start = position[active], node[active], row_start[active]
+            x = z.take(row_start + self.feature.take(node))
+            go_right = x > self.threshold.take(node)
+            if has_nan:
+                # NaN: perbandingan selalu False, jadi arah ditentukan missing_left
+                go_right |= np.isnan(x) & ~self.missing_left.take(node)
+            node = self._children_flat.take(2 * node + go_right)
+            depth += 1
+        return leaves.reshape(n_rows, self.n_trees)
+
+    def predict(self, X):
+        """
+        Sama dengan pipeline.predict(X) (dalam toleransi float). X boleh DataFrame atau
+        list record dict (mis. dari lookup.input_row), yang paling cepat untuk satu baris.
+        """
+        prediction = self.value[self.leaves(X)].mean(axis=1)
+        return prediction[:, 0] if self.n_outputs == 1 else prediction
+
+    def predict_all(self, X):
+        """Semua output sebagai DataFrame dengan kolom output_names."""
+        prediction = self.value[self.leaves(X)].mean(axis=1)
+        index = X.index if isinstance(X, pd.DataFrame) else None
+        return pd.DataFrame(prediction, index=index, columns=self.output_names)
+
+    def save(self, path):
+        """Menyimpan forest dalam format kolomnar (lihat columnar.py)."""
+        write_columnar(path, {
+            'feature': self.feature.astype(_index_dtype(len(self.column_source))),
+            'threshold': self.threshold,
+            'children': self.children,
+            'missing_left': self.missing_left,
+            'value': self.value,
+            'roots': self.roots,
+            'column_source': self.column_source.astype(np.int32),
+        }, kind=FOREST_KIND, meta={
+            "numeric_features": self.numeric_features,
+            "categorical_features": self.categorical_features,
+            "categories": self.categories,
+            "max_depth": self.max_depth,
+            "feature_builder": self.feature_builder,
+            "output_names": self.output_names,
+        })
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        columns, meta = read_columnar(path, kind=FOREST_KIND, mmap=mmap)
+        return cls(
+            meta["numeric_features"], meta["categorical_features"], meta["categories"],
+            columns['column_source'],
+            feature=columns['feature'], threshold=columns['threshold'],
+            children=columns['children'], missing_left=columns['missing_left'],
+            value=columns['value'], roots=columns['roots'], max_depth=meta["max_depth"],
+            output_names=meta.get("output_names"), feature_builder=meta.get("feature_builder", False),
+        )
+
+
+def _float32_bound(threshold):
+    """
+    sklearn membandingkan float32(x_skala) <= t. Fungsi ini mengembalikan batas
+    float64 b sehingga x_skala <= b persis setara dengan perbandingan itu, agar
+    nilai tepat di batas (mis. fitur bilangan bulat) tetap masuk cabang yang sama.
+    """
+    with np.errstate(over="ignore"):
+        low = threshold.astype(np.float32)
+    low = np.where(low.astype(np.float64) > threshold, np.nextafter(low, np.float32(-np.inf)), low)
+    high = np.nextafter(low, np.float32(np.inf))
+    # Nilai di antara low dan high dibulatkan ke yang terdekat; tepat di tengah ke mantissa genap
+    middle = (low.astype(np.float64) + high.astype(np.float64)) / 2
+    low_is_even = (low.view(np.int32) & 1) == 0
+    bound = np.where(low_is_even, middle, np.nextafter(middle, -np.inf))
+    return np.where(np.isfinite(threshold), bound, threshold)
+
+
+def _index_dtype(n_columns):
+    return np.int16 if n_columns < np.iinfo(np.int16).max else np.int32
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Kompilasi pipeline_*_final.pkl menjadi FlatForest (.forest)")
+    parser.add_argument("pipelines", nargs="+", help="file pipeline .pkl")
+    args = parser.parse_args()
+
+    for pipeline_path in args.pipelines:
+        forest = FlatForest.from_pipeline(joblib.load(pipeline_path))
+        out_path = os.path.splitext(pipeline_path)[0] + ".forest"
+        forest.save(out_path)
+        print(
+            f"{pipeline_path} ({os.path.getsize(pipeline_path) / 1e6:.1f} MB) -> "
+            f"{out_path} ({os.path.getsize(out_path) / 1e6:.1f} MB), "
+            f"{forest.n_trees} pohon, {len(forest.feature)} node"
+        )
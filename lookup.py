@@ -0,0 +1,193 @@
+# Tabel referensi lokasi & komoditas (lookup_tabel.csv) dan penyusunan input model
+#
+# Dipakai bersama oleh app.py, service.py dan skrip lain, sehingga nilai default dan
+# bentuk input_data_prediksi hanya didefinisikan di satu tempat.
+#
+# Selain CSV, lookup bisa disimpan sebagai file kolomnar biner (lookup_tabel.lkp,
+# lihat columnar.py): Province/District/Commodity sebagai kode kategori dan kolom
+# angka sebagai float32. Build ulang setiap kali CSV berubah:
+#
+#   python lookup.py lookup_tabel.csv
+
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from columnar import read_columnar, write_columnar
+
+
+LOOKUP_PATH = "lookup_tabel.csv"
+LOOKUP_KIND = "lookup_table"
+KEY_COLS = ["Province", "District", "Commodity"]
+
+# Jumlah desimal maksimum yang dicoba saat memeriksa apakah kolom aman disimpan float32
+MAX_DECIMALS = 6
+
+# Nilai default jika kombinasi lokasi/komoditas tidak ada di lookup
+FALLBACK_DEFAULTS = {
+    "Rain_mm": 2000, "Temp_C": 27, "Humidity_pct": 80, "Soil_pH": 6.5,
+    "Soil_N_index": 3, "Soil_P_index": 3, "Soil_K_index": 3,
+    "InputPrice_Urea_RpKg": 7000, "InputPrice_SP36_RpKg": 8000, "InputPrice_KCl_RpKg": 9000,
+    "Year": 2024
+}
+
+# Kolom input model yang tidak ada di lookup_tabel.csv
+DEFAULT_INPUTS = {
+    "InputPrice_Urea_RpKg": 7000, "InputPrice_SP36_RpKg": 8000, "InputPrice_KCl_RpKg": 9000,
+    "Year": 2024,
+}
+
+# Kolom input_data_prediksi (tanpa fitur turunan, lihat features.py), sesuai urutan di app.py
+INPUT_COLS = [
+    "Province", "District", "Commodity", "Rain_mm", "Temp_C", "Humidity_pct", "Soil_pH",
+    "Soil_N_index", "Soil_P_index", "Soil_K_index", "Area_Ha",
+    "InputPrice_Urea_RpKg", "InputPrice_SP36_RpKg", "InputPrice_KCl_RpKg", "Year",
+]
+
+
+def binary_path_for(csv_path):
+    return os.path.splitext(csv_path)[0] + ".lkp"
+
+
+def _sha256(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def normalize_keys(values):
+    """Menormalkan nama lokasi/komoditas (strip + title case) seperti di lookup."""
+    return values.str.strip().str.title()
+
+
+def read_lookup_csv(path=LOOKUP_PATH):
+    """Membaca lookup CSV dan menormalkan nama lokasi/komoditas (strip + title case)."""
+    lookup = pd.read_csv(path)
+    for col in KEY_COLS:
+        lookup[col] = normalize_keys(lookup[col].astype(str)).astype("category")
+    return lookup
+
+
+def _float32_decimals(values):
+    """
+    Jumlah desimal jika kolom bisa disimpan float32 lalu dipulihkan persis ke nilai
+    aslinya dengan pembulatan; None jika tidak bisa (kolom disimpan apa adanya).
+    """
+    values = values.astype(np.float64)
+    for decimals in range(MAX_DECIMALS + 1):
+        if np.array_equal(np.round(values, decimals), values, equal_nan=True):
+            restored = np.round(values.astype(np.float32).astype(np.float64), decimals)
+            return decimals if np.array_equal(restored, values, equal_nan=True) else None
+    return None
+
+
+def build_lookup_binary(csv_path=LOOKUP_PATH, output_path=None):
+    """
+    Menulis lookup yang sudah dinormalkan ke file kolomnar. Hasilnya deterministik
+    (urutan baris mengikuti CSV, kategori terurut, tanpa timestamp) dan menyimpan
+    hash CSV sumber agar file yang kedaluwarsa bisa dikenali.
+    """
+    output_path = output_path or binary_path_for(csv_path)
+    lookup = read_lookup_csv(csv_path)
+    columns, restore = {}, {}
+    for col in lookup.columns:
+        values = lookup[col]
+        if col in KEY_COLS:
+            columns[col] = values
+            continue
+        values = values.to_numpy()
+        decimals = _float32_decimals(values)
+        if decimals is None:
+            columns[col] = values
+        else:
+            columns[col] = values.astype(np.float32)
+            restore[col] = {"dtype": values.dtype.str, "decimals": decimals}
+    write_columnar(output_path, columns, kind=LOOKUP_KIND, meta={
+        "source_sha256": _sha256(csv_path), "restore": restore,
+    })
+    return output_path
+
+
+def read_lookup_binary(path, mmap=True):
+    """Membaca file hasil build_lookup_binary. Mengembalikan (lookup, meta)."""
+    columns, meta = read_columnar(path, kind=LOOKUP_KIND, mmap=mmap)
+    for col, spec in meta["restore"].items():
+        # float32 -> nilai asli CSV (sudah diperiksa persis saat build)
+        columns[col] = np.round(columns[col].astype(np.float64), spec["decimals"]).astype(spec["dtype"])
+    return pd.DataFrame(columns, copy=False), meta
+
+
+def load_lookup_table(path=LOOKUP_PATH):
+    """
+    Lookup dengan kolom lokasi/komoditas bertipe kategori. Memakai file biner di
+    sebelah CSV jika ada dan dibangun dari CSV yang sama; selain itu membaca CSV.
+    """
+    binary_path = binary_path_for(path)
+    if os.path.exists(binary_path):
+        try:
+            lookup, meta = read_lookup_binary(binary_path)
+            if not os.path.exists(path) or meta["source_sha256"] == _sha256(path):
+                return lookup
+        except (ValueError, KeyError):
+            pass
+    return read_lookup_csv(path)
+
+
+class LookupIndex:
+    """
+    Indeks bertingkat province -> district -> commodity -> record yang dibangun
+    sekali dari lookup. Kunci di setiap tingkat sudah terurut, sehingga pilihan
+    widget dan nilai referensi cukup dibaca dari dict tanpa memfilter DataFrame.
+    """
+
+    def __init__(self, lookup_df):
+        # Untuk kombinasi ganda dipakai baris pertama, sama seperti filter row.iloc[0] dulu
+        lookup = lookup_df.drop_duplicates(subset=KEY_COLS).sort_values(KEY_COLS, kind="stable")
+        self.tree = {}
+        for record in lookup.to_dict("records"):
+            province, district, commodity = (record[col] for col in KEY_COLS)
+            self.tree.setdefault(province, {}).setdefault(district, {})[commodity] = record
+        self.n_records = len(lookup)
+
+    def __len__(self):
+        return self.n_records
+
+    def provinces(self):
+        return list(self.tree)
+
+    def districts(self, province):
+        return list(self.tree.get(province, {}))
+
+    def commodities(self, province, district):
+        return list(self.tree.get(province, {}).get(district, {}))
+
+    def record(self, province, district, commodity):
+        """Record lookup sebagai dict, atau None jika kombinasinya tidak ada."""
+        return self.tree.get(province, {}).get(district, {}).get(commodity)
+
+
+def input_row(province, district, commodity, area, defaults):
+    """Satu baris input model (dict) dari pilihan pengguna dan nilai referensinya."""
+    row = {"Province": province, "District": district, "Commodity": commodity, "Area_Ha": area}
+    for col in INPUT_COLS:
+        if col not in row:
+            row[col] = defaults.get(col, DEFAULT_INPUTS.get(col))
+    return {col: row[col] for col in INPUT_COLS}
+
+
+def input_frame(rows):
+    """DataFrame input model dari beberapa dict input_row(), dibangun sekaligus."""
+    return pd.DataFrame.from_records(rows, columns=INPUT_COLS)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Membangun file lookup biner (.lkp) dari lookup CSV")
+    parser.add_argument("csv", nargs="?", default=LOOKUP_PATH)
+    parser.add_argument("--output", help="default: nama CSV dengan ekstensi .lkp")
+    args = parser.parse_args()
+
+    output = build_lookup_binary(args.csv, args.output)
+    print(f"{args.csv} ({os.path.getsize(args.csv) / 1e3:.0f} kB) -> {output} ({os.path.getsize(output) / 1e3:.0f} kB)")
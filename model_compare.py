@@ -0,0 +1,138 @@
+# Perbandingan model regresi untuk training TUMBUH
+#
+# Preprocessor (FeatureBuilder + ColumnTransformer) hanya di-fit sekali per split,
+# bukan sekali untuk setiap (model, target). Matriks train/test hasil transformasi
+# ditulis sekali ke file .npy lalu dibuka read-only (memory map) oleh setiap worker,
+# dan setiap (model, target) dijalankan sebagai satu task di pool proses.
+
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.metrics import mean_squared_error, r2_score
+
+from features import FeatureBuilder
+
+
+LATENCY_REPEATS = 20
+
+# Matriks milik proses worker, dibuka sekali oleh _init_worker
+_worker_data = {}
+
+
+def prepare_matrices(preprocessor, X_train, X_test):
+    """
+    Fit FeatureBuilder + preprocessor sekali pada data train. Mengembalikan
+    (Xt_train, Xt_test, preprocessor_fitted) dengan matriks numpy float64.
+    """
+    builder = FeatureBuilder()
+    fitted = clone(preprocessor)
+    Xt_train = np.ascontiguousarray(fitted.fit_transform(builder.transform(X_train)), dtype=np.float64)
+    Xt_test = np.ascontiguousarray(fitted.transform(builder.transform(X_test)), dtype=np.float64)
+    return Xt_train, Xt_test, fitted
+
+
+def _init_worker(data_dir):
+    for name in ("X_train", "X_test", "y_train", "y_test"):
+        _worker_data[name] = np.load(os.path.join(data_dir, name + ".npy"), mmap_mode="r")
+
+
+def _with_threads(model, n_jobs):
+    # Core dibagi antara worker dan thread di dalam model agar tidak saling berebut
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=n_jobs)
+    return model
+
+
+def _is_ensemble(model):
+    return "n_estimators" in model.get_params()
+
+
+def evaluate_model(model, target_index, X_train=None, X_test=None, y_train=None, y_test=None):
+    """
+    Melatih dan mengevaluasi satu model untuk satu target. Tanpa argumen matriks,
+    memakai matriks worker (memory map) dari _init_worker.
+    """
+    X_train = _worker_data["X_train"] if X_train is None else X_train
+    X_test = _worker_data["X_test"] if X_test is None else X_test
+    y_train = (_worker_data["y_train"] if y_train is None else y_train)[:, target_index]
+    y_test = (_worker_data["y_test"] if y_test is None else y_test)[:, target_index]
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(X_test)
+    batch_s = time.perf_counter() - start
+
+    # Latensi satu baris (tanpa preprocessing), median dari beberapa pengulangan
+    row = np.array(X_test[:1])
+    latencies = []
+    for _ in range(LATENCY_REPEATS):
+        start = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - start)
+
+    return {
+        "R2_Score": r2_score(y_test, y_pred),
+        "RMSE": float(np.sqrt(mean_squared_error(y_test, y_pred))),
+        "Fit_s": fit_s,
+        "Predict_1_Row_ms": 1000 * float(np.median(latencies)),
+        "Predict_Test_s": batch_s,
+        "Size_MB": len(pickle.dumps(model)) / 1e6,
+    }
+
+
+def compare_models(models, Xt_train, Xt_test, y_train, y_test, targets, max_workers=None, threads_per_task=None):
+    """
+    Mengevaluasi setiap (model, target) secara paralel. models: {nama: estimator}
+    (belum di-fit); y_train/y_test: DataFrame berisi kolom targets.
+
+    Setiap model yang punya n_jobs memakai threads_per_task thread (default: jumlah
+    core dibagi jumlah worker). Model ensemble (paling lama) dikirim lebih dulu agar
+    tidak menjadi task terakhir yang ditunggu; jika perbandingan didominasi forest
+    besar, worker yang lebih sedikit dengan lebih banyak thread biasanya lebih cepat.
+
+    Mengembalikan DataFrame Target, Model, R2_Score, RMSE, Fit_s, Predict_1_Row_ms,
+    Predict_Test_s, Size_MB, diurutkan per target dari R2 tertinggi.
+    """
+    targets = list(targets)
+    tasks = [(target, name) for target in targets for name in models]
+    tasks.sort(key=lambda task: not _is_ensemble(models[task[1]]))
+    max_workers = min(max_workers or os.cpu_count(), len(tasks))
+    threads_per_task = threads_per_task or max(1, os.cpu_count() // max_workers)
+
+    data_dir = tempfile.mkdtemp(prefix="tumbuh_compare_")
+    try:
+        arrays = {
+            "X_train": Xt_train, "X_test": Xt_test,
+            "y_train": y_train[targets].to_numpy(dtype=np.float64),
+            "y_test": y_test[targets].to_numpy(dtype=np.float64),
+        }
+        for name, array in arrays.items():
+            np.save(os.path.join(data_dir, name + ".npy"), np.ascontiguousarray(array))
+
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(data_dir,)) as pool:
+            futures = [
+                pool.submit(evaluate_model, _with_threads(clone(models[name]), threads_per_task), targets.index(target))
+                for target, name in tasks
+            ]
+            rows = [
+                {"Target": target, "Model": name, **future.result()}
+                for (target, name), future in zip(tasks, futures)
+            ]
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    result = pd.DataFrame(rows)
+    result["Target"] = pd.Categorical(result["Target"], categories=targets, ordered=True)
+    result = result.sort_values(["Target", "R2_Score"], ascending=[True, False]).reset_index(drop=True)
+    result["Target"] = result["Target"].astype(str)
+    return result
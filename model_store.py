@@ -0,0 +1,479 @@
+# Unduh & muat artefak model TUMBUH dari S3
+#
+# Modul ini tidak bergantung pada Streamlit, sehingga bisa dipakai app.py maupun
+# skrip lain, dan bisa diuji dengan server HTTP lokal sebagai pengganti S3
+# (cukup ganti base_url). Artefak disimpan di cache lokal berbasis hash isi
+# (lihat ModelCache), bukan langsung di direktori kerja.
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import requests
+
+from features import with_feature_builder
+from forest_engine import FlatForest
+from prediction_table import PredictionTable
+from recommender import DELTA_SUFFIX, SimilarityRecommender
+
+
+S3_BASE_URL = "https://capstone-proyek-tumbuh-2025.s3.ap-southeast-2.amazonaws.com/"
+
+# Daftar nama file model Anda yang ada di S3
+MODEL_FILES = {
+    "production": "pipeline_Production_KgHa_final.pkl",
+    # Pipeline produksi yang sama, dikompilasi dengan forest_engine.py (prediksi cepat)
+    "production_forest": "pipeline_Production_KgHa_final.forest",
+    "capital": "pipeline_Init_Capital_RpHa_final.pkl",
+    "maintenance": "pipeline_Maintenance_Cost_RpHa_final.pkl",
+    "recommender": "model_rekomendasi_pupuk.bin", # Pastikan nama ini sama persis
+    # Prediksi production yang sudah dihitung untuk setiap baris lookup (prediction_table.py)
+    "production_table": "tabel_prediksi_produksi.tbl",
+}
+
+# Unduhan berjalan paralel; potongan 1 MB jauh lebih hemat overhead daripada 8 KB
+MAX_WORKERS = 4
+CHUNK_SIZE = 1 << 20
+TIMEOUT = (10, 60)
+
+# Cache lokal berbasis isi (content-addressed):
+#   blobs/<sha256>          isi artefak, nama file = hash isinya
+#   refs/<nama_file>.json   nama file S3 -> sha256, ETag, Last-Modified
+#   partial/<nama_file>     unduhan yang belum selesai (dilanjutkan dengan HTTP Range)
+CACHE_DIR = os.environ.get("TUMBUH_MODEL_CACHE", ".model_cache")
+
+# Satu lock per direktori cache: memindahkan blob, menulis ref dan prune() tidak boleh
+# bersilangan antar thread (preload mengunduh paralel), karena prune() menghapus blob
+# yang belum punya ref
+_cache_locks = {}
+_cache_locks_guard = threading.Lock()
+
+
+def _cache_lock(cache_dir):
+    with _cache_locks_guard:
+        return _cache_locks.setdefault(os.path.realpath(cache_dir), threading.RLock())
+
+
+class ModelDownloadError(RuntimeError):
+    def __init__(self, file_name, cause):
+        super().__init__(f"Gagal mengunduh {file_name}: {cause}")
+        self.file_name = file_name
+        self.cause = cause
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _hash_file(path, chunk_size=CHUNK_SIZE):
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+            md5.update(chunk)
+    return sha256, md5
+
+
+def _etag_md5(etag):
+    """ETag S3 adalah MD5 isi file, kecuali untuk upload multipart (mengandung '-')."""
+    value = (etag or "").strip('"')
+    return value if re.fullmatch(r"[0-9a-f]{32}", value) else None
+
+
+class ModelCache:
+    """Cache artefak lokal dengan unduhan atomik, resumable, dan revalidasi ETag."""
+
+    def __init__(self, cache_dir=CACHE_DIR, chunk_size=CHUNK_SIZE):
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self._lock = _cache_lock(cache_dir)
+        for sub in ("blobs", "refs", "partial"):
+            os.makedirs(os.path.join(cache_dir, sub), exist_ok=True)
+
+    def _ref_path(self, file_name):
+        return os.path.join(self.cache_dir, "refs", file_name + ".json")
+
+    def _blob_path(self, sha256):
+        return os.path.join(self.cache_dir, "blobs", sha256)
+
+    def fetch(self, file_name, url, optional=False):
+        """
+        Memastikan versi terbaru file_name ada di cache. Mengembalikan (path, status).
+
+        status: "hit" (server menjawab 304, salinan lokal masih terbaru), "downloaded",
+        "resumed" (melanjutkan unduhan yang terputus), atau "offline" (server tidak
+        bisa dihubungi, memakai salinan lokal terakhir). Dengan optional=True, file
+        yang tidak ada di server (403/404) menghasilkan (None, "missing") dan ref lokalnya
+        dihapus; jika server tidak bisa dihubungi dan belum ada salinan lokal, hasilnya
+        (None, "offline").
+        """
+        ref = _read_json(self._ref_path(file_name))
+        cached_path = self._blob_path(ref["sha256"]) if ref else None
+        if cached_path and not os.path.exists(cached_path):
+            ref = cached_path = None
+
+        part_path = os.path.join(self.cache_dir, "partial", file_name)
+        part_etag = (_read_json(part_path + ".json") or {}).get("etag")
+        offset = os.path.getsize(part_path) if part_etag and os.path.exists(part_path) else 0
+
+        # Satu request sekaligus untuk revalidasi dan melanjutkan unduhan:
+        #   304 -> salinan lokal masih terbaru
+        #   206 -> versi di server sama dengan sisa unduhan (If-Range), lanjutkan dari offset
+        #   200 -> unduh ulang dari awal
+        headers = {}
+        if ref and ref.get("etag"):
+            headers["If-None-Match"] = ref["etag"]
+        if ref and ref.get("last_modified"):
+            headers["If-Modified-Since"] = ref["last_modified"]
+        if offset:
+            headers["Range"] = f"bytes={offset}-"
+            headers["If-Range"] = part_etag
+
+        try:
+            with requests.get(url, headers=headers, stream=True, timeout=TIMEOUT) as r:
+                if r.status_code == 304 and cached_path:
+                    return cached_path, "hit"
+                # S3 menjawab 403 (bukan 404) untuk key yang tidak ada jika bucket tidak bisa di-list
+                if r.status_code in (403, 404) and optional:
+                    self.drop(file_name)
+                    return None, "missing"
+                # 416: offset tidak valid lagi (mis. file .part sebenarnya sudah lengkap);
+                # sisa unduhan dibuang dan diunduh ulang dari awal
+                if r.status_code == 416 and offset:
+                    self._discard_partial(part_path)
+                    return self.fetch(file_name, url, optional)
+                r.raise_for_status()
+                path = self._store(file_name, url, r, part_path, resume=r.status_code == 206)
+            return path, "resumed" if r.status_code == 206 else "downloaded"
+        except requests.exceptions.RequestException as e:
+            if cached_path:
+                return cached_path, "offline"
+            if optional:
+                return None, "offline"
+            raise ModelDownloadError(file_name, e) from e
+
+    def _store(self, file_name, url, response, part_path, resume):
+        etag = response.headers.get("ETag")
+        _write_json(part_path + ".json", {"etag": etag})
+
+        if resume:
+            # Hash dilanjutkan dari bagian yang sudah ada di disk
+            sha256, md5 = _hash_file(part_path, self.chunk_size)
+        else:
+            sha256, md5 = hashlib.sha256(), hashlib.md5()
+        # Jika koneksi putus di tengah jalan, file .part tetap ada untuk dilanjutkan
+        with open(part_path, "ab" if resume else "wb") as f:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                f.write(chunk)
+                sha256.update(chunk)
+                md5.update(chunk)
+
+        expected_md5 = _etag_md5(etag)
+        if expected_md5 and md5.hexdigest() != expected_md5:
+            os.remove(part_path)
+            raise ModelDownloadError(file_name, "checksum MD5 tidak cocok dengan ETag, file dihapus")
+
+        # Rename atomik: blob hanya muncul di cache setelah isinya lengkap dan terverifikasi.
+        # Ref ditulis di bawah lock yang sama dengan prune(), jadi blob baru tidak pernah
+        # terlihat tanpa ref oleh prune() thread lain.
+        digest = sha256.hexdigest()
+        blob_path = self._blob_path(digest)
+        with self._lock:
+            os.replace(part_path, blob_path)
+            os.remove(part_path + ".json")
+            _write_json(self._ref_path(file_name), {
+                "sha256": digest,
+                "etag": etag,
+                "last_modified": response.headers.get("Last-Modified"),
+                "size": os.path.getsize(blob_path),
+                "url": url,
+            })
+            self.prune()
+        return blob_path
+
+    def _discard_partial(self, part_path):
+        for path in (part_path, part_path + ".json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def drop(self, file_name):
+        """Melupakan file_name; blob-nya ikut terhapus oleh prune() jika tidak dirujuk lagi."""
+        ref_path = self._ref_path(file_name)
+        with self._lock:
+            if os.path.exists(ref_path):
+                os.remove(ref_path)
+                self.prune()
+
+    def verify(self, path):
+        """Memastikan isi blob masih sama dengan hash di namanya; blob rusak dihapus."""
+        sha256, _ = _hash_file(path, self.chunk_size)
+        if sha256.hexdigest() == os.path.basename(path):
+            return True
+        os.remove(path)
+        return False
+
+    def prune(self):
+        """Menghapus blob yang tidak lagi dirujuk oleh ref mana pun (versi model lama)."""
+        refs_dir = os.path.join(self.cache_dir, "refs")
+        blobs_dir = os.path.join(self.cache_dir, "blobs")
+        with self._lock:
+            referenced = {
+                (_read_json(os.path.join(refs_dir, name)) or {}).get("sha256")
+                for name in os.listdir(refs_dir) if name.endswith(".json")
+            }
+            for name in os.listdir(blobs_dir):
+                if name not in referenced:
+                    os.remove(os.path.join(blobs_dir, name))
+
+
+def load_artifact(path, file_name, delta_path=None):
+    """
+    Memuat satu artefak berdasarkan ekstensi nama file-nya: .bin (recommender kolomnar,
+    ditambah file delta-nya jika ada), .forest (pipeline hasil kompilasi
+    forest_engine.py), .tbl (tabel prediksi), selain itu joblib.
+    """
+    if file_name.endswith(".forest"):
+        return FlatForest.load(path)
+    if file_name.endswith(".tbl"):
+        return PredictionTable.load(path)
+    if file_name.endswith(".bin"):
+        model = SimilarityRecommender.load(path, delta_path=delta_path)
+        # Query yang sama (nilai default dari lookup) datang berulang dari banyak sesi
+        model.enable_cache(maxsize=4096)
+        return model
+    # Pipeline lama (tanpa langkah FeatureBuilder) tetap menerima input tanpa fitur turunan
+    return with_feature_builder(joblib.load(path))
+
+
+def fetch_model(file_name, base_url=S3_BASE_URL, cache_dir=CACHE_DIR, chunk_size=CHUNK_SIZE, verify=True):
+    """
+    Mengambil artefak lewat ModelCache lalu langsung memuatnya.
+
+    Mengembalikan (model, timing) dengan timing berisi status (lihat
+    ModelCache.fetch), download_s, load_s dan bytes. Dengan verify=True checksum
+    SHA-256 blob diperiksa sebelum deserialisasi; blob yang rusak diunduh ulang sekali.
+
+    Untuk recommender (.bin), file delta "<file_name>.delta" dari partial_fit() juga
+    diambil lewat cache jika ada di server.
+    """
+    path, delta_path, timing = fetch_artifact(file_name, base_url, cache_dir, chunk_size, verify)
+    start = time.perf_counter()
+    model = load_artifact(path, file_name, delta_path)
+    timing["load_s"] = time.perf_counter() - start
+    return model, timing
+
+
+def fetch_artifact(file_name, base_url=S3_BASE_URL, cache_dir=CACHE_DIR, chunk_size=CHUNK_SIZE, verify=True):
+    """
+    Bagian unduh dari fetch_model tanpa memuat model: mengembalikan (path, delta_path,
+    timing) untuk load_artifact(path, file_name, delta_path), mis. di proses lain.
+    """
+    cache = ModelCache(cache_dir, chunk_size)
+    timing = {"file": file_name}
+
+    start = time.perf_counter()
+    path, timing["status"] = _fetch_verified(cache, file_name, base_url, verify)
+    delta_path = None
+    if file_name.endswith(".bin"):
+        delta_path, _ = _fetch_verified(cache, file_name + DELTA_SUFFIX, base_url, verify, optional=True)
+    timing["download_s"] = time.perf_counter() - start
+    timing["bytes"] = os.path.getsize(path)
+    # Nama blob = SHA-256 isinya, jadi sekaligus menjadi identitas versi artefak
+    timing["version"] = _version(os.path.basename(path), delta_path and os.path.basename(delta_path))
+    return path, delta_path, timing
+
+
+def _fetch_verified(cache, file_name, base_url, verify, optional=False):
+    url = base_url + file_name
+    path, status = cache.fetch(file_name, url, optional)
+    if path and verify and not cache.verify(path):
+        path, status = cache.fetch(file_name, url, optional)
+        if path and not cache.verify(path):
+            raise ModelDownloadError(file_name, "checksum file cache tidak cocok")
+    return path, status
+
+
+def _version(base_sha256, delta_sha256=None):
+    return f"{base_sha256}+{delta_sha256}" if delta_sha256 else base_sha256
+
+
+def load_local(path):
+    """Memuat artefak dari file lokal; timing-nya berformat sama dengan fetch_model."""
+    start = time.perf_counter()
+    model = load_artifact(path, os.path.basename(path))
+    return model, {
+        "file": os.path.basename(path), "status": "local", "download_s": 0.0,
+        "bytes": os.path.getsize(path), "load_s": time.perf_counter() - start,
+        "version": _file_signature(path),
+    }
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+class ModelRegistry(Mapping):
+    """
+    Registry model yang malas (lazy): setiap model baru diunduh dan di-deserialize
+    saat pertama kali diakses, mis. models["production"].
+
+    Aman dipakai banyak thread: akses bersamaan ke model yang sama hanya memicu
+    satu kali pemuatan, sedangkan model yang berbeda bisa dimuat paralel. Iterasi
+    kunci tidak memuat apa pun; values()/items() memuat semua model.
+    """
+
+    def __init__(self, model_files=None, base_url=S3_BASE_URL, cache_dir=CACHE_DIR,
+                 chunk_size=CHUNK_SIZE, local_files=None):
+        self.model_files = dict(model_files or MODEL_FILES)
+        # {key: path} untuk memakai file lokal alih-alih S3 (mis. untuk uji lokal)
+        self.local_files = dict(local_files or {})
+        self.base_url = base_url
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self._models = {}
+        self._timings = {}
+        self._locks = {key: threading.Lock() for key in self.model_files}
+
+    def __getitem__(self, key):
+        if key not in self.model_files:
+            raise KeyError(key)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+        with self._locks[key]:
+            if key not in self._models:
+                if key in self.local_files:
+                    model, timing = load_local(self.local_files[key])
+                else:
+                    model, timing = fetch_model(
+                        self.model_files[key], self.base_url, self.cache_dir, self.chunk_size
+                    )
+                timing["memory_bytes"] = estimate_nbytes(model)
+                self._timings[key] = timing
+                self._models[key] = model
+            return self._models[key]
+
+    def __iter__(self):
+        return iter(self.model_files)
+
+    def __len__(self):
+        return len(self.model_files)
+
+    def __contains__(self, key):
+        # Mapping.__contains__ memanggil __getitem__, yang akan memuat modelnya
+        return key in self.model_files
+
+    def preload(self, keys=None, max_workers=MAX_WORKERS):
+        """Memuat beberapa model sekaligus secara paralel (default: semua)."""
+        keys = list(self.model_files if keys is None else keys)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for future in [pool.submit(self.__getitem__, key) for key in keys]:
+                future.result()
+        return self
+
+    def version(self, key):
+        """
+        Identitas versi artefak tanpa memuat modelnya: SHA-256 blob di cache (atau
+        ukuran+mtime untuk file lokal). None jika artefak belum pernah diunduh.
+        """
+        if key in self.local_files:
+            return _file_signature(self.local_files[key])
+        if key in self._timings:
+            return self._timings[key]["version"]
+        cache = ModelCache(self.cache_dir, self.chunk_size)
+        ref = _read_json(cache._ref_path(self.model_files[key]))
+        if not ref:
+            return None
+        delta_ref = _read_json(cache._ref_path(self.model_files[key] + DELTA_SUFFIX)) or {}
+        return _version(ref["sha256"], delta_ref.get("sha256"))
+
+    def timings(self):
+        """Timing (lihat fetch_model) untuk model yang sudah dimuat saja."""
+        return {key: self._timings[key] for key in self.model_files if key in self._timings}
+
+    def memory_report(self):
+        """
+        Jejak memori per model: {key: {loaded, file_bytes, memory_bytes, load_s}}.
+
+        memory_bytes adalah perkiraan dari array numpy dan node pohon di dalam model
+        (lihat estimate_nbytes); model yang belum diakses bernilai 0.
+        """
+        report = {}
+        for key in self.model_files:
+            timing = self._timings.get(key)
+            report[key] = {
+                "loaded": timing is not None,
+                "file_bytes": timing["bytes"] if timing else 0,
+                "memory_bytes": timing["memory_bytes"] if timing else 0,
+                "load_s": timing["load_s"] if timing else 0.0,
+            }
+        return report
+
+
+def estimate_nbytes(obj):
+    """
+    Perkiraan memori yang dipegang sebuah model (byte).
+
+    Menjumlahkan array numpy dan pohon sklearn yang bisa dijangkau dari atribut
+    objek. Array yang di-memory-map (mis. SimilarityRecommender hasil load) tidak
+    dihitung karena halamannya milik page cache, bukan memori proses.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or item is None or isinstance(item, (str, bytes, int, float, bool)):
+            continue
+        seen.add(id(item))
+
+        if isinstance(item, np.ndarray):
+            base = item
+            while isinstance(base, np.ndarray) and not isinstance(base, np.memmap):
+                base = base.base
+            if not isinstance(base, np.memmap):
+                total += item.nbytes
+                if item.dtype == object:
+                    stack.extend(item.ravel().tolist())
+        elif hasattr(item, "node_count") and hasattr(item, "capacity") and hasattr(item, "value"):
+            # sklearn.tree._tree.Tree: node disimpan di buffer C (64 byte per node)
+            total += item.capacity * 64 + item.value.nbytes
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, "__dict__"):
+            stack.extend(vars(item).values())
+    return total
+
+
+def format_timings(timings):
+    """Ringkasan waktu (dan memori, jika ada) per artefak dalam satu baris teks."""
+    parts = []
+    for key, t in timings.items():
+        source = {"hit": "cache", "offline": "cache (offline)", "local": "lokal"}.get(t["status"], f"unduh {t['download_s']:.1f}s")
+        text = f"{key}: {source}, muat {t['load_s']:.2f}s ({t['bytes'] / 1e6:.1f} MB"
+        if "memory_bytes" in t:
+            text += f", RAM {t['memory_bytes'] / 1e6:.1f} MB"
+        parts.append(text + ")")
+    return " | ".join(parts)
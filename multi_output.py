@@ -0,0 +1,58 @@
+# Satu model RandomForest multi-output untuk ketiga target regresi TUMBUH
+#
+# Production_KgHa, Init_Capital_RpHa dan Maintenance_Cost_RpHa memakai preprocessor
+# dan matriks fitur yang sama. Daripada tiga pipeline terpisah, satu forest
+# multi-output dilatih sekali dan memprediksi ketiga target dalam satu penelusuran
+# pohon. Target di-standardisasi (TransformedTargetRegressor) karena skalanya sangat
+# berbeda (kg vs rupiah); tanpa itu kriteria MSE hanya mengikuti target rupiah.
+#
+# Saat ini hanya dipakai di skrip training (perbandingan waktu, ukuran dan akurasi).
+# app.py, service.py dan batch_score.py hanya butuh target produksi dan tetap memuat
+# pipeline/tabel produksi dari MODEL_FILES; bundle multi-output belum disajikan.
+
+import pandas as pd
+from sklearn.compose import TransformedTargetRegressor
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+
+from features import FeatureBuilder
+
+
+PREDICTION_TARGETS = ["Production_KgHa", "Init_Capital_RpHa", "Maintenance_Cost_RpHa"]
+
+
+def build_pipeline(preprocessor, n_estimators=100, random_state=42, n_jobs=-1):
+    """Pipeline FeatureBuilder -> preprocessor -> RandomForest multi-output dengan target yang di-scale."""
+    return Pipeline(steps=[
+        ('features', FeatureBuilder()),
+        ('preprocessor', preprocessor),
+        ('model', TransformedTargetRegressor(
+            regressor=RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs),
+            transformer=StandardScaler(),
+        ))
+    ])
+
+
+class MultiOutputModel:
+    """
+    Pembungkus pipeline multi-output dengan nama target.
+
+    predict() mengembalikan array (baris x target); predict_all() mengembalikan
+    DataFrame berisi semua target.
+    """
+
+    def __init__(self, pipeline, targets=PREDICTION_TARGETS):
+        self.pipeline = pipeline
+        self.targets = list(targets)
+
+    def fit(self, X, y):
+        self.pipeline.fit(X, y[self.targets])
+        return self
+
+    def predict(self, X):
+        return self.pipeline.predict(X).reshape(len(X), len(self.targets))
+
+    def predict_all(self, X):
+        return pd.DataFrame(self.predict(X), index=X.index, columns=self.targets)
+
@@ -0,0 +1,112 @@
+# Memo hasil prediksi untuk seluruh proses (lintas rerun dan sesi Streamlit)
+#
+# Kunci memo adalah input pengguna yang dinormalkan (province, district, commodity,
+# area); nilai referensi lainnya ditentukan oleh kombinasi tersebut lewat lookup.
+# Ukuran memo dibatasi dengan LRU (lru.py). Jika path diberikan, memo disimpan ke
+# file JSON secara berkala dan saat proses berhenti, lalu dimuat lagi setelah
+# restart; file milik versi model/lookup yang lain diabaikan. Selama versi belum
+# diketahui (None), memo hanya ada di memori.
+
+import atexit
+import json
+import os
+import threading
+
+from lru import LRUCache
+
+
+MEMO_SIZE = 4096
+AREA_DECIMALS = 4
+SAVE_EVERY = 50
+
+_MISSING = object()
+
+
+def memo_key(province, district, commodity, area):
+    # Pembulatan menyatukan nilai float widget seperti 1.2000000000000002 dan 1.2
+    return (
+        str(province).strip().title(), str(district).strip().title(), str(commodity).strip().title(),
+        round(float(area), AREA_DECIMALS),
+    )
+
+
+class PredictionMemo:
+    """
+    Memo LRU thread-safe untuk hasil prediksi. Nilai yang disimpan harus bisa
+    di-serialize ke JSON jika memo dipersist ke disk.
+    """
+
+    def __init__(self, maxsize=MEMO_SIZE, path=None, version=None, save_every=SAVE_EVERY):
+        self.cache = LRUCache(maxsize)
+        self.path = path
+        self.version = version
+        self.save_every = save_every
+        self.loaded = 0
+        self._unsaved = 0
+        self._save_lock = threading.Lock()
+        if path:
+            self.load()
+            atexit.register(self.save)
+
+    def set_version(self, version):
+        """
+        Mengganti versi model/lookup. Jika versi lama sudah diketahui dan berbeda, isi
+        memo dibuang; entri dari disk untuk versi baru lalu dimuat.
+        """
+        if version == self.version:
+            return
+        if self.version is not None:
+            self.cache.clear()
+        self.version = version
+        if self.path:
+            self.load()
+
+    def get_or_compute(self, province, district, commodity, area, compute):
+        """
+        Hasil dari memo, atau compute(area) yang lalu disimpan ke memo. compute menerima
+        luas yang sudah dibulatkan (AREA_DECIMALS), sehingga nilai yang disimpan sama
+        untuk semua input yang berbagi kunci.
+        """
+        key = memo_key(province, district, commodity, area)
+        value = self.cache.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute(key[3])
+            self.cache.put(key, value)
+            with self._save_lock:
+                self._unsaved += 1
+                save_due = self._unsaved >= self.save_every
+            if save_due:
+                self.save()
+        return value
+
+    def info(self):
+        """Statistik LRU (hits, misses, hit_rate, size, maxsize) + jumlah entri dari disk."""
+        return {**self.cache.info(), "loaded": self.loaded}
+
+    def load(self):
+        if self.version is None:
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") != self.version:
+            return
+        # Disimpan dari yang paling lama dipakai, sehingga urutan LRU ikut pulih
+        for key, value in data["entries"]:
+            self.cache.put(tuple(key), value)
+        self.loaded = len(data["entries"])
+
+    def save(self):
+        """Menulis memo ke disk secara atomik (tidak dilakukan selama versi belum diketahui)."""
+        if not self.path or self.version is None:
+            return
+        with self._save_lock:
+            self._unsaved = 0
+            data = {"version": self.version, "entries": [[list(key), value] for key, value in self.cache.items()]}
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,168 @@
+# Tabel prediksi produksi yang sudah dihitung sebelumnya (materialized)
+#
+# Input yang dikirim app.py ke models["production"] hanya berasal dari satu baris
+# lookup_tabel.csv ditambah luas lahan (Area_Ha) dari pengguna. Jadi seluruh ruang
+# input = baris lookup x Area_Ha. Tabel ini menyimpan prediksi model untuk setiap
+# baris lookup pada grid Area_Ha, dan saat aplikasi berjalan nilai di antara titik
+# grid didapat dengan interpolasi linear, tanpa model di memori.
+
+import numpy as np
+import pandas as pd
+
+from columnar import read_columnar, write_columnar
+from features import FeatureBuilder
+from lookup import DEFAULT_INPUTS, KEY_COLS, load_lookup_table
+
+
+TABLE_KIND = "prediction_table"
+
+# Grid default mengikuti widget luas lahan di app.py (langkah 0.1 ha)
+AREA_MIN = 0.1
+AREA_MAX = 200.0
+AREA_STEP = 0.1
+
+
+def build_model_input(lookup_rows, area):
+    """
+    Menyusun input model prediksi dari baris lookup dan luas lahan, sama seperti
+    input_data_prediksi di app.py (fitur turunan dihitung FeatureBuilder).
+    """
+    data = lookup_rows.copy()
+    data["Area_Ha"] = area
+    for col, value in DEFAULT_INPUTS.items():
+        data[col] = data[col] if col in data.columns else value
+    return FeatureBuilder().transform(data)
+
+
+class PredictionTable:
+    """Prediksi (baris lookup x grid Area_Ha) dengan interpolasi linear di antara titik grid."""
+
+    def __init__(self, keys, values, area_min, area_step, report=None):
+        self.keys = keys
+        self.values = values
+        self.area_min = float(area_min)
+        self.area_step = float(area_step)
+        self.area_max = self.area_min + self.area_step * (values.shape[1] - 1)
+        self.report = report or {}
+        self._index = {key: i for i, key in enumerate(keys)}
+
+    @property
+    def grid(self):
+        return self.area_min + self.area_step * np.arange(self.values.shape[1])
+
+    @classmethod
+    def build(cls, model, lookup_df, area_min=AREA_MIN, area_max=AREA_MAX, area_step=AREA_STEP,
+              chunk_rows=50_000, n_check=20_000, random_state=42):
+        """
+        Menghitung prediksi model untuk setiap baris lookup di setiap titik grid.
+
+        model boleh berupa pipeline sklearn atau FlatForest (cukup punya predict()).
+        Setelah tabel jadi, galat interpolasi diukur terhadap model pada n_check
+        pasangan (baris, luas) acak di antara titik grid; hasilnya ada di .report.
+        """
+        lookup = lookup_df.drop_duplicates(subset=KEY_COLS).reset_index(drop=True)
+        grid = area_min + area_step * np.arange(int(round((area_max - area_min) / area_step)) + 1)
+
+        values = np.empty((len(lookup), len(grid)), dtype=np.float32)
+        rows_per_chunk = max(1, chunk_rows // len(grid))
+        for start in range(0, len(lookup), rows_per_chunk):
+            rows = lookup.iloc[start:start + rows_per_chunk]
+            # Baris diulang untuk setiap titik grid: urutannya (baris, luas)
+            repeated = rows.loc[rows.index.repeat(len(grid))].reset_index(drop=True)
+            inputs = build_model_input(repeated, np.tile(grid, len(rows)))
+            values[start:start + len(rows)] = np.asarray(model.predict(inputs)).reshape(len(rows), len(grid))
+
+        keys = list(zip(*(lookup[col] for col in KEY_COLS)))
+        table = cls(keys, values, area_min, area_step)
+        table.report = table.error_report(model, lookup, n_check=n_check, random_state=random_state)
+        return table
+
+    def error_report(self, model, lookup_df, n_check=20_000, random_state=42):
+        """Galat absolut interpolasi (kg/ha) terhadap model pada titik acak di luar grid."""
+        rng = np.random.default_rng(random_state)
+        lookup = lookup_df.drop_duplicates(subset=KEY_COLS).reset_index(drop=True)
+        rows = rng.integers(0, len(lookup), n_check)
+        areas = rng.uniform(self.area_min, self.area_max, n_check)
+        sample = lookup.iloc[rows].reset_index(drop=True)
+
+        exact = np.asarray(model.predict(build_model_input(sample, areas)), dtype=np.float64)
+        approx = self.lookup_many(sample, areas)
+        errors = np.abs(approx - exact)
+        return {
+            "n_check": int(n_check),
+            "max_abs_error": float(errors.max()),
+            "mean_abs_error": float(errors.mean()),
+            "p99_abs_error": float(np.quantile(errors, 0.99)),
+            "max_rel_error": float((errors / np.maximum(np.abs(exact), 1e-9)).max()),
+        }
+
+    def lookup(self, province, district, commodity, area):
+        """Prediksi hasil interpolasi, atau None jika kombinasi/luas di luar tabel."""
+        row = self._index.get((province, district, commodity))
+        if row is None or not (self.area_min <= area <= self.area_max):
+            return None
+        position = (area - self.area_min) / self.area_step
+        left = min(int(position), self.values.shape[1] - 2)
+        fraction = position - left
+        values = self.values[row]
+        return float(values[left] * (1 - fraction) + values[left + 1] * fraction)
+
+    def lookup_many(self, lookup_rows, areas):
+        """Versi batch lookup(); baris di luar tabel bernilai NaN."""
+        rows = np.array([self._index.get(key, -1) for key in zip(*(lookup_rows[col] for col in KEY_COLS))])
+        areas = np.asarray(areas, dtype=np.float64)
+        valid = (rows >= 0) & (areas >= self.area_min) & (areas <= self.area_max)
+
+        position = np.clip((areas - self.area_min) / self.area_step, 0, self.values.shape[1] - 1)
+        left = np.minimum(position.astype(np.int64), self.values.shape[1] - 2)
+        fraction = position - left
+        row = np.where(valid, rows, 0)
+        result = self.values[row, left] * (1 - fraction) + self.values[row, left + 1] * fraction
+        return np.where(valid, result, np.nan)
+
+    def save(self, path):
+        """Menyimpan tabel dalam format kolomnar (lihat columnar.py)."""
+        write_columnar(path, {
+            **{col: pd.Categorical([key[i] for key in self.keys]) for i, col in enumerate(KEY_COLS)},
+            'values': self.values,
+        }, kind=TABLE_KIND, meta={
+            "area_min": self.area_min, "area_step": self.area_step, "report": self.report,
+        })
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        columns, meta = read_columnar(path, kind=TABLE_KIND, mmap=mmap)
+        keys = list(zip(*(np.asarray(columns[col]).tolist() for col in KEY_COLS)))
+        return cls(keys, columns['values'], meta["area_min"], meta["area_step"], meta.get("report"))
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+    import time
+
+    import joblib
+
+    parser = argparse.ArgumentParser(description="Membangun tabel prediksi produksi (lookup x grid Area_Ha)")
+    parser.add_argument("model", help="pipeline .pkl atau FlatForest .forest")
+    parser.add_argument("--lookup", default="lookup_tabel.csv")
+    parser.add_argument("--output", default="tabel_prediksi_produksi.tbl")
+    parser.add_argument("--area-min", type=float, default=AREA_MIN)
+    parser.add_argument("--area-max", type=float, default=AREA_MAX)
+    parser.add_argument("--area-step", type=float, default=AREA_STEP)
+    args = parser.parse_args()
+
+    if args.model.endswith(".forest"):
+        from forest_engine import FlatForest
+        model = FlatForest.load(args.model)
+    else:
+        model = joblib.load(args.model)
+
+    lookup_df = load_lookup_table(args.lookup)
+
+    start = time.perf_counter()
+    table = PredictionTable.build(model, lookup_df, args.area_min, args.area_max, args.area_step)
+    table.save(args.output)
+    print(f"{len(table.keys)} baris x {table.values.shape[1]} titik grid dalam {time.perf_counter() - start:.0f} s "
+          f"-> {args.output} ({os.path.getsize(args.output) / 1e6:.1f} MB)")
+    print("Galat interpolasi terhadap model (kg/ha):", table.report)
@@ -0,0 +1,353 @@
+# Backend rekomendasi pupuk berbasis sketch kuantil (untuk dataset sangat besar)
+#
+# SimilarityRecommender menyimpan setiap baris data, sehingga memorinya tumbuh
+# linear dengan jumlah petani. QuantileSketchRecommender menyimpan satu sketch
+# kuantil bergaya KLL per sel (Commodity, Province, bin pH, bin suhu) dan pupuk:
+# memorinya O(k log(n/k)) per sel, bukan O(n), sel yang jarang diisi disimpan
+# persis (tidak pernah lebih besar dari data mentahnya), dan sketch dari beberapa
+# musim atau worker bisa digabung (merge) tanpa kehilangan batas galatnya.
+#
+# Belum dipakai app.py/service.py: data saat ini masih muat di SimilarityRecommender.
+# recommend()/recommend_many() memakai bentuk keluaran yang sama, jadi backend ini
+# bisa dipasang jika data historis tumbuh melebihi memori.
+
+import numpy as np
+import pandas as pd
+
+from columnar import read_columnar, write_columnar
+from recommender import DOSE_COLS, DOSE_KEYS, PH_WINDOW, REQUIRED_COLS, TEMP_WINDOW
+
+
+SKETCH_KIND = "quantile_sketch_recommender"
+SKETCH_K = 256
+
+
+class _Compactor:
+    """
+    Sketch kuantil untuk satu (sel, pupuk): levels[h] berisi nilai berbobot 2**h.
+
+    Level yang melebihi k nilai diurutkan lalu setiap nilai kedua naik ke level h+1
+    dengan bobot dua kali lipat. Satu pemadatan menggeser peringkat nilai mana pun
+    paling banyak 2**h, jadi error (jumlah 2**h dari semua pemadatan) adalah batas
+    deterministik galat peringkat. Offset ganjil/genap bergantian agar galat saling
+    menutup, bukan menumpuk ke satu arah.
+    """
+
+    __slots__ = ("levels", "n", "error", "_offset")
+
+    def __init__(self):
+        self.levels = []
+        self.n = 0
+        self.error = 0
+        self._offset = 0
+
+    def add(self, values, k):
+        if not len(values):
+            return
+        self._extend(0, np.asarray(values, dtype=np.float64))
+        self.n += len(values)
+        self._compact(k)
+
+    def merge(self, other, k):
+        for h, values in enumerate(other.levels):
+            self._extend(h, values)
+        self.n += other.n
+        self.error += other.error
+        self._compact(k)
+
+    def _extend(self, h, values):
+        while len(self.levels) <= h:
+            self.levels.append(np.empty(0, dtype=np.float64))
+        self.levels[h] = np.concatenate([self.levels[h], values])
+
+    def _compact(self, k):
+        h = 0
+        while h < len(self.levels):
+            level = self.levels[h]
+            if len(level) > k:
+                level = np.sort(level)
+                # Jumlah genap dipadatkan; satu nilai sisa (jika ganjil) tetap di level ini
+                m = len(level) - len(level) % 2
+                self._extend(h + 1, level[self._offset:m:2])
+                self.levels[h] = level[m:]
+                self.error += 2 ** h
+                self._offset ^= 1
+            h += 1
+
+    def weighted(self):
+        """(nilai, bobot) dari semua level."""
+        if not self.levels:
+            return np.empty(0), np.empty(0, dtype=np.int64)
+        return (np.concatenate(self.levels),
+                np.concatenate([np.full(len(v), 2 ** h, dtype=np.int64) for h, v in enumerate(self.levels)]))
+
+    def nbytes(self):
+        return sum(level.nbytes for level in self.levels)
+
+
+class QuantileSketchRecommender:
+    """
+    Pendekatan median dosis dari sketch kuantil per sel.
+
+    Jendela kemiripan recommend() (pH +-0.5, suhu +-2) didekati dengan sel-sel yang
+    titik tengah bin-nya berada di dalam jendela, lalu median dibaca dari gabungan
+    sketch sel tersebut. Galat dari sketch dibatasi dalam peringkat: median yang
+    dilaporkan berada di antara kuantil 0.5 - e dan 0.5 + e data sel-sel itu, dengan
+    e = rank_error_bound (0 selama setiap sel berisi paling banyak k nilai; tidak ada
+    pemotongan nilai dosis). Pendekatan jendela dengan sel menambah galat yang tidak
+    dibatasi (baris di bin tepi jendela bisa ikut atau tertinggal); ukur galat total
+    terhadap median eksak dengan error_report(), dan perkecil ph_bin_width/
+    temp_bin_width untuk menekannya.
+    """
+
+    def __init__(self, ph_bin_width=0.25, temp_bin_width=1.0, k=SKETCH_K):
+        self.ph_bin_width = ph_bin_width
+        self.temp_bin_width = temp_bin_width
+        self.k = k
+
+        self.n_rows = 0
+        self._cells = {}
+        self._segment_cells = {}
+        self._sketches = []
+        self._row_counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def is_fitted(self):
+        return self.n_rows > 0
+
+    def _config(self):
+        return {"ph_bin_width": self.ph_bin_width, "temp_bin_width": self.temp_bin_width, "k": self.k}
+
+    def fit(self, df):
+        self.__init__(**self._config())
+        return self.partial_fit(df)
+
+    def partial_fit(self, df):
+        """
+        Menambahkan data ke sketch. Bisa dipanggil berulang per potongan (chunk),
+        mis. dari pd.read_csv(..., chunksize=...), sehingga data tidak pernah perlu
+        dimuat seluruhnya ke memori.
+        """
+        if not all(col in df.columns for col in REQUIRED_COLS):
+            raise ValueError(f"DataFrame harus memiliki kolom: {', '.join(REQUIRED_COLS)}")
+
+        # Baris tanpa kategori atau tanpa pH/suhu tidak pernah masuk jendela kemiripan
+        data = df[REQUIRED_COLS].dropna(subset=['Commodity', 'Province', 'Soil_pH', 'Temp_C'])
+        if data.empty:
+            return self
+
+        ph_bin = np.floor(data['Soil_pH'].to_numpy(dtype=np.float64) / self.ph_bin_width).astype(np.int64)
+        temp_bin = np.floor(data['Temp_C'].to_numpy(dtype=np.float64) / self.temp_bin_width).astype(np.int64)
+        keys = pd.MultiIndex.from_arrays([
+            data['Commodity'].to_numpy(), data['Province'].to_numpy(), ph_bin, temp_bin,
+        ])
+        # local: nomor sel di antara sel yang tersentuh potongan data ini
+        local, touched = keys.factorize()
+        cell_index = self._cell_indices(list(touched))
+        counts = np.bincount(local, minlength=len(touched))
+        self._row_counts[cell_index] += counts
+
+        # Baris dikelompokkan per sel sekali, lalu setiap sketch menerima potongannya
+        order = np.argsort(local, kind='stable')
+        doses = data[DOSE_COLS].to_numpy(dtype=np.float64)[order]
+        for cell, block in zip(cell_index, np.split(doses, np.cumsum(counts)[:-1])):
+            for sketch, values in zip(self._sketches[cell], block.T):
+                sketch.add(values[~np.isnan(values)], self.k)
+
+        self.n_rows += len(data)
+        return self
+
+    def _cell_indices(self, cell_keys):
+        """Indeks sketch untuk setiap kunci sel; sel baru ditambahkan di akhir."""
+        indices = np.empty(len(cell_keys), dtype=np.int64)
+        new_cells = 0
+        for i, key in enumerate(cell_keys):
+            index = self._cells.get(key)
+            if index is None:
+                index = len(self._cells)
+                self._cells[key] = index
+                self._segment_cells.setdefault(key[:2], []).append(index)
+                self._sketches.append([_Compactor() for _ in DOSE_COLS])
+                new_cells += 1
+            indices[i] = index
+        if new_cells:
+            self._row_counts = np.concatenate([self._row_counts, np.zeros(new_cells, dtype=np.int64)])
+        return indices
+
+    def merge(self, other):
+        """Menggabungkan sketch lain (mis. dari musim atau worker lain) ke sketch ini."""
+        if other._config() != self._config():
+            raise ValueError("Sketch hanya bisa digabung jika konfigurasinya sama.")
+        keys = list(other._cells.keys())
+        if keys:
+            target = self._cell_indices(keys)
+            for cell, key in zip(target, keys):
+                source = other._cells[key]
+                for sketch, other_sketch in zip(self._sketches[cell], other._sketches[source]):
+                    sketch.merge(other_sketch, self.k)
+                self._row_counts[cell] += other._row_counts[source]
+        self.n_rows += other.n_rows
+        return self
+
+    def memory_bytes(self):
+        """Memori nilai sketch dan jumlah baris per sel (tanpa overhead objek Python)."""
+        return int(sum(s.nbytes() for cell in self._sketches for s in cell) + self._row_counts.nbytes)
+
+    def _window(self, commodity, province, soil_ph, temp_c):
+        """(sel, sumber_data) untuk satu query, atau None jika segmennya tidak ada."""
+        segment_cells = self._segment_cells.get((commodity, province))
+        if segment_cells is None:
+            return None
+        ph_bins = _bins_in_window(soil_ph, PH_WINDOW, self.ph_bin_width)
+        temp_bins = _bins_in_window(temp_c, TEMP_WINDOW, self.temp_bin_width)
+        window_cells = [
+            self._cells[key]
+            for key in ((commodity, province, i, j) for i in ph_bins for j in temp_bins)
+            if key in self._cells
+        ]
+        if window_cells:
+            return window_cells, "data yang sangat mirip"
+        return segment_cells, "data provinsi secara umum"
+
+    def _medians(self, cells):
+        """Median per pupuk dan batas galat peringkat (pecahan, terbesar antar pupuk) dari sel-sel."""
+        medians = np.full(len(DOSE_COLS), np.nan)
+        bound = 0.0
+        for k in range(len(DOSE_COLS)):
+            sketches = [self._sketches[cell][k] for cell in cells]
+            n = sum(s.n for s in sketches)
+            if not n:
+                continue
+            parts = [s.weighted() for s in sketches]
+            values = np.concatenate([v for v, _ in parts])
+            order = np.argsort(values, kind='stable')
+            ranks = np.cumsum(np.concatenate([w for _, w in parts])[order])
+            values = values[order]
+            # Sama dengan median biasa jika tidak ada pemadatan (semua bobot 1)
+            lower = values[np.argmax(ranks > (n - 1) // 2)]
+            upper = values[np.argmax(ranks > n // 2)]
+            medians[k] = (lower + upper) / 2
+            bound = max(bound, sum(s.error for s in sketches) / n)
+        return medians, bound
+
+    def recommend(self, commodity, province, soil_ph, temp_c):
+
+        if not self.is_fitted:
+            raise RuntimeError("Model harus di-'fit' terlebih dahulu dengan data sebelum memberikan rekomendasi.")
+
+        window = self._window(commodity, province, soil_ph, temp_c)
+        if window is None:
+            return {"status": "error", "message": f"Tidak ada data historis untuk '{commodity}' di provinsi '{province}'."}
+        cells, source_data = window
+        medians, _ = self._medians(cells)
+        n_farmers = int(self._row_counts[cells].sum())
+
+        return {
+            "status": "success",
+            "rekomendasi": dict(zip(DOSE_KEYS, medians.tolist())),
+            "sumber_data": f"Berdasarkan {n_farmers} petani dengan {source_data} (perkiraan sketch)."
+        }
+
+    def recommend_many(self, queries_df):
+        """
+        Versi batch recommend() dengan kolom keluaran seperti SimilarityRecommender.recommend_many,
+        ditambah rank_error_bound (batas galat peringkat median dari sketch, pecahan 0-1).
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Model harus di-'fit' terlebih dahulu dengan data sebelum memberikan rekomendasi.")
+        records = []
+        for commodity, province, soil_ph, temp_c in zip(
+            queries_df['Commodity'], queries_df['Province'], queries_df['Soil_pH'], queries_df['Temp_C']
+        ):
+            window = self._window(commodity, province, soil_ph, temp_c)
+            if window is None:
+                records.append({"status": "error", **dict.fromkeys(DOSE_KEYS, np.nan), "rank_error_bound": np.nan})
+                continue
+            cells, source_data = window
+            medians, bound = self._medians(cells)
+            records.append({
+                "status": "success", **dict(zip(DOSE_KEYS, medians.tolist())),
+                "sumber_data": source_data, "jumlah_petani": int(self._row_counts[cells].sum()),
+                "rank_error_bound": bound,
+            })
+        columns = ["status"] + DOSE_KEYS + ["sumber_data", "jumlah_petani", "rank_error_bound"]
+        result = pd.DataFrame(records, index=queries_df.index, columns=columns)
+        result["jumlah_petani"] = result["jumlah_petani"].fillna(0).astype(np.int64)
+        return result
+
+    def error_report(self, exact_recommender, queries_df):
+        """
+        Membandingkan median sketch dengan median eksak dari SimilarityRecommender.
+
+        Mengembalikan DataFrame per pupuk berisi galat absolut maksimum, rata-rata dan
+        persentil 95 (kg/ha) yang terukur (galat total: sketch dan pendekatan jendela
+        dengan sel), beserta max_rank_error_bound: batas galat peringkat sketch
+        terbesar di antara query (pecahan 0-1, di luar galat pendekatan jendela).
+        """
+        exact = exact_recommender.recommend_many(queries_df)
+        approx = self.recommend_many(queries_df)
+        both = (exact['status'] == "success") & (approx['status'] == "success")
+        errors = (approx.loc[both, DOSE_KEYS] - exact.loc[both, DOSE_KEYS]).abs()
+        return pd.DataFrame({
+            "max_abs_error": errors.max(),
+            "mean_abs_error": errors.mean(),
+            "p95_abs_error": errors.quantile(0.95),
+            "max_rank_error_bound": approx.loc[both, "rank_error_bound"].max(),
+            "n_queries": int(both.sum()),
+        })
+
+    def save(self, path):
+        """Menyimpan sketch dalam format kolomnar (lihat columnar.py)."""
+        keys = list(self._cells.keys())
+        order = [self._cells[k] for k in keys]
+        sketches = [self._sketches[cell] for cell in order]
+        # Nilai semua level disimpan berurutan per (sel, pupuk, level); panjang tiap
+        # potongan ada di run_length
+        runs = [
+            (i, k, h, values)
+            for i, cell in enumerate(sketches) for k, sketch in enumerate(cell)
+            for h, values in enumerate(sketch.levels)
+        ]
+        write_columnar(path, {
+            'Commodity': pd.Categorical([k[0] for k in keys]),
+            'Province': pd.Categorical([k[1] for k in keys]),
+            'ph_bin': np.array([k[2] for k in keys], dtype=np.int64),
+            'temp_bin': np.array([k[3] for k in keys], dtype=np.int64),
+            'rows': self._row_counts[np.asarray(order, dtype=np.int64)],
+            'n': np.array([[s.n for s in cell] for cell in sketches], dtype=np.int64).reshape(-1, len(DOSE_COLS)),
+            'error': np.array([[s.error for s in cell] for cell in sketches],
+                              dtype=np.int64).reshape(-1, len(DOSE_COLS)),
+            'run_cell': np.array([r[0] for r in runs], dtype=np.int64),
+            'run_dose': np.array([r[1] for r in runs], dtype=np.int8),
+            'run_level': np.array([r[2] for r in runs], dtype=np.int8),
+            'run_length': np.array([len(r[3]) for r in runs], dtype=np.int64),
+            'values': np.concatenate([r[3] for r in runs]) if runs else np.empty(0),
+        }, kind=SKETCH_KIND, meta={"dose_cols": DOSE_COLS, "n_rows": self.n_rows, **self._config()})
+
+    @classmethod
+    def load(cls, path):
+        columns, meta = read_columnar(path, kind=SKETCH_KIND, mmap=False)
+        if meta.get("dose_cols") != DOSE_COLS:
+            raise ValueError(f"Kolom dosis di '{path}' tidak sesuai: {meta.get('dose_cols')}")
+        sketch = cls(ph_bin_width=meta["ph_bin_width"], temp_bin_width=meta["temp_bin_width"], k=meta["k"])
+        keys = list(zip(
+            np.asarray(columns['Commodity']), np.asarray(columns['Province']),
+            columns['ph_bin'].tolist(), columns['temp_bin'].tolist(),
+        ))
+        sketch._cell_indices(keys)
+        sketch._row_counts[:] = columns['rows']
+        for cell, (ns, errors) in enumerate(zip(columns['n'], columns['error'])):
+            for s, n, error in zip(sketch._sketches[cell], ns, errors):
+                s.n, s.error = int(n), int(error)
+        values = np.split(np.asarray(columns['values'], dtype=np.float64), np.cumsum(columns['run_length'])[:-1])
+        for cell, k, h, run in zip(columns['run_cell'], columns['run_dose'], columns['run_level'], values):
+            sketch._sketches[cell][k]._extend(int(h), run)
+        sketch.n_rows = meta["n_rows"]
+        return sketch
+
+
+def _bins_in_window(center, half_width, bin_width):
+    """Nomor bin yang titik tengahnya berada di [center - half_width, center + half_width]."""
+    first = int(np.ceil((center - half_width) / bin_width - 0.5))
+    last = int(np.floor((center + half_width) / bin_width - 0.5))
+    return range(first, last + 1)
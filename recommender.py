@@ -0,0 +1,631 @@
+# Model rekomendasi pupuk TUMBUH
+#
+# Class ini dipakai bersama oleh app.py (serving) dan "Model ML/capstone_tumbuh.py"
+# (training), supaya logika rekomendasi tidak lagi ditulis dua kali.
+
+import hashlib
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from sklearn.neighbors import KDTree
+
+from columnar import read_columnar, write_columnar
+from lru import LRUCache
+
+
+REQUIRED_COLS = [
+    'Commodity', 'Province', 'Soil_pH', 'Temp_C',
+    'Pupuk_Urea_kgHa', 'Pupuk_SP36_kgHa', 'Pupuk_KCl_kgHa'
+]
+DOSE_COLS = ['Pupuk_Urea_kgHa', 'Pupuk_SP36_kgHa', 'Pupuk_KCl_kgHa']
+DOSE_KEYS = ['urea_kg_ha', 'sp36_kg_ha', 'kcl_kg_ha']
+
+PH_WINDOW = 0.5
+TEMP_WINDOW = 2
+
+# Fitur yang boleh dipakai mode k-NN, beserta nama argumen query di recommend()
+KNN_FEATURES = {
+    'Soil_pH': 'soil_ph',
+    'Temp_C': 'temp_c',
+    'Rain_mm': 'rain_mm',
+    'Humidity_pct': 'humidity_pct',
+}
+KNN_SOURCE = "kondisi tanah & iklim paling mirip (k-NN)"
+# Mencegah pembagian nol pada bobot 1/jarak untuk tetangga yang identik
+KNN_EPS = 1e-6
+
+ARTIFACT_KIND = "similarity_recommender"
+DELTA_KIND = "similarity_recommender_delta"
+# File delta (baris tambahan dari partial_fit) disimpan di samping artefak utama
+DELTA_SUFFIX = ".delta"
+
+# Batas jumlah sel (query x baris) yang diproses sekaligus di recommend_many
+BATCH_CELLS = 1 << 22
+
+
+class SimilarityRecommender:
+    """
+    Rekomendasi dosis pupuk dari data petani dengan kondisi serupa.
+
+    mode="window" (default) memakai median dari data (Commodity, Province) yang sama
+    dengan pH +-0.5 dan suhu +-2 derajat, dengan fallback ke seluruh data provinsi.
+    mode="knn" memakai median berbobot jarak dari n_neighbors petani terdekat per
+    komoditas (KD-tree di atas knn_features yang distandarkan), sehingga jumlah data
+    pembanding selalu cukup dan tidak ada lompatan ke fallback provinsi.
+    """
+
+    def __init__(self, mode="window", n_neighbors=50, knn_features=('Soil_pH', 'Temp_C'),
+                 cache_size=0, ph_decimals=2, temp_decimals=1):
+        if mode not in ("window", "knn"):
+            raise ValueError(f"mode harus 'window' atau 'knn', bukan '{mode}'.")
+        unknown = [f for f in knn_features if f not in KNN_FEATURES]
+        if unknown:
+            raise ValueError(f"Fitur k-NN tidak dikenal: {', '.join(unknown)}")
+        self.mode = mode
+        self.n_neighbors = n_neighbors
+        self.knn_features = tuple(knn_features)
+        self.is_fitted = False
+        # SHA-256 artefak dasar untuk model hasil load(); file delta terikat ke hash ini
+        self.base_sha256 = None
+        self._cache = None
+        if cache_size:
+            self.enable_cache(cache_size, ph_decimals, temp_decimals)
+
+    def enable_cache(self, maxsize=4096, ph_decimals=2, temp_decimals=1):
+        """
+        Mengaktifkan cache LRU hasil recommend() di dalam objek model.
+
+        Kunci cache adalah (commodity, province, pH, suhu) dengan pH/suhu dibulatkan ke
+        jumlah desimal yang diberikan, dan rekomendasi dihitung dari nilai yang sudah
+        dibulatkan. Defaultnya sama dengan presisi lookup_tabel.csv, jadi hasil untuk
+        input dari lookup tidak berubah. Karena model dimuat sekali per proses
+        (st.cache_resource), cache ini dipakai bersama oleh semua sesi.
+        """
+        self._cache = LRUCache(maxsize)
+        self._ph_decimals = ph_decimals
+        self._temp_decimals = temp_decimals
+        return self
+
+    def cache_info(self):
+        """Statistik cache (hits, misses, hit_rate, size, maxsize) atau None jika cache tidak aktif."""
+        return self._cache.info() if self._cache is not None else None
+
+    def cache_clear(self):
+        if self._cache is not None:
+            self._cache.clear()
+
+    @property
+    def _extra_features(self):
+        """Fitur k-NN di luar Soil_pH/Temp_C yang perlu disimpan bersama data."""
+        if self.mode != "knn":
+            return []
+        return [f for f in self.knn_features if f not in REQUIRED_COLS]
+
+    def _prepare_rows(self, df):
+        # Memastikan semua kolom yang dibutuhkan ada
+        required_cols = REQUIRED_COLS + self._extra_features
+        if not all(col in df.columns for col in required_cols):
+            raise ValueError(f"DataFrame harus memiliki kolom: {', '.join(required_cols)}")
+
+        # Data diurutkan per (Commodity, Province) lalu Soil_pH, sehingga setiap
+        # kombinasi menjadi satu segmen berurutan yang bisa di-binary search.
+        # Baris tanpa Commodity/Province tidak pernah cocok dengan query, jadi dibuang.
+        return (
+            df[required_cols]
+            .dropna(subset=['Commodity', 'Province'])
+            .sort_values(['Commodity', 'Province', 'Soil_pH'], kind='mergesort')
+            .reset_index(drop=True)
+        )
+
+    def fit(self, df):
+        data = self._prepare_rows(df)
+        self._set_arrays(
+            commodity=pd.Categorical(data['Commodity']),
+            province=pd.Categorical(data['Province']),
+            ph=data['Soil_pH'].to_numpy(dtype=np.float64),
+            temp=data['Temp_C'].to_numpy(dtype=np.float64),
+            doses=data[DOSE_COLS].to_numpy(dtype=np.float64),
+            extra={f: data[f].to_numpy(dtype=np.float64) for f in self._extra_features},
+        )
+        self.is_fitted = True
+
+        return self
+
+    def partial_fit(self, new_rows, delta_path=None):
+        """
+        Menambahkan data petani baru tanpa membangun ulang seluruh model.
+
+        Hanya segmen (Commodity, Province) yang mendapat baris baru yang diurutkan
+        ulang; segmen lain disalin apa adanya, dan pada mode k-NN hanya KD-tree
+        komoditas yang terdampak yang dibangun ulang. Jika delta_path diberikan,
+        baris baru juga ditambahkan ke file delta tersebut (biasanya
+        "<artefak>.delta") setelah model di memori diperbarui. Delta terikat ke hash
+        artefak dasar, jadi hanya bisa dipakai untuk model hasil load(); load()
+        menerapkannya otomatis hanya pada artefak dasar yang sama.
+        """
+        new = self._prepare_rows(new_rows)
+        base_sha256 = getattr(self, "base_sha256", None)
+        if delta_path is not None and base_sha256 is None:
+            raise ValueError("delta_path hanya bisa dipakai untuk model hasil load(); save() lalu load() dulu.")
+        self._merge_rows(new)
+        if delta_path is not None and len(new):
+            _append_delta(delta_path, new, self._extra_features, base_sha256)
+        return self
+
+    def _merge_rows(self, new):
+        if not self.is_fitted:
+            return self.fit(new)
+        if new.empty:
+            return self
+
+        base_len = len(self._ph)
+        new_groups = new.groupby(['Commodity', 'Province'], sort=False).indices
+        commodity_cats = self._commodity.categories.union(pd.Index(new['Commodity'].unique()))
+        province_cats = self._province.categories.union(pd.Index(new['Province'].unique()))
+
+        # Kolom lama dan baru digabung sekali, lalu disusun ulang dengan satu indeks
+        # gather; urutan segmen tetap terurut menurut (Commodity, Province).
+        ph = np.concatenate([self._ph, new['Soil_pH'].to_numpy(dtype=np.float64)])
+        order, c_codes, p_codes = [], [], []
+        for key in sorted(set(self._segments) | set(new_groups)):
+            start, stop = self._segments.get(key, (0, 0))
+            piece = np.arange(start, stop)
+            if key in new_groups:
+                piece = np.concatenate([piece, base_len + new_groups[key]])
+                piece = piece[np.argsort(ph[piece], kind='stable')]
+            order.append(piece)
+            c_codes.append(np.full(len(piece), commodity_cats.get_loc(key[0])))
+            p_codes.append(np.full(len(piece), province_cats.get_loc(key[1])))
+        order = np.concatenate(order)
+
+        def merged(old, new_values):
+            return np.concatenate([old, np.asarray(new_values, dtype=np.float64)])[order]
+
+        self._set_arrays(
+            commodity=pd.Categorical.from_codes(np.concatenate(c_codes), categories=commodity_cats),
+            province=pd.Categorical.from_codes(np.concatenate(p_codes), categories=province_cats),
+            ph=ph[order],
+            temp=merged(self._temp, new['Temp_C']),
+            doses=merged(self._doses, new[DOSE_COLS]),
+            extra={f: merged(self._extra[f], new[f]) for f in self._extra_features},
+            knn_rebuild=set(new['Commodity'].unique()),
+        )
+        return self
+
+    def _set_arrays(self, commodity, province, ph, temp, doses, extra=None, knn_rebuild=None):
+        """Menyimpan kolom data terurut dan membangun indeks segmen (Commodity, Province) -> (awal, akhir)."""
+        # Data berubah, jadi hasil yang sudah di-cache tidak berlaku lagi
+        self.cache_clear()
+        self._commodity = commodity
+        self._province = province
+        self._ph = ph
+        self._temp = temp
+        self._doses = doses
+        self._extra = extra or {}
+
+        c_codes, p_codes = commodity.codes, province.codes
+        changes = np.flatnonzero((c_codes[1:] != c_codes[:-1]) | (p_codes[1:] != p_codes[:-1])) + 1
+        starts = np.r_[0, changes] if len(c_codes) else np.array([], dtype=np.int64)
+        stops = np.r_[changes, len(c_codes)] if len(c_codes) else np.array([], dtype=np.int64)
+        keys = zip(
+            commodity.categories[c_codes[starts]],
+            province.categories[p_codes[starts]],
+        )
+        self._segments = {key: (int(a), int(b)) for key, a, b in zip(keys, starts, stops)}
+
+        if self.mode == "knn":
+            self._build_knn(only=knn_rebuild)
+
+    def _feature(self, name):
+        return {'Soil_pH': self._ph, 'Temp_C': self._temp}.get(name, self._extra.get(name))
+
+    def _build_knn(self, only=None):
+        """
+        Membangun satu KD-tree per komoditas di atas fitur k-NN yang distandarkan.
+
+        Jika only diberikan, hanya komoditas tersebut yang dibangun ulang; tree
+        komoditas lain dipakai lagi dengan posisi awal yang diperbarui.
+        """
+        previous = self.__dict__.get('_knn', {}) if only is not None else {}
+        self._knn = {}
+        codes = self._commodity.codes
+        changes = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+        starts, stops = np.r_[0, changes], np.r_[changes, len(codes)]
+        features = np.column_stack([self._feature(f) for f in self.knn_features])
+
+        for a, b in zip(starts, stops):
+            if a == b:
+                continue
+            commodity = self._commodity.categories[codes[a]]
+            if commodity in previous and commodity not in only:
+                self._knn[commodity] = previous[commodity][:4] + (int(a),)
+                continue
+            block = features[a:b]
+            complete = ~np.isnan(block).any(axis=1)
+            if not complete.any():
+                continue
+            points = block[complete]
+            mean = points.mean(axis=0)
+            scale = points.std(axis=0)
+            scale[scale == 0] = 1.0
+            # rows memetakan indeks titik di tree ke posisi baris, relatif terhadap
+            # awal rentang komoditas (offset) agar tree tetap valid saat data bergeser
+            rows = np.flatnonzero(complete)
+            self._knn[commodity] = (KDTree((points - mean) / scale), rows, mean, scale, int(a))
+
+    def _knn_query(self, commodity, points):
+        """Median dosis berbobot jarak dari k tetangga terdekat untuk setiap titik query."""
+        tree, rows, mean, scale, offset = self._knn[commodity]
+        if np.isnan(points).any():
+            raise ValueError(f"Nilai fitur k-NN ({', '.join(self.knn_features)}) tidak boleh kosong.")
+        k = min(self.n_neighbors, len(rows))
+        distances, neighbours = tree.query((points - mean) / scale, k=k)
+        weights = 1.0 / (distances + KNN_EPS)
+        return _weighted_median(self._doses[offset + rows[neighbours]], weights), k
+
+    @property
+    def dataset(self):
+        """Data historis dalam bentuk DataFrame (dibangun dari array internal)."""
+        if not self.is_fitted:
+            return None
+        data = pd.DataFrame({
+            'Commodity': self._commodity,
+            'Province': self._province,
+            'Soil_pH': self._ph,
+            'Temp_C': self._temp,
+        })
+        data[DOSE_COLS] = self._doses
+        for name, values in self._extra.items():
+            data[name] = values
+        return data
+
+    def _config(self):
+        return {"mode": self.mode, "n_neighbors": self.n_neighbors, "knn_features": list(self.knn_features)}
+
+    def __getstate__(self):
+        # Indeks dan KD-tree tidak ikut disimpan di pickle; dibangun ulang saat dimuat.
+        return {"dataset": self.dataset, "is_fitted": self.is_fitted, **self._config()}
+
+    def __setstate__(self, state):
+        # Juga menangani pickle lama (sebelum ada indeks) yang hanya berisi dataset.
+        self.__init__(
+            mode=state.get("mode", "window"),
+            n_neighbors=state.get("n_neighbors", 50),
+            knn_features=state.get("knn_features", ('Soil_pH', 'Temp_C')),
+        )
+        if state.get("is_fitted"):
+            self.fit(state["dataset"])
+
+    def save(self, path, dose_dtype=np.float32):
+        """
+        Menyimpan model ke format kolomnar berversi (lihat columnar.py), tanpa pickle.
+
+        Commodity/Province disimpan sebagai kode kategori. Soil_pH dan Temp_C tetap
+        float64 karena batas jendela kemiripan harus sama persis (data dan query ada
+        di grid desimal yang sama); kolom dosis disimpan sebagai float32 secara default
+        sehingga median sama sampai presisi float32. Gunakan dose_dtype=np.float64
+        untuk hasil yang identik bit-per-bit.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Model harus di-'fit' terlebih dahulu sebelum disimpan.")
+        write_columnar(path, {
+            'Commodity': self._commodity,
+            'Province': self._province,
+            'Soil_pH': self._ph,
+            'Temp_C': self._temp,
+            'doses': self._doses.astype(dose_dtype),
+            **self._extra,
+        }, kind=ARTIFACT_KIND, meta={"dose_cols": DOSE_COLS, **self._config()})
+
+    @classmethod
+    def load(cls, path, mmap=True, delta_path=None):
+        """
+        Memuat model dari file hasil save(); dengan mmap=True data tidak disalin ke memori.
+
+        File delta dari partial_fit() (default "<path>.delta") diterapkan jika ada dan
+        dibuat untuk artefak dasar yang sama; delta untuk artefak lain diabaikan.
+        """
+        columns, meta = read_columnar(path, kind=ARTIFACT_KIND, mmap=mmap)
+        if meta.get("dose_cols") != DOSE_COLS:
+            raise ValueError(f"Kolom dosis di '{path}' tidak sesuai: {meta.get('dose_cols')}")
+        model = cls(
+            mode=meta.get("mode", "window"),
+            n_neighbors=meta.get("n_neighbors", 50),
+            knn_features=meta.get("knn_features", ('Soil_pH', 'Temp_C')),
+        )
+        model._set_arrays(
+            commodity=columns['Commodity'],
+            province=columns['Province'],
+            ph=columns['Soil_pH'],
+            temp=columns['Temp_C'],
+            doses=columns['doses'],
+            extra={f: columns[f] for f in model._extra_features},
+        )
+        model.is_fitted = True
+        model.base_sha256 = _file_sha256(path)
+
+        delta_path = delta_path or path + DELTA_SUFFIX
+        if os.path.exists(delta_path):
+            rows, delta_base = _read_delta(delta_path)
+            if delta_base == model.base_sha256:
+                model.partial_fit(rows)
+            else:
+                warnings.warn(f"File delta '{delta_path}' dibuat untuk artefak lain, diabaikan.")
+        return model
+
+    def recommend(self, commodity, province, soil_ph, temp_c, rain_mm=None, humidity_pct=None):
+        """
+        Rekomendasi dosis pupuk untuk satu lahan.
+
+        rain_mm dan humidity_pct hanya dipakai pada mode "knn" jika termasuk
+        knn_features; pada mode "window" keduanya diabaikan.
+        """
+
+        if not self.is_fitted:
+            raise RuntimeError("Model harus di-'fit' terlebih dahulu dengan data sebelum memberikan rekomendasi.")
+
+        compute = self._recommend_knn if self.mode == "knn" else self._recommend
+        extra = {'rain_mm': rain_mm, 'humidity_pct': humidity_pct}
+        if self._cache is None:
+            return compute(commodity, province, soil_ph, temp_c, **extra)
+
+        soil_ph = round(soil_ph, self._ph_decimals)
+        temp_c = round(temp_c, self._temp_decimals)
+        key = (commodity, province, soil_ph, temp_c) + tuple(
+            extra[KNN_FEATURES[f]] for f in self._extra_features
+        )
+        result = self._cache.get(key)
+        if result is None:
+            result = compute(commodity, province, soil_ph, temp_c, **extra)
+            self._cache.put(key, result)
+
+        # Salinan, agar pemanggil tidak bisa mengubah isi cache
+        result = dict(result)
+        if "rekomendasi" in result:
+            result["rekomendasi"] = dict(result["rekomendasi"])
+        return result
+
+    def _recommend(self, commodity, province, soil_ph, temp_c, **_):
+        segment = self._segments.get((commodity, province))
+        if segment is None:
+            return {"status": "error", "message": f"Tidak ada data historis untuk '{commodity}' di provinsi '{province}'."}
+        start, stop = segment
+
+        ph_min, ph_max = soil_ph - PH_WINDOW, soil_ph + PH_WINDOW
+        temp_min, temp_max = temp_c - TEMP_WINDOW, temp_c + TEMP_WINDOW
+
+        # Jendela pH dicari dengan binary search di dalam segmen yang sudah terurut
+        ph_segment = self._ph[start:stop]
+        lo = start + np.searchsorted(ph_segment, ph_min, side='left')
+        hi = start + np.searchsorted(ph_segment, ph_max, side='right')
+
+        temp_window = self._temp[lo:hi]
+        mask = (temp_window >= temp_min) & (temp_window <= temp_max)
+
+        if mask.any():
+            final_doses = self._doses[lo:hi][mask]
+            source_data = "data yang sangat mirip"
+        else:
+            final_doses = self._doses[start:stop]
+            source_data = "data provinsi secara umum"
+
+        # Median (lebih aman dari outlier); NaN diabaikan seperti Series.median()
+        medians = _nanmedian(final_doses)
+        rekomendasi = dict(zip(DOSE_KEYS, medians.tolist()))
+
+        return {
+            "status": "success",
+            "rekomendasi": rekomendasi,
+            "sumber_data": f"Berdasarkan {len(final_doses)} petani dengan {source_data}."
+        }
+
+    def _recommend_knn(self, commodity, province, soil_ph, temp_c, **extra):
+        if commodity not in self._knn:
+            return {"status": "error", "message": f"Tidak ada data historis untuk '{commodity}'."}
+
+        query = {'soil_ph': soil_ph, 'temp_c': temp_c, **extra}
+        values = [query[KNN_FEATURES[f]] for f in self.knn_features]
+        if any(v is None for v in values):
+            raise ValueError(f"Mode k-NN membutuhkan nilai: {', '.join(KNN_FEATURES[f] for f in self.knn_features)}")
+
+        medians, k = self._knn_query(commodity, np.array([values], dtype=np.float64))
+        return {
+            "status": "success",
+            "rekomendasi": dict(zip(DOSE_KEYS, medians[0].tolist())),
+            "sumber_data": f"Berdasarkan {k} petani dengan {KNN_SOURCE}."
+        }
+
+    def recommend_many(self, queries_df):
+        """
+        Versi batch dari recommend() untuk banyak query sekaligus.
+
+        queries_df memakai skema lookup_tabel.csv (kolom Commodity, Province, Soil_pH,
+        Temp_C, serta Rain_mm/Humidity_pct jika dipakai mode k-NN), sehingga lookup
+        table bisa langsung dipakai. Hasilnya DataFrame dengan index yang sama berisi
+        status, median dosis per pupuk, sumber_data dan jumlah_petani; nilainya
+        identik dengan memanggil recommend() per baris.
+        """
+        if not self.is_fitted:
+            raise RuntimeError("Model harus di-'fit' terlebih dahulu dengan data sebelum memberikan rekomendasi.")
+
+        query_cols = ['Commodity', 'Province', 'Soil_pH', 'Temp_C'] + self._extra_features
+        if not all(col in queries_df.columns for col in query_cols):
+            raise ValueError(f"DataFrame query harus memiliki kolom: {', '.join(query_cols)}")
+
+        if self.mode == "knn":
+            return self._recommend_many_knn(queries_df)
+
+        n = len(queries_df)
+        medians = np.full((n, len(DOSE_COLS)), np.nan)
+        counts = np.zeros(n, dtype=np.int64)
+        similar = np.zeros(n, dtype=bool)
+        found = np.zeros(n, dtype=bool)
+
+        ph_all = queries_df['Soil_pH'].to_numpy(dtype=np.float64)
+        temp_all = queries_df['Temp_C'].to_numpy(dtype=np.float64)
+        groups = queries_df.groupby(['Commodity', 'Province'], sort=False, observed=True).indices
+
+        # Satu iterasi per segmen (bukan per query); semua query di segmen yang sama
+        # dihitung sekaligus dengan operasi array.
+        for key, rows in groups.items():
+            segment = self._segments.get(key)
+            if segment is None:
+                continue
+            start, stop = segment
+            found[rows] = True
+            self._recommend_segment(start, stop, ph_all[rows], temp_all[rows], rows, medians, counts, similar)
+
+        source = np.where(similar, "data yang sangat mirip", "data provinsi secara umum").astype(object)
+        source[~found] = None
+
+        result = pd.DataFrame(medians, columns=DOSE_KEYS, index=queries_df.index)
+        result.insert(0, 'status', np.where(found, "success", "error"))
+        result['sumber_data'] = source
+        result['jumlah_petani'] = counts
+        return result
+
+    def _recommend_many_knn(self, queries_df):
+        n = len(queries_df)
+        medians = np.full((n, len(DOSE_COLS)), np.nan)
+        counts = np.zeros(n, dtype=np.int64)
+        found = np.zeros(n, dtype=bool)
+
+        points = queries_df[list(self.knn_features)].to_numpy(dtype=np.float64)
+        # Satu query KD-tree per komoditas untuk semua baris komoditas tersebut
+        for commodity, rows in queries_df.groupby('Commodity', sort=False, observed=True).indices.items():
+            if commodity not in self._knn:
+                continue
+            medians[rows], counts[rows] = self._knn_query(commodity, points[rows])
+            found[rows] = True
+
+        result = pd.DataFrame(medians, columns=DOSE_KEYS, index=queries_df.index)
+        result.insert(0, 'status', np.where(found, "success", "error"))
+        result['sumber_data'] = np.where(found, KNN_SOURCE, None)
+        result['jumlah_petani'] = counts
+        return result
+
+    def _recommend_segment(self, start, stop, ph_q, temp_q, rows, medians, counts, similar):
+        ph_segment = self._ph[start:stop]
+        lo = np.searchsorted(ph_segment, ph_q - PH_WINDOW, side='left')
+        hi = np.searchsorted(ph_segment, ph_q + PH_WINDOW, side='right')
+
+        # Hanya bagian segmen yang tercakup jendela pH salah satu query yang diproses
+        a, b = int(lo.min()), int(hi.max())
+        if b > a:
+            self._rank_window(start, a, b, lo, hi, temp_q, rows, medians, counts, similar)
+
+        # Query tanpa data mirip (termasuk jika jendela pH semua query kosong) memakai
+        # seluruh data provinsi, fallback yang sama dengan recommend()
+        fallback = rows[~similar[rows]]
+        if len(fallback):
+            medians[fallback] = _nanmedian(self._doses[start:stop])
+            counts[fallback] = stop - start
+
+    def _rank_window(self, start, a, b, lo, hi, temp_q, rows, medians, counts, similar):
+        """Median dosis data mirip untuk query segmen, pada baris a:b (tidak kosong) segmen."""
+        width = b - a
+        temp_window = self._temp[start + a:start + b]
+        dose_window = self._doses[start + a:start + b]
+        positions = np.arange(a, b)
+
+        # Urutan tiap kolom dosis di dalam jendela dihitung sekali (NaN di belakang), lalu
+        # median tiap query dicari lewat peringkat (cumsum) tanpa mengurutkan ulang.
+        order = np.argsort(dose_window, axis=0, kind='stable')
+        sorted_doses = np.take_along_axis(dose_window, order, axis=0)
+        valid = ~np.isnan(sorted_doses)
+
+        # Query diproses per potongan agar matriks mask (query x baris) tetap kecil
+        chunk = max(1, BATCH_CELLS // width)
+        for i in range(0, len(rows), chunk):
+            sl = slice(i, i + chunk)
+            t = temp_q[sl, None]
+            mask = (
+                (positions >= lo[sl, None]) & (positions < hi[sl, None]) &
+                (temp_window >= t - TEMP_WINDOW) & (temp_window <= t + TEMP_WINDOW)
+            )
+            n_match = mask.sum(axis=1)
+            for k in range(len(DOSE_COLS)):
+                medians[rows[sl], k] = _ranked_median(mask[:, order[:, k]] & valid[:, k], sorted_doses[:, k])
+            counts[rows[sl]] = n_match
+            similar[rows[sl]] = n_match > 0
+
+
+def _file_sha256(path, chunk_size=1 << 20):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _append_delta(path, rows, extra_features, base_sha256):
+    """
+    Menambahkan baris (sudah divalidasi) ke file delta secara atomik. Delta lama milik
+    artefak dasar lain tidak disambung, melainkan ditimpa.
+    """
+    if os.path.exists(path):
+        old_rows, old_base = _read_delta(path)
+        if old_base == base_sha256:
+            rows = pd.concat([old_rows, rows], ignore_index=True)
+    write_columnar(path, {
+        'Commodity': pd.Categorical(rows['Commodity']),
+        'Province': pd.Categorical(rows['Province']),
+        'Soil_pH': rows['Soil_pH'].to_numpy(dtype=np.float64),
+        'Temp_C': rows['Temp_C'].to_numpy(dtype=np.float64),
+        'doses': rows[DOSE_COLS].to_numpy(dtype=np.float64),
+        **{f: rows[f].to_numpy(dtype=np.float64) for f in extra_features},
+    }, kind=DELTA_KIND, meta={"dose_cols": DOSE_COLS, "base_sha256": base_sha256})
+
+
+def _read_delta(path):
+    """Baris delta dan SHA-256 artefak dasar tempat delta itu dibuat."""
+    columns, meta = read_columnar(path, kind=DELTA_KIND, mmap=False)
+    doses = columns.pop('doses')
+    rows = pd.DataFrame({name: np.asarray(values) for name, values in columns.items()})
+    rows[DOSE_COLS] = doses
+    return rows, meta.get("base_sha256")
+
+
+def _nanmedian(values, axis=0):
+    """
+    Median yang mengabaikan NaN (seperti Series.median()) di sepanjang satu sumbu.
+
+    NaN terurut ke belakang oleh np.sort, jadi median cukup diambil dari posisi tengah
+    nilai valid; jauh lebih cepat daripada np.nanmedian untuk array 2D/3D.
+    """
+    ordered = np.sort(values, axis=axis)
+    n_valid = np.expand_dims((~np.isnan(values)).sum(axis=axis), axis)
+    lower = np.take_along_axis(ordered, np.maximum((n_valid - 1) // 2, 0), axis=axis)
+    upper = np.take_along_axis(ordered, np.maximum(n_valid // 2, 0), axis=axis)
+    median = np.squeeze((lower + upper) / 2, axis=axis)
+    return np.where(np.squeeze(n_valid, axis=axis) > 0, median, np.nan)
+
+
+def _weighted_median(values, weights):
+    """
+    Median berbobot per query dan per kolom.
+
+    values berukuran (query x tetangga x pupuk), weights (query x tetangga). NaN
+    diabaikan; hasilnya nilai terkecil yang bobot kumulatifnya mencapai setengah total.
+    """
+    weights = np.where(np.isnan(values), 0.0, weights[:, :, None])
+    order = np.argsort(values, axis=1, kind='stable')
+    ordered = np.take_along_axis(values, order, axis=1)
+    cumulative = np.cumsum(np.take_along_axis(weights, order, axis=1), axis=1)
+    total = cumulative[:, -1:, :]
+    position = np.argmax(cumulative >= total / 2, axis=1)
+    median = np.take_along_axis(ordered, position[:, None, :], axis=1)[:, 0, :]
+    return np.where(total[:, 0, :] > 0, median, np.nan)
+
+
+def _ranked_median(mask, sorted_values):
+    """Median baris-per-baris dari sorted_values yang terpilih oleh mask (query x baris)."""
+    ranks = np.cumsum(mask, axis=1, dtype=np.int32)
+    n_valid = ranks[:, -1:]
+    # Elemen ke-r (0-based) adalah posisi pertama di mana jumlah kumulatif melebihi r
+    lower = sorted_values[np.argmax(ranks > (n_valid - 1) // 2, axis=1)]
+    upper = sorted_values[np.argmax(ranks > n_valid // 2, axis=1)]
+    return np.where(n_valid[:, 0] > 0, (lower + upper) / 2, np.nan)
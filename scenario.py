@@ -0,0 +1,98 @@
+# Simulasi skenario (what-if): luas lahan x tahun x harga pupuk
+#
+# Seluruh grid skenario dievaluasi dengan satu pemanggilan model produksi (satu
+# DataFrame berisi semua baris) dan satu perhitungan biaya berbasis array, bukan
+# satu prediksi per skenario. Komponen biaya per hektar dan faktor skala ekonomi
+# yang sama juga dipakai kalkulator biaya di app.py.
+
+import numpy as np
+import pandas as pd
+
+from lookup import input_frame, input_row
+
+
+# Definisi biaya dasar per hektar (Rp)
+MODAL_AWAL = {
+    "Pengolahan Lahan (bajak, garu)": 1500000,
+    "Pembelian Benih/Bibit Unggul": 800000,
+    "Pupuk Dasar (sebelum tanam)": 1000000,
+    "Sewa Lahan (jika menyewa)": 3000000,
+    "Peralatan Kecil (cangkul, semprotan, dll.)": 500000
+}
+
+PERAWATAN = {
+    "Pupuk Susulan (Urea, SP-36, KCl)": 1800000,
+    "Pestisida/Herbisida (pengendalian hama/gulma)": 800000,
+    "Tenaga Kerja (tanam, pemeliharaan, panen)": 4000000,
+    "Biaya Pengairan/Irigasi": 600000,
+    "Perbaikan Peralatan": 300000
+}
+
+# Komponen biaya yang ikut naik/turun mengikuti pengali harga pupuk
+FERTILIZER_COMPONENTS = ["Pupuk Dasar (sebelum tanam)", "Pupuk Susulan (Urea, SP-36, KCl)"]
+PRICE_COLS = ["InputPrice_Urea_RpKg", "InputPrice_SP36_RpKg", "InputPrice_KCl_RpKg"]
+
+# Perkiraan harga jual di tingkat petani (Rp/kg); di aplikasi bisa diubah pengguna
+SELLING_PRICES = {
+    "Padi": 6500, "Jagung": 5000, "Tebu": 700, "Bawang Merah": 25000, "Cabai Rawit": 40000,
+}
+
+
+def scale_factor(area):
+    """Faktor skala ekonomi: <= 2 ha: 1.0, <= 10 ha: 0.95, selebihnya 0.85 (bisa array)."""
+    area = np.asarray(area, dtype=np.float64)
+    return np.where(area <= 2, 1.0, np.where(area <= 10, 0.95, 0.85))
+
+
+def cost_per_ha(area, price_multiplier=1.0):
+    """Modal awal dan biaya perawatan per hektar (Rp) setelah faktor skala; bisa array."""
+    factor = scale_factor(area)
+    multiplier = np.asarray(price_multiplier, dtype=np.float64)
+    modal = sum(
+        value * (multiplier if name in FERTILIZER_COMPONENTS else 1.0) for name, value in MODAL_AWAL.items()
+    )
+    rawat = sum(
+        value * (multiplier if name in FERTILIZER_COMPONENTS else 1.0) for name, value in PERAWATAN.items()
+    )
+    return modal * factor, rawat * factor
+
+
+def scenario_grid(areas, years, price_multipliers):
+    """Semua kombinasi (Area_Ha, Year, pengali harga pupuk) sebagai DataFrame."""
+    area, year, multiplier = np.meshgrid(
+        np.asarray(areas, dtype=np.float64), np.asarray(years, dtype=np.int64),
+        np.asarray(price_multipliers, dtype=np.float64), indexing="ij",
+    )
+    return pd.DataFrame({"Area_Ha": area.ravel(), "Year": year.ravel(), "Pengali_Harga_Pupuk": multiplier.ravel()})
+
+
+def run_scenarios(model, province, district, commodity, defaults, areas, years, price_multipliers,
+                  selling_price):
+    """
+    Hasil panen, biaya dan margin untuk setiap skenario dalam satu batch.
+
+    defaults adalah nilai referensi lookup untuk kombinasi lokasi/komoditas (seperti
+    di app.py); harga pupuk dasar dikalikan pengali per skenario.
+    """
+    grid = scenario_grid(areas, years, price_multipliers)
+    base = input_frame([input_row(province, district, commodity, 1.0, defaults)])
+    inputs = base.loc[base.index.repeat(len(grid))].reset_index(drop=True)
+    inputs["Area_Ha"] = grid["Area_Ha"]
+    inputs["Year"] = grid["Year"]
+    for col in PRICE_COLS:
+        inputs[col] = inputs[col].to_numpy(dtype=np.float64) * grid["Pengali_Harga_Pupuk"].to_numpy()
+
+    area = grid["Area_Ha"].to_numpy()
+    production = np.asarray(model.predict(inputs), dtype=np.float64)
+    modal, rawat = cost_per_ha(area, grid["Pengali_Harga_Pupuk"].to_numpy())
+
+    result = grid.assign(
+        Produksi_KgHa=production,
+        Total_Produksi_Kg=production * area,
+        Total_Modal_Rp=modal * area,
+        Total_Perawatan_Rp=rawat * area,
+    )
+    result["Total_Biaya_Rp"] = result["Total_Modal_Rp"] + result["Total_Perawatan_Rp"]
+    result["Pendapatan_Rp"] = result["Total_Produksi_Kg"] * selling_price
+    result["Margin_Rp"] = result["Pendapatan_Rp"] - result["Total_Biaya_Rp"]
+    return result
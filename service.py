@@ -0,0 +1,280 @@
+# Layanan HTTP prediksi TUMBUH (tanpa Streamlit)
+#
+# Endpoint:
+#   GET  /health    status model dan statistik batching
+#   POST /predict   {"province": ..., "district": ..., "commodity": ..., "area": 1.5}
+#                   -> prediksi produksi + rekomendasi pupuk (JSON)
+#
+# Request yang datang bersamaan digabung menjadi batch kecil (paling lama
+# max_wait detik) sebelum model dipanggil sekali untuk seluruh batch, dan request
+# identik yang sedang diproses cukup menunggu hasil yang sama (single-flight).
+# Jika satu batch gagal, item-nya diulang satu per satu sehingga hanya request
+# yang bermasalah yang mendapat error 500.
+# Hanya memakai standard library + modul repo ini, jadi bisa diuji lokal:
+#
+#   python service.py --production pipeline_Production_KgHa_final.pkl \
+#       --recommender model_rekomendasi_pupuk.bin --port 8000
+#
+# Batching dan penanganan error diuji di tests/test_service.py.
+
+import argparse
+import json
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from lookup import FALLBACK_DEFAULTS, LOOKUP_PATH, LookupIndex, input_frame, input_row, load_lookup_table
+from model_store import ModelRegistry, format_timings
+from recommender import DOSE_KEYS
+
+
+MAX_BATCH = 64
+MAX_WAIT = 0.002
+REQUEST_TIMEOUT = 30
+
+
+class MicroBatcher:
+    """
+    Menggabungkan item dari banyak thread menjadi batch untuk satu pemanggilan
+    handler(items) -> results. Item dengan kunci yang sama selama masih diproses
+    berbagi satu Future (single-flight). Jika handler gagal, error hanya diteruskan
+    ke item yang juga gagal saat diproses sendiri.
+    """
+
+    def __init__(self, handler, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.stats = {"requests": 0, "coalesced": 0, "batches": 0, "items": 0, "retried": 0}
+        self._queue = queue.Queue()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def submit(self, key, item):
+        with self._lock:
+            self.stats["requests"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self.stats["coalesced"] += 1
+                return future
+            future = self._inflight[key] = Future()
+        self._queue.put((key, item, future))
+        return future
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _handle(self, items):
+        """
+        Daftar (hasil, error) per item. Jika handler gagal untuk satu batch, item
+        diproses ulang satu per satu agar satu item bermasalah tidak menggagalkan
+        item lain yang kebetulan tergabung di batch yang sama.
+        """
+        try:
+            return [(result, None) for result in self.handler(items)]
+        except Exception as e:
+            if len(items) == 1:
+                return [(None, e)]
+        with self._lock:
+            self.stats["retried"] += len(items)
+        return [outcome for item in items for outcome in self._handle([item])]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            keys = [key for key, _, _ in batch]
+            outcomes = self._handle([item for _, item, _ in batch])
+
+            with self._lock:
+                for key in keys:
+                    self._inflight.pop(key, None)
+                self.stats["batches"] += 1
+                self.stats["items"] += len(batch)
+            for (_, _, future), (result, error) in zip(batch, outcomes):
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+
+class PredictionService:
+    """Prediksi produksi + rekomendasi pupuk dengan nilai referensi dari lookup."""
+
+    def __init__(self, models, lookup_df, prediction_table=None, production_forest=None,
+                 max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.models = models
+        self.index = LookupIndex(lookup_df)
+        self.prediction_table = prediction_table
+        # FlatForest hasil kompilasi (forest_engine.py); tanpa itu dipakai pipeline "production"
+        self.production_forest = production_forest
+        self.batcher = MicroBatcher(self._predict_batch, max_batch, max_wait)
+
+    def predict(self, province, district, commodity, area, timeout=REQUEST_TIMEOUT):
+        key = (province, district, commodity, float(area))
+        return self.batcher.submit(key, key).result(timeout)
+
+    def _predict_batch(self, items):
+        found = [self.index.record(*item[:3]) for item in items]
+        frame = input_frame([
+            input_row(province, district, commodity, area, record or FALLBACK_DEFAULTS)
+            for (province, district, commodity, area), record in zip(items, found)
+        ])
+
+        # Produksi: tabel prediksi jika ada, model hanya untuk sisanya (dalam satu batch)
+        production = np.full(len(items), np.nan)
+        source = ["model"] * len(items)
+        if self.prediction_table is not None:
+            for i, item in enumerate(items):
+                value = self.prediction_table.lookup(*item)
+                if value is not None:
+                    production[i] = value
+                    source[i] = "tabel"
+        missing = np.flatnonzero(np.isnan(production))
+        if len(missing):
+            model = self.production_forest if self.production_forest is not None else self.models["production"]
+            production[missing] = model.predict(frame.iloc[missing])
+
+        recommendation = self.models["recommender"].recommend_many(frame)
+        results = []
+        for i, (province, district, commodity, area) in enumerate(items):
+            rec = recommendation.iloc[i]
+            results.append({
+                "province": province, "district": district, "commodity": commodity, "area_ha": area,
+                "data_referensi": found[i] is not None,
+                "produksi_kg_ha": float(production[i]),
+                "total_produksi_kg": float(production[i] * area),
+                "sumber_produksi": source[i],
+                "rekomendasi": {
+                    "status": rec["status"],
+                    **{key: _json_number(rec[key]) for key in DOSE_KEYS},
+                    "sumber_data": rec["sumber_data"],
+                    "jumlah_petani": int(rec["jumlah_petani"]),
+                },
+            })
+        return results
+
+    def health(self):
+        return {
+            "status": "ok",
+            "models": format_timings(self.models.timings()),
+            "prediction_table": self.prediction_table is not None,
+            "production_forest": self.production_forest is not None,
+            "batching": dict(self.batcher.stats),
+        }
+
+
+def _json_number(value):
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def make_handler(service):
+    class Handler(BaseHTTPRequestHandler):
+        # HTTP/1.1 agar koneksi keep-alive bisa dipakai ulang oleh klien
+        protocol_version = "HTTP/1.1"
+        # Header dan body dikirim terpisah; tanpa ini Nagle + delayed ACK menambah ~40 ms
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, service.health())
+            else:
+                self._send(404, {"error": f"Endpoint {self.path} tidak ditemukan."})
+
+        def do_POST(self):
+            if self.path != "/predict":
+                self._send(404, {"error": f"Endpoint {self.path} tidak ditemukan."})
+                return
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                area = float(request["area"])
+                if not area > 0:
+                    raise ValueError("area harus lebih besar dari 0.")
+                args = [str(request[key]).strip().title() for key in ("province", "district", "commodity")]
+            except (KeyError, ValueError, TypeError) as e:
+                self._send(400, {"error": f"Request tidak valid: {e}"})
+                return
+            try:
+                self._send(200, service.predict(*args, area))
+            except Exception as e:
+                self._send(500, {"error": str(e)})
+
+    return Handler
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    # Antrean listen bawaan (5) terlalu kecil untuk banyak klien yang datang bersamaan
+    request_queue_size = 128
+
+
+def serve(service, host="127.0.0.1", port=8000):
+    """Membuat server (belum dijalankan); panggil serve_forever() atau jalankan di thread."""
+    return _Server((host, port), make_handler(service))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Layanan HTTP prediksi & rekomendasi TUMBUH")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH)
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT * 1000)
+    parser.add_argument("--lookup", default=LOOKUP_PATH)
+    parser.add_argument("--production", help="file model produksi lokal (.pkl/.forest); default dari S3")
+    parser.add_argument("--recommender", help="file model rekomendasi lokal; default dari S3")
+    parser.add_argument("--table", help="file tabel prediksi lokal (.tbl); default dari S3 jika ada")
+    args = parser.parse_args()
+
+    local_files = {
+        key: path for key, path in
+        (("production", args.production), ("recommender", args.recommender), ("production_table", args.table))
+        if path
+    }
+    models = ModelRegistry(local_files=local_files).preload(["recommender"])
+    try:
+        prediction_table = models["production_table"]
+    except Exception:
+        prediction_table = None
+    # File lokal --production dipakai apa adanya; selain itu versi .forest jika ada di S3
+    production_forest = None
+    if not args.production:
+        try:
+            production_forest = models["production_forest"]
+        except Exception:
+            production_forest = None
+    if production_forest is None:
+        models.preload(["production"])
+
+    service = PredictionService(
+        models, load_lookup_table(args.lookup), prediction_table, production_forest,
+        max_batch=args.max_batch, max_wait=args.max_wait_ms / 1000,
+    )
+    server = serve(service, args.host, args.port)
+    print(f"Layanan berjalan di http://{args.host}:{args.port} ({format_timings(models.timings())})")
+    server.serve_forever()
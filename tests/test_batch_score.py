@@ -0,0 +1,33 @@
+import numpy as np
+import pandas as pd
+
+import batch_score
+from recommender import DOSE_COLS, SimilarityRecommender
+
+
+class _ProductionModel:
+    def predict(self, frame):
+        return np.full(len(frame), 1000.0)
+
+
+def test_score_chunk_normalizes_keys_like_the_app(monkeypatch):
+    history = pd.DataFrame({
+        "Commodity": ["Padi"] * 3, "Province": ["Jawa Barat"] * 3,
+        "Soil_pH": [5.0, 5.1, 5.2], "Temp_C": [27.0, 27.0, 27.0],
+    })
+    history[DOSE_COLS] = 100.0
+    monkeypatch.setattr(batch_score, "_worker_models", {
+        "production": _ProductionModel(), "recommender": SimilarityRecommender().fit(history),
+    })
+    chunk = pd.DataFrame({
+        "Province": [" jawa barat ", "JAWA BARAT"], "District": ["bogor", "Bogor "],
+        "Commodity": ["padi ", "Padi"], "Area_Ha": [1.0, 2.0],
+        "Soil_pH": [5.1, 5.1], "Temp_C": [27.0, 27.0],
+    })
+
+    result, _ = batch_score.score_chunk(chunk)
+
+    assert result["Province"].tolist() == ["Jawa Barat", "Jawa Barat"]
+    assert result["District"].tolist() == ["Bogor", "Bogor"]
+    assert (result["status_rekomendasi"] == "success").all()
+    assert result["sumber_data"].tolist() == ["data yang sangat mirip"] * 2
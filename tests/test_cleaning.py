@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from cleaning import filter_outliers_iqr
+
+
+def _old_loop(df, columns, group_keys, multiplier):
+    # Loop lama di capstone_tumbuh.py: groupby + quantile + pd.concat per kelompok
+    df_clean = pd.DataFrame()
+    for _, subset in df.groupby(group_keys if len(group_keys) > 1 else group_keys[0]):
+        Q1 = subset[columns].quantile(0.25)
+        Q3 = subset[columns].quantile(0.75)
+        IQR = Q3 - Q1
+        mask = ~((subset[columns] < (Q1 - multiplier * IQR)) |
+                 (subset[columns] > (Q3 + multiplier * IQR))).any(axis=1)
+        df_clean = pd.concat([df_clean, subset[mask]])
+    return df_clean
+
+
+def _data(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        "Commodity": rng.choice(["Padi", "Jagung", "Tebu", "Cabai Rawit"], n),
+        "Province": rng.choice(["Aceh", "Bali", "Jawa Barat"], n),
+        "Yield_kgHa": rng.lognormal(8, 0.6, n),
+        "Rain_mm": rng.normal(2000, 400, n),
+        "Soil_pH": rng.normal(6, 0.5, n),
+    })
+    # Nilai ekstrem agar ada yang dibuang, NaN di fitur dan di kunci kelompok
+    df.loc[rng.choice(n, 30, replace=False), "Rain_mm"] = 1e6
+    df.loc[rng.choice(n, 40, replace=False), "Soil_pH"] = np.nan
+    df.loc[rng.choice(n, 15, replace=False), "Province"] = np.nan
+    # Satu kelompok yang seluruh nilainya NaN untuk satu kolom
+    df.loc[df["Commodity"] == "Tebu", "Yield_kgHa"] = np.nan
+    return df
+
+
+@pytest.mark.parametrize("group_keys", [["Commodity"], ["Commodity", "Province"]])
+@pytest.mark.parametrize("multiplier", [1.5, 3])
+def test_filter_outliers_iqr_matches_old_loop(group_keys, multiplier):
+    df = _data()
+    columns = ["Yield_kgHa", "Rain_mm", "Soil_pH"]
+
+    df_clean, report = filter_outliers_iqr(df, columns, group_keys=group_keys, multiplier=multiplier)
+
+    expected = _old_loop(df, columns, group_keys, multiplier)
+    pd.testing.assert_frame_equal(df_clean, expected)
+    assert len(df_clean) < df[group_keys].notna().all(axis=1).sum()
+    assert report["rows"].sum() == df[group_keys].notna().all(axis=1).sum()
+    assert report["dropped"].sum() == df[group_keys].notna().all(axis=1).sum() - len(df_clean)
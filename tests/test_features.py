@@ -0,0 +1,39 @@
+import numpy as np
+import pandas as pd
+
+from features import ENGINEERED_FEATURES, FeatureBuilder
+from lookup import DEFAULT_INPUTS, load_lookup_table
+
+
+def _old_pandas_features(data):
+    # Kode fitur lama dari app.py/capstone_tumbuh.py sebelum FeatureBuilder
+    data = data.copy()
+    data['Temp_Humid_Interaction'] = data['Temp_C'] * data['Humidity_pct']
+    data['Soil_Fertility_Index'] = (data['Soil_N_index'] + data['Soil_P_index'] + data['Soil_K_index']) / 3
+    data['Soil_pH_sq'] = data['Soil_pH']**2
+    data['Avg_Fertilizer_Price'] = (
+        data['InputPrice_Urea_RpKg'] + data['InputPrice_SP36_RpKg'] + data['InputPrice_KCl_RpKg']
+    ) / 3
+    return data
+
+
+def test_feature_builder_matches_old_pandas_features():
+    # Input mentah dari lookup: kolom kunci bertipe kategorikal
+    contoh_input = load_lookup_table().iloc[:50].assign(**DEFAULT_INPUTS)
+    contoh_input["Soil_pH"] = np.linspace(4.5, 8.0, len(contoh_input))
+    assert isinstance(contoh_input["Province"].dtype, pd.CategoricalDtype)
+
+    pd.testing.assert_frame_equal(FeatureBuilder().transform(contoh_input), _old_pandas_features(contoh_input))
+
+
+def test_feature_builder_values_and_dtypes():
+    data = pd.DataFrame({
+        "Province": ["Aceh"], "Temp_C": [27.0], "Humidity_pct": [80.0],
+        "Soil_N_index": [1], "Soil_P_index": [2], "Soil_K_index": [3], "Soil_pH": [6.0],
+        "InputPrice_Urea_RpKg": [7000], "InputPrice_SP36_RpKg": [8000], "InputPrice_KCl_RpKg": [9000],
+    })
+
+    result = FeatureBuilder().transform(data)
+
+    pd.testing.assert_series_equal(result.dtypes[data.columns], data.dtypes)
+    np.testing.assert_allclose(result[ENGINEERED_FEATURES].to_numpy()[0], [2160.0, 2.0, 36.0, 8000.0])
@@ -0,0 +1,99 @@
+import csv
+import os
+import time
+
+from feedback import FeedbackFeed, FileSource
+
+
+def _write_csv(path, rows):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Timestamp", "Nama", "Rating", "Komentar"])
+        writer.writerows(rows)
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "kondisi tidak tercapai"
+        time.sleep(0.01)
+
+
+def test_snapshot_wait_times_out_on_slow_source_then_refreshes_in_background(tmp_path):
+    path = tmp_path / "feedback.csv"
+    _write_csv(path, [("2024-01-01", "Budi", 5, "Bagus")])
+    feed = FeedbackFeed(FileSource(str(path), delay=0.5), ttl=60)
+
+    start = time.monotonic()
+    assert feed.snapshot(wait=0.05) is None
+    assert time.monotonic() - start < 0.4
+
+    # Pembacaan pertama selesai di background tanpa panggilan snapshot() lain
+    _wait_for(lambda: feed._snapshot is not None)
+    snapshot = feed.snapshot()
+    assert snapshot.version == 1 and len(snapshot.df) == 1
+    assert feed.stats["refreshes"] == 1
+
+
+def test_ttl_controls_revalidation_and_unchanged_file_keeps_snapshot(tmp_path):
+    path = tmp_path / "feedback.csv"
+    _write_csv(path, [("2024-01-01", "Budi", 5, "Bagus")])
+    feed = FeedbackFeed(FileSource(str(path)), ttl=0.2)
+    first = feed.snapshot(wait=5)
+    assert first.version == 1
+
+    # Masih dalam TTL: tidak ada refresh baru walaupun file berubah
+    _write_csv(path, [("2024-01-01", "Budi", 5, "Bagus"), ("2024-01-02", "Sari", 4, "Oke")])
+    os.utime(path, ns=(time.time_ns(), time.time_ns() + 10**9))
+    assert feed.snapshot() is first
+    assert feed.stats["refreshes"] == 1
+
+    # Setelah TTL lewat, snapshot() memicu refresh di background dan tetap
+    # mengembalikan snapshot lama sampai refresh selesai
+    time.sleep(0.25)
+    assert feed.snapshot() is first
+    _wait_for(lambda: feed.stats["refreshes"] == 2)
+    second = feed.snapshot()
+    assert second.version == 2 and len(second.df) == 2
+
+    # File tidak berubah: tidak di-parse ulang, snapshot tetap sama
+    time.sleep(0.25)
+    feed.snapshot()
+    _wait_for(lambda: feed.stats["refreshes"] == 3)
+    assert feed.snapshot() is second
+    assert feed.stats["not_modified"] == 1
+
+
+def test_failed_refresh_keeps_last_snapshot(tmp_path):
+    path = tmp_path / "feedback.csv"
+    _write_csv(path, [("2024-01-01", "Budi", 5, "Bagus")])
+    feed = FeedbackFeed(FileSource(str(path)), ttl=60)
+    first = feed.refresh()
+
+    path.unlink()
+    assert feed.refresh() is first
+    assert isinstance(feed.last_error, FileNotFoundError)
+    assert feed.stats["errors"] == 1
+
+
+def test_pages_are_newest_first_and_escape_html(tmp_path):
+    path = tmp_path / "feedback.csv"
+    rows = [(f"2024-01-{i + 1:02d}", f"Petani {i}", 1 + i % 5, f"Komentar {i}") for i in range(23)]
+    rows.append(("2024-02-01", "<script>alert(1)</script>", 5, "<b>tebal</b> & \"kutip\""))
+    _write_csv(path, rows)
+    snapshot = FeedbackFeed(FileSource(str(path)), ttl=60).refresh()
+
+    assert snapshot.n_pages() == 3 and snapshot.n_pages(page_size=24) == 1
+    first = snapshot.page_html(1)
+    assert first.count("<div") == 10
+    # Terbaru (baris terakhir) di halaman pertama, teks pengguna di-escape
+    assert first.index("&lt;script&gt;alert(1)&lt;/script&gt;") < first.index("Petani 22")
+    assert "<script>" not in first and "<b>tebal</b>" not in first
+    assert "&lt;b&gt;tebal&lt;/b&gt; &amp; &quot;kutip&quot;" in first
+    assert snapshot.page_html(3).count("<div") == 4 and "Petani 0<" in snapshot.page_html(3)
+    assert snapshot.page_html(4) == ""
+    # HTML halaman dipakai ulang dari snapshot
+    assert snapshot.page_html(1) is first
+
+    assert snapshot.stats["jumlah"] == 24
+    assert sum(snapshot.stats["distribusi"].values()) == 24
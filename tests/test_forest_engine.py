@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from features import FeatureBuilder
+from forest_engine import SMALL_BATCH, FlatForest
+from lookup import DEFAULT_INPUTS, INPUT_COLS, input_row
+
+
+KEY_COLS = ["Province", "District", "Commodity"]
+
+
+def _inputs(n, seed=0):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "Province": rng.choice(["Aceh", "Bali", "Jawa Barat"], n),
+        "District": rng.choice(["A", "B", "C", "D"], n),
+        "Commodity": rng.choice(["Padi", "Jagung"], n),
+        "Rain_mm": rng.uniform(1000, 3000, n), "Temp_C": rng.uniform(22, 32, n),
+        "Humidity_pct": rng.uniform(60, 95, n), "Soil_pH": rng.uniform(4.5, 7.5, n),
+        "Soil_N_index": rng.integers(1, 4, n), "Soil_P_index": rng.integers(1, 4, n),
+        "Soil_K_index": rng.integers(1, 4, n), "Area_Ha": rng.uniform(0.5, 10, n),
+    })
+    for col, value in DEFAULT_INPUTS.items():
+        data[col] = value
+    return data[INPUT_COLS]
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    X = _inputs(2000)
+    y = X["Rain_mm"] * 0.5 + X["Temp_C"] * 10 + (X["Commodity"] == "Padi") * 300
+    numeric = [c for c in FeatureBuilder().transform(X).columns if c not in KEY_COLS]
+    preprocessor = ColumnTransformer([
+        ("num", StandardScaler(), numeric),
+        ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), KEY_COLS),
+    ])
+    return Pipeline([
+        ("features", FeatureBuilder()), ("preprocessor", preprocessor),
+        ("model", RandomForestRegressor(n_estimators=20, random_state=0)),
+    ]).fit(X, y)
+
+
+@pytest.mark.parametrize("n_rows", [1, SMALL_BATCH, 500])
+def test_predict_matches_pipeline(pipeline, n_rows):
+    forest = FlatForest.from_pipeline(pipeline)
+    X = _inputs(n_rows, seed=1)
+    X.loc[X.index[0], "Province"] = "Papua"  # kategori tidak dikenal
+
+    expected = pipeline.predict(X)
+    np.testing.assert_allclose(forest.predict(X), expected, rtol=1e-9)
+    np.testing.assert_allclose(forest.predict(X.to_dict("records")), expected, rtol=1e-9)
+
+
+def test_predict_from_input_row(pipeline, tmp_path):
+    forest = FlatForest.from_pipeline(pipeline)
+    forest.save(str(tmp_path / "production.forest"))
+    forest = FlatForest.load(str(tmp_path / "production.forest"))
+    defaults = _inputs(1, seed=2).iloc[0].to_dict()
+    record = input_row("Bali", "B", "Jagung", 2.5, defaults)
+
+    expected = pipeline.predict(pd.DataFrame([record]))
+    np.testing.assert_allclose(forest.predict([record]), expected, rtol=1e-9)
+
+
+def test_missing_column_raises_key_error(pipeline):
+    forest = FlatForest.from_pipeline(pipeline)
+    X = _inputs(3).drop(columns="Soil_pH")
+    with pytest.raises(KeyError, match="Soil_pH"):
+        forest.predict(X)
+    with pytest.raises(KeyError, match="Soil_pH"):
+        forest.predict(X.to_dict("records"))
@@ -0,0 +1,86 @@
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from lookup import (
+    FALLBACK_DEFAULTS, INPUT_COLS, KEY_COLS, LOOKUP_PATH, LookupIndex, binary_path_for, build_lookup_binary,
+    input_row, load_lookup_table, read_lookup_binary,
+)
+
+
+@pytest.fixture(scope="module")
+def csv_lookup():
+    # Lookup seperti dulu dibaca app.py: CSV mentah, nama dinormalkan, tanpa kategori
+    lookup = pd.read_csv(LOOKUP_PATH)
+    for col in KEY_COLS:
+        lookup[col] = lookup[col].astype(str).str.strip().str.title()
+    return lookup
+
+
+def _old_record(lookup, province, district, commodity):
+    # Filter DataFrame lama di app.py: baris pertama kombinasi, atau None
+    row = lookup[
+        (lookup["Province"] == province) & (lookup["District"] == district) & (lookup["Commodity"] == commodity)
+    ]
+    return None if row.empty else row.iloc[0].to_dict()
+
+
+def _assert_same_record(record, expected):
+    assert record.keys() == expected.keys()
+    for col, value in expected.items():
+        if isinstance(value, float) and np.isnan(value):
+            assert np.isnan(record[col])
+        else:
+            assert record[col] == value, col
+
+
+def test_index_from_csv_and_binary_reproduce_csv_rows(csv_lookup, tmp_path):
+    csv_path = tmp_path / "lookup_tabel.csv"
+    shutil.copy(LOOKUP_PATH, csv_path)
+    binary_path = build_lookup_binary(str(csv_path))
+    binary, meta = read_lookup_binary(binary_path)
+    # lookup_tabel.lkp di repo dibangun dari lookup_tabel.csv yang sekarang
+    assert read_lookup_binary(binary_path_for(LOOKUP_PATH))[1] == meta
+    pd.testing.assert_frame_equal(binary, load_lookup_table(str(csv_path)))
+
+    indexes = [LookupIndex(load_lookup_table(str(csv_path))), LookupIndex(binary)]
+    keys = csv_lookup[KEY_COLS].drop_duplicates().itertuples(index=False)
+    n_keys = 0
+    for province, district, commodity in keys:
+        expected = _old_record(csv_lookup, province, district, commodity)
+        for index in indexes:
+            _assert_same_record(index.record(province, district, commodity), expected)
+        n_keys += 1
+    assert all(len(index) == n_keys for index in indexes)
+
+    index = indexes[1]
+    assert index.provinces() == sorted(csv_lookup["Province"].unique())
+    province = index.provinces()[0]
+    assert index.districts(province) == sorted(csv_lookup.loc[csv_lookup["Province"] == province, "District"].unique())
+
+
+def test_missing_key_falls_back_to_default_inputs(csv_lookup):
+    index = LookupIndex(load_lookup_table())
+    province = index.provinces()[0]
+    district = index.districts(province)[0]
+    assert index.record(province, district, "Tidak Ada") is None
+    assert index.record("Tidak Ada", district, "Padi") is None
+    assert index.districts("Tidak Ada") == [] and index.commodities(province, "Tidak Ada") == []
+
+    # Seperti di app.py: tanpa record dipakai FALLBACK_DEFAULTS
+    defaults = index.record("Tidak Ada", district, "Padi") or FALLBACK_DEFAULTS
+    row = input_row("Tidak Ada", district, "Padi", 1.5, defaults)
+    assert list(row) == INPUT_COLS
+    assert {col: row[col] for col in FALLBACK_DEFAULTS} == FALLBACK_DEFAULTS
+
+
+def test_stale_binary_is_ignored(tmp_path):
+    csv_path = tmp_path / "lookup_tabel.csv"
+    shutil.copy(LOOKUP_PATH, csv_path)
+    build_lookup_binary(str(csv_path))
+    # CSV berubah setelah .lkp dibangun: lookup dibaca dari CSV
+    lines = csv_path.read_text(encoding="utf-8").splitlines()
+    csv_path.write_text("\n".join(lines[:-1]) + "\n", encoding="utf-8")
+    assert len(load_lookup_table(str(csv_path))) == len(lines) - 2
@@ -0,0 +1,200 @@
+import hashlib
+import io
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import joblib
+import pytest
+
+import model_store
+from model_store import ModelCache, ModelRegistry
+
+
+class _Files(BaseHTTPRequestHandler):
+    files = {}
+    requests = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        name = self.path.lstrip("/")
+        self.requests.append((name, self.headers.get("Range")))
+        if name not in self.files:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = self.files[name]
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        status, start = 200, 0
+        if self.headers.get("Range") and self.headers.get("If-Range") == etag:
+            start = int(self.headers["Range"][len("bytes="):-1])
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        self.send_response(status)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+
+@pytest.fixture
+def server():
+    _Files.files = {f"model_{i}.pkl": os.urandom(4096 + i) for i in range(8)}
+    _Files.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Files)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_port}/"
+    httpd.shutdown()
+
+
+def test_parallel_downloads_keep_every_blob(server, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    paths = {}
+
+    def fetch(name):
+        paths[name], _ = cache.fetch(name, server + name)
+
+    threads = [threading.Thread(target=fetch, args=(name,)) for name in _Files.files]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    for name, body in _Files.files.items():
+        with open(paths[name], "rb") as f:
+            assert f.read() == body
+
+
+def test_prune_from_another_thread_keeps_blob_being_stored(server, tmp_path, monkeypatch):
+    cache = ModelCache(str(tmp_path))
+    writing_ref = threading.Event()
+    write_json = model_store._write_json
+
+    def slow_write_json(path, data):
+        # Jeda antara blob dipindahkan ke blobs/ dan ref-nya ditulis
+        if os.sep + "refs" + os.sep in path:
+            writing_ref.set()
+            threading.Event().wait(0.2)
+        write_json(path, data)
+
+    monkeypatch.setattr(model_store, "_write_json", slow_write_json)
+    pruner = threading.Thread(target=lambda: writing_ref.wait(5) and ModelCache(str(tmp_path)).prune())
+    pruner.start()
+    path, _ = cache.fetch("model_1.pkl", server + "model_1.pkl")
+    pruner.join()
+
+    assert writing_ref.is_set()
+    assert os.path.exists(path)
+
+
+def _write_partial(cache_dir, name, data, body):
+    part_path = os.path.join(cache_dir, "partial", name)
+    with open(part_path, "wb") as f:
+        f.write(data)
+    with open(part_path + ".json", "w") as f:
+        f.write(f'{{"etag": "\\"{hashlib.md5(body).hexdigest()}\\""}}')
+    return part_path
+
+
+def test_complete_partial_file_is_downloaded_again_on_416(server, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    name = "model_0.pkl"
+    body = _Files.files[name]
+    # Unduhan sebelumnya terputus tepat setelah byte terakhir ditulis
+    part_path = _write_partial(str(tmp_path), name, body, body)
+
+    path, status = cache.fetch(name, server + name)
+
+    assert status == "downloaded"
+    with open(path, "rb") as f:
+        assert f.read() == body
+    assert not os.path.exists(part_path)
+    assert _Files.requests == [(name, f"bytes={len(body)}-"), (name, None)]
+
+
+def test_not_modified_serves_cached_blob_without_rewriting_it(server, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    name = "model_1.pkl"
+    path, status = cache.fetch(name, server + name)
+    assert status == "downloaded"
+    ref_path = cache._ref_path(name)
+    before = {p: os.stat(p).st_mtime_ns for p in (path, ref_path)}
+
+    again, status = cache.fetch(name, server + name)
+
+    assert (again, status) == (path, "hit")
+    assert {p: os.stat(p).st_mtime_ns for p in (path, ref_path)} == before
+    assert os.listdir(os.path.join(str(tmp_path), "partial")) == []
+    assert len(_Files.requests) == 2
+
+
+def test_partial_download_is_resumed_and_checked_against_md5_etag(server, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    name = "model_2.pkl"
+    body = _Files.files[name]
+    part_path = _write_partial(str(tmp_path), name, body[:1000], body)
+
+    path, status = cache.fetch(name, server + name)
+
+    assert status == "resumed"
+    assert _Files.requests == [(name, "bytes=1000-")]
+    with open(path, "rb") as f:
+        assert f.read() == body
+    assert not os.path.exists(part_path)
+
+
+def test_resumed_download_with_corrupt_prefix_fails_md5_check(server, tmp_path):
+    cache = ModelCache(str(tmp_path))
+    name = "model_3.pkl"
+    body = _Files.files[name]
+    part_path = _write_partial(str(tmp_path), name, bytes(1000), body)
+
+    with pytest.raises(model_store.ModelDownloadError, match="MD5"):
+        cache.fetch(name, server + name)
+    # Bagian yang rusak dibuang, unduhan berikutnya mulai dari awal
+    assert not os.path.exists(part_path)
+    path, status = cache.fetch(name, server + name)
+    assert status == "downloaded"
+    with open(path, "rb") as f:
+        assert f.read() == body
+
+
+def _joblib_bytes(obj):
+    buffer = io.BytesIO()
+    joblib.dump(obj, buffer)
+    return buffer.getvalue()
+
+
+def test_registry_fetches_each_model_only_on_first_access(server, tmp_path):
+    _Files.files = {"a.pkl": _joblib_bytes({"model": "a"}), "b.pkl": _joblib_bytes({"model": "b"})}
+    registry = ModelRegistry({"a": "a.pkl", "b": "b.pkl"}, base_url=server, cache_dir=str(tmp_path))
+
+    # Membuat registry, iterasi kunci dan laporan memori tidak mengunduh apa pun
+    assert list(registry) == ["a", "b"] and "a" in registry and len(registry) == 2
+    assert not any(r["loaded"] for r in registry.memory_report().values())
+    assert _Files.requests == []
+
+    assert registry["a"] == {"model": "a"}
+    assert [name for name, _ in _Files.requests] == ["a.pkl"]
+    assert registry["a"] is registry["a"]
+    assert len(_Files.requests) == 1
+
+    report = registry.memory_report()
+    assert report["a"]["loaded"] and report["a"]["file_bytes"] == len(_Files.files["a.pkl"])
+    assert not report["b"]["loaded"] and report["b"]["memory_bytes"] == 0
+    assert list(registry.timings()) == ["a"]
+    with pytest.raises(KeyError):
+        registry["c"]
@@ -0,0 +1,52 @@
+import threading
+
+from prediction_memo import PredictionMemo
+
+
+def test_compute_gets_rounded_area():
+    memo = PredictionMemo()
+    areas = []
+
+    def compute(area):
+        areas.append(area)
+        return area * 2
+
+    assert memo.get_or_compute("aceh", "x", "padi", 1.2000000000000002, compute) == 2.4
+    assert memo.get_or_compute("Aceh", "X", "Padi", 1.2, compute) == 2.4
+    assert areas == [1.2]
+
+
+def test_unsaved_counter_is_exact_under_threads(tmp_path):
+    memo = PredictionMemo(path=str(tmp_path / "memo.json"), version="v1", save_every=10**9)
+
+    def worker(start):
+        for i in range(start, start + 500):
+            memo.get_or_compute("Aceh", "X", "Padi", i, lambda area: area)
+
+    threads = [threading.Thread(target=worker, args=(n * 500,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert memo._unsaved == 2000
+
+
+def test_no_persistence_until_version_is_known(tmp_path):
+    path = tmp_path / "memo.json"
+    PredictionMemo(path=str(path), version=None).get_or_compute("Aceh", "X", "Padi", 1, lambda area: 1.0)
+    memo = PredictionMemo(path=str(path), version=None, save_every=1)
+    memo.get_or_compute("Aceh", "X", "Padi", 2, lambda area: 2.0)
+    memo.save()
+    assert not path.exists()
+
+    # Setelah versi diketahui, entri yang dihitung di memori ikut disimpan
+    memo.set_version("v1")
+    memo.save()
+    reloaded = PredictionMemo(path=str(path), version="v1")
+    assert reloaded.loaded == 1
+    assert PredictionMemo(path=str(path), version="v2").loaded == 0
+
+    # Versi berubah: hasil model lama dibuang
+    memo.set_version("v2")
+    assert len(memo.cache) == 0
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from features import FeatureBuilder
+from lookup import KEY_COLS
+from prediction_table import AREA_MAX, AREA_MIN, PredictionTable, build_model_input
+
+
+def _lookup(n=12, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "Province": [f"P{i % 3}" for i in range(n)],
+        "District": [f"D{i}" for i in range(n)],
+        "Commodity": rng.choice(["Padi", "Jagung"], n),
+        "Rain_mm": rng.uniform(1000, 3000, n), "Temp_C": rng.uniform(22, 32, n),
+        "Humidity_pct": rng.uniform(60, 95, n), "Soil_pH": rng.uniform(4.5, 7.5, n),
+        "Soil_N_index": rng.integers(1, 4, n), "Soil_P_index": rng.integers(1, 4, n),
+        "Soil_K_index": rng.integers(1, 4, n),
+    })
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    lookup = _lookup()
+    rng = np.random.default_rng(1)
+    rows = lookup.sample(600, replace=True, random_state=1).reset_index(drop=True)
+    X = build_model_input(rows, rng.uniform(AREA_MIN, AREA_MAX, len(rows)))
+    y = X["Area_Ha"] * 3 + X["Temp_C"] * 10 + (X["Commodity"] == "Padi") * 300
+    numeric = [c for c in X.columns if c not in KEY_COLS]
+    preprocessor = ColumnTransformer([
+        ("num", "passthrough", numeric),
+        ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), KEY_COLS),
+    ])
+    return Pipeline([
+        ("features", FeatureBuilder()), ("preprocessor", preprocessor),
+        ("model", RandomForestRegressor(n_estimators=10, random_state=0)),
+    ]).fit(X, y)
+
+
+@pytest.fixture(scope="module")
+def table(pipeline):
+    return PredictionTable.build(pipeline, _lookup(), n_check=500)
+
+
+def test_table_matches_model_at_grid_points_and_interpolates_midpoints(pipeline, table):
+    lookup = _lookup()
+    grid = table.grid
+    assert grid[0] == pytest.approx(AREA_MIN) and grid[-1] == pytest.approx(AREA_MAX)
+
+    for i in (0, 5, len(lookup) - 1):
+        row = lookup.iloc[[i]]
+        key = tuple(row[KEY_COLS].iloc[0])
+        repeated = row.loc[row.index.repeat(len(grid))].reset_index(drop=True)
+        expected = pipeline.predict(build_model_input(repeated, grid))
+        np.testing.assert_allclose(table.values[i], expected, rtol=1e-6)
+        for j in (0, 17, len(grid) - 1):
+            assert table.lookup(*key, grid[j]) == pytest.approx(expected[j], rel=1e-6)
+        # Titik tengah: rata-rata dua titik grid di sekitarnya
+        for j in (0, 17, len(grid) - 2):
+            middle = (grid[j] + grid[j + 1]) / 2
+            assert table.lookup(*key, middle) == pytest.approx((expected[j] + expected[j + 1]) / 2, rel=1e-6)
+
+    np.testing.assert_allclose(table.lookup_many(lookup, np.full(len(lookup), 3.25)),
+                               [table.lookup(*key, 3.25) for key in zip(*(lookup[c] for c in KEY_COLS))])
+
+
+def test_outside_area_range_or_unknown_key_is_left_to_the_model(table):
+    key = tuple(_lookup()[KEY_COLS].iloc[0])
+    # Di luar 0.1-200 ha tidak diekstrapolasi: None, sehingga app.py memakai model
+    for area in (0.05, AREA_MAX + 0.01, 1000.0):
+        assert table.lookup(*key, area) is None
+    assert table.lookup("Tidak", "Ada", "Padi", 1.0) is None
+
+    rows = _lookup().iloc[[0, 0, 0, 0]].reset_index(drop=True)
+    rows.loc[3, "District"] = "Tidak ada"
+    result = table.lookup_many(rows, [0.05, AREA_MAX + 1, 1.0, 1.0])
+    assert np.isnan(result[[0, 1, 3]]).all()
+    assert result[2] == pytest.approx(table.lookup(*key, 1.0))
+
+
+def test_error_report_matches_manual_check(pipeline, table, tmp_path):
+    rng = np.random.default_rng(7)
+    lookup = _lookup()
+    rows = rng.integers(0, len(lookup), 300)
+    areas = rng.uniform(AREA_MIN, AREA_MAX, 300)
+    sample = lookup.iloc[rows].reset_index(drop=True)
+    exact = pipeline.predict(build_model_input(sample, areas))
+    errors = np.abs(table.lookup_many(sample, areas) - exact)
+
+    report = table.error_report(pipeline, lookup, n_check=300, random_state=7)
+    assert report["n_check"] == 300
+    assert report["max_abs_error"] == pytest.approx(errors.max())
+    assert report["mean_abs_error"] == pytest.approx(errors.mean())
+    assert report["p99_abs_error"] == pytest.approx(np.quantile(errors, 0.99))
+    assert table.report["n_check"] == 500 and table.report["max_abs_error"] > 0
+
+    table.save(str(tmp_path / "tabel.tbl"))
+    loaded = PredictionTable.load(str(tmp_path / "tabel.tbl"))
+    assert loaded.report == table.report
+    np.testing.assert_array_equal(loaded.values, table.values)
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantile_sketch import QuantileSketchRecommender
+from recommender import DOSE_COLS, DOSE_KEYS
+
+
+def _data(n, seed=0, commodities=("Padi",)):
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({
+        "Commodity": rng.choice(list(commodities), n), "Province": "Aceh",
+        "Soil_pH": rng.uniform(5.9, 6.1, n), "Temp_C": rng.uniform(26.6, 27.4, n),
+    })
+    for col in DOSE_COLS:
+        data[col] = rng.lognormal(5, 1, n)
+    return data
+
+
+def _query():
+    return pd.DataFrame({"Commodity": ["Padi"], "Province": ["Aceh"], "Soil_pH": [6.0], "Temp_C": [27.0]})
+
+
+def test_small_cells_are_exact_and_not_clipped():
+    data = _data(50)
+    data.loc[0, "Pupuk_Urea_kgHa"] = 5000.0
+    sketch = QuantileSketchRecommender().fit(data)
+
+    result = sketch.recommend_many(_query()).iloc[0]
+
+    for key, col in zip(DOSE_KEYS, DOSE_COLS):
+        assert result[key] == data[col].median()
+    assert result["rank_error_bound"] == 0
+    assert sketch.memory_bytes() <= data[DOSE_COLS].to_numpy().nbytes + 64
+
+
+@pytest.mark.parametrize("merged", [False, True])
+def test_median_rank_within_reported_bound(merged):
+    data = _data(200_000)
+    if merged:
+        sketch = QuantileSketchRecommender(k=64).fit(data.iloc[:70_000])
+        sketch.merge(QuantileSketchRecommender(k=64).fit(data.iloc[70_000:]))
+    else:
+        sketch = QuantileSketchRecommender(k=64)
+        for start in range(0, len(data), 30_000):
+            sketch.partial_fit(data.iloc[start:start + 30_000])
+
+    result = sketch.recommend_many(_query()).iloc[0]
+    bound = result["rank_error_bound"]
+
+    assert 0 < bound < 0.1
+    assert sketch.memory_bytes() < data[DOSE_COLS].to_numpy().nbytes / 50
+    for key, col in zip(DOSE_KEYS, DOSE_COLS):
+        rank = (data[col] <= result[key]).mean()
+        assert abs(rank - 0.5) <= bound + 1 / len(data)
+
+
+def test_save_load_roundtrip(tmp_path):
+    sketch = QuantileSketchRecommender(k=32).fit(_data(5000, commodities=("Padi", "Jagung")))
+    path = str(tmp_path / "sketch.qsk")
+    sketch.save(path)
+
+    loaded = QuantileSketchRecommender.load(path)
+
+    queries = pd.concat([_query(), _query().assign(Commodity="Jagung"), _query().assign(Province="Bali")])
+    pd.testing.assert_frame_equal(loaded.recommend_many(queries), sketch.recommend_many(queries))
+    assert loaded.memory_bytes() == sketch.memory_bytes()
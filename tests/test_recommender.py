@@ -0,0 +1,220 @@
+import math
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommender import DOSE_COLS, DOSE_KEYS, SimilarityRecommender
+
+
+def _history():
+    rng = np.random.default_rng(0)
+    n = 300
+    data = pd.DataFrame({
+        'Commodity': rng.choice(['Padi', 'Jagung'], n),
+        'Province': rng.choice(['Jawa Barat', 'Aceh'], n),
+        'Soil_pH': np.round(rng.uniform(5.0, 5.2, n), 2),
+        'Temp_C': np.round(rng.uniform(24, 30, n), 1),
+    })
+    for col in DOSE_COLS:
+        data[col] = rng.uniform(50, 300, n)
+    data.loc[::17, 'Pupuk_KCl_kgHa'] = np.nan
+    return data
+
+
+def _assert_matches_scalar(model, queries):
+    batch = model.recommend_many(queries)
+    for idx, q in queries.iterrows():
+        expected = model.recommend(q['Commodity'], q['Province'], q['Soil_pH'], q['Temp_C'])
+        row = batch.loc[idx]
+        assert row['status'] == expected['status']
+        if expected['status'] != "success":
+            continue
+        assert expected['sumber_data'] == (
+            f"Berdasarkan {row['jumlah_petani']} petani dengan {row['sumber_data']}."
+        )
+        for key in DOSE_KEYS:
+            value = expected['rekomendasi'][key]
+            if math.isnan(value):
+                assert math.isnan(row[key])
+            else:
+                assert row[key] == pytest.approx(value)
+
+
+def test_recommend_many_matches_recommend():
+    model = SimilarityRecommender().fit(_history())
+    queries = pd.DataFrame({
+        'Commodity': ['Padi', 'Padi', 'Jagung', 'Padi', 'Kedelai', 'Jagung'],
+        'Province': ['Jawa Barat', 'Aceh', 'Aceh', 'Jawa Barat', 'Aceh', 'Bali'],
+        'Soil_pH': [5.1, 5.0, 5.2, 8.0, 5.1, 5.1],
+        'Temp_C': [27.0, 40.0, 25.5, 27.0, 27.0, 27.0],
+    })
+    _assert_matches_scalar(model, queries)
+
+
+def test_recommend_many_empty_ph_window_uses_province_fallback():
+    model = SimilarityRecommender().fit(_history())
+    # Semua query segmen ini di luar jendela pH data (5.0-5.2), jadi jendelanya kosong
+    queries = pd.DataFrame({
+        'Commodity': ['Padi', 'Padi', 'Jagung'],
+        'Province': ['Jawa Barat', 'Jawa Barat', 'Aceh'],
+        'Soil_pH': [8.0, 3.0, 8.0],
+        'Temp_C': [27.0, 27.0, 27.0],
+    })
+    result = model.recommend_many(queries)
+    assert (result['status'] == "success").all()
+    assert (result['sumber_data'] == "data provinsi secara umum").all()
+    _assert_matches_scalar(model, queries)
+
+
+def test_save_and_mmap_load_match_in_memory_model(tmp_path):
+    model = SimilarityRecommender().fit(_history())
+    path = str(tmp_path / "rekom.tumbuh")
+    model.save(path, dose_dtype=np.float64)
+
+    loaded = SimilarityRecommender.load(path, mmap=True)
+
+    # View read-only di atas memory map, bukan salinan
+    assert not loaded._ph.flags.owndata and not loaded._ph.flags.writeable
+    for name in ('_ph', '_temp', '_doses'):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(model, name))
+    assert loaded._segments == model._segments
+    pd.testing.assert_frame_equal(loaded.dataset, model.dataset)
+
+    queries = pd.DataFrame({
+        'Commodity': ['Padi', 'Jagung', 'Padi', 'Kedelai'],
+        'Province': ['Jawa Barat', 'Aceh', 'Aceh', 'Aceh'],
+        'Soil_pH': [5.1, 5.2, 8.0, 5.1],
+        'Temp_C': [27.0, 25.5, 27.0, 27.0],
+    })
+    pd.testing.assert_frame_equal(loaded.recommend_many(queries), model.recommend_many(queries))
+    for _, q in queries.iterrows():
+        args = (q['Commodity'], q['Province'], q['Soil_pH'], q['Temp_C'])
+        assert loaded.recommend(*args) == model.recommend(*args)
+
+
+@pytest.mark.parametrize("corrupt, message", [
+    (lambda data: b"BUKANINI" + data[8:], "bukan file kolomnar"),
+    (lambda data: data[:6], "bukan file kolomnar"),
+    (lambda data: data[:10], "terpotong"),
+    (lambda data: data[:40], "terpotong"),
+    (lambda data: data[:-100], "terpotong"),
+])
+@pytest.mark.parametrize("mmap", [True, False])
+def test_load_rejects_bad_magic_and_truncated_files(tmp_path, corrupt, message, mmap):
+    path = tmp_path / "rekom.tumbuh"
+    SimilarityRecommender().fit(_history()).save(str(path))
+    path.write_bytes(corrupt(path.read_bytes()))
+
+    with pytest.raises(ValueError, match=message):
+        SimilarityRecommender.load(str(path), mmap=mmap)
+
+
+def test_cache_hits_rounding_and_invalidation_after_partial_fit():
+    plain = SimilarityRecommender().fit(_history())
+    model = SimilarityRecommender(cache_size=16).fit(_history())
+
+    first = model.recommend('Padi', 'Jawa Barat', 5.1, 27.0)
+    assert first == plain.recommend('Padi', 'Jawa Barat', 5.1, 27.0)
+    assert model.cache_info()['misses'] == 1
+
+    # pH/suhu dibulatkan ke 2/1 desimal sebelum menjadi kunci cache
+    assert model.recommend('Padi', 'Jawa Barat', 5.1000000001, 26.96) == first
+    assert model.recommend('Padi', 'Jawa Barat', 5.104, 27.04) == first
+    assert model.cache_info()['hits'] == 2
+    model.recommend('Padi', 'Jawa Barat', 5.11, 27.0)
+    assert model.cache_info()['misses'] == 2
+
+    # Hasil yang dikembalikan adalah salinan
+    first['rekomendasi']['urea_kg_ha'] = -1
+    assert model.recommend('Padi', 'Jawa Barat', 5.1, 27.0)['rekomendasi']['urea_kg_ha'] != -1
+
+    new_rows = _history().head(40).assign(Province='Jawa Barat', Commodity='Padi', Soil_pH=5.1, Temp_C=27.0)
+    model.partial_fit(new_rows)
+    plain.partial_fit(new_rows)
+    assert model.cache_info()['size'] == 0
+    after = model.recommend('Padi', 'Jawa Barat', 5.1, 27.0)
+    assert after == plain.recommend('Padi', 'Jawa Barat', 5.1, 27.0)
+    assert after['sumber_data'] != first['sumber_data']
+
+
+def test_knn_matches_brute_force_neighbour_search():
+    rng = np.random.default_rng(1)
+    data = _history().head(120)
+    # Nilai kontinu agar tidak ada jarak yang sama persis (urutan tetangga jelas)
+    data['Soil_pH'] = rng.uniform(4.5, 7.5, len(data))
+    data['Temp_C'] = rng.uniform(22, 32, len(data))
+    model = SimilarityRecommender(mode="knn", n_neighbors=7).fit(data)
+    queries = pd.DataFrame({
+        'Commodity': ['Padi', 'Jagung', 'Padi', 'Kedelai'],
+        'Province': ['Aceh', 'Aceh', 'Bali', 'Aceh'],
+        'Soil_pH': [5.3, 6.9, 4.0, 6.0],
+        'Temp_C': [27.4, 23.1, 35.0, 27.0],
+    })
+    batch = model.recommend_many(queries)
+
+    for idx, q in queries.iterrows():
+        rows = data[data['Commodity'] == q['Commodity']]
+        if rows.empty:
+            assert batch.loc[idx, 'status'] == "error"
+            continue
+        points = rows[['Soil_pH', 'Temp_C']].to_numpy()
+        mean, scale = points.mean(axis=0), points.std(axis=0)
+        query = (np.array([q['Soil_pH'], q['Temp_C']]) - mean) / scale
+        distances = np.sqrt((((points - mean) / scale - query) ** 2).sum(axis=1))
+        nearest = np.argsort(distances)[:7]
+        weights = 1.0 / (distances[nearest] + 1e-6)
+
+        expected = []
+        for col in DOSE_COLS:
+            values = rows[col].to_numpy()[nearest]
+            valid = ~np.isnan(values)
+            order = np.argsort(values[valid])
+            cumulative = np.cumsum(weights[valid][order])
+            expected.append(values[valid][order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+        single = model.recommend(q['Commodity'], q['Province'], q['Soil_pH'], q['Temp_C'])
+        assert batch.loc[idx, 'jumlah_petani'] == 7
+        np.testing.assert_allclose(batch.loc[idx, DOSE_KEYS].to_numpy(dtype=float), expected)
+        np.testing.assert_allclose([single['rekomendasi'][key] for key in DOSE_KEYS], expected)
+
+
+@pytest.mark.parametrize("mode", ["window", "knn"])
+def test_partial_fit_matches_fit_on_concatenated_data(mode):
+    data = _history()
+    a, b = data.iloc[:150], data.iloc[150:]
+    # Baris baru juga membawa segmen yang belum ada di data awal
+    b = pd.concat([b, b.head(20).assign(Province='Bali')], ignore_index=True)
+    incremental = SimilarityRecommender(mode=mode).partial_fit(a).partial_fit(b)
+    full = SimilarityRecommender(mode=mode).fit(pd.concat([a, b], ignore_index=True))
+
+    queries = pd.DataFrame({
+        'Commodity': ['Padi', 'Jagung', 'Padi', 'Jagung', 'Kedelai'],
+        'Province': ['Jawa Barat', 'Aceh', 'Bali', 'Bali', 'Aceh'],
+        'Soil_pH': [5.1, 5.2, 5.0, 8.0, 5.1],
+        'Temp_C': [27.0, 25.5, 27.0, 27.0, 27.0],
+    })
+    pd.testing.assert_frame_equal(incremental.recommend_many(queries), full.recommend_many(queries))
+    for _, q in queries.iterrows():
+        args = (q['Commodity'], q['Province'], q['Soil_pH'], q['Temp_C'])
+        assert incremental.recommend(*args) == full.recommend(*args)
+
+
+def test_load_ignores_delta_of_another_base_artifact(tmp_path):
+    data = _history()
+    first, second = str(tmp_path / "a.tumbuh"), str(tmp_path / "b.tumbuh")
+    SimilarityRecommender().fit(data.iloc[:200]).save(first)
+    SimilarityRecommender().fit(data.iloc[:250]).save(second)
+
+    new_rows = data.iloc[200:]
+    SimilarityRecommender.load(first).partial_fit(new_rows, delta_path=first + ".delta")
+    assert len(SimilarityRecommender.load(first)._ph) == len(data)
+
+    # Delta milik artefak pertama dipasang di samping artefak kedua
+    without_delta = SimilarityRecommender.load(second)
+    os.replace(first + ".delta", second + ".delta")
+    with pytest.warns(UserWarning, match="artefak lain"):
+        loaded = SimilarityRecommender.load(second)
+    assert len(loaded._ph) == 250
+    pd.testing.assert_frame_equal(loaded.dataset, without_delta.dataset)
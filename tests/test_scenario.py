@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder
+
+from features import FeatureBuilder
+from lookup import INPUT_COLS, input_frame, input_row
+from scenario import FERTILIZER_COMPONENTS, MODAL_AWAL, PERAWATAN, PRICE_COLS, run_scenarios
+
+
+KEY_COLS = ["Province", "District", "Commodity"]
+DEFAULTS = {
+    "Rain_mm": 2000.0, "Temp_C": 27.0, "Humidity_pct": 80.0, "Soil_pH": 6.0,
+    "Soil_N_index": 2, "Soil_P_index": 2, "Soil_K_index": 3,
+    "InputPrice_Urea_RpKg": 7000.0, "InputPrice_SP36_RpKg": 8000.0, "InputPrice_KCl_RpKg": 9000.0,
+}
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    rng = np.random.default_rng(0)
+    n = 1500
+    X = input_frame([input_row("Aceh", "A", "Padi", 1.0, DEFAULTS)] * n)
+    X["Commodity"] = rng.choice(["Padi", "Jagung"], n)
+    X["Area_Ha"] = rng.uniform(0.5, 30, n)
+    X["Year"] = rng.integers(2020, 2030, n)
+    for col in PRICE_COLS:
+        X[col] = X[col] * rng.uniform(0.5, 2.0, n)
+    y = X["Area_Ha"] * 5 + (X["Year"] - 2020) * 40 - X["InputPrice_Urea_RpKg"] / 50
+    numeric = [c for c in FeatureBuilder().transform(X).columns if c not in KEY_COLS]
+    preprocessor = ColumnTransformer([
+        ("num", "passthrough", numeric),
+        ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), KEY_COLS),
+    ])
+    return Pipeline([
+        ("features", FeatureBuilder()), ("preprocessor", preprocessor),
+        ("model", RandomForestRegressor(n_estimators=10, random_state=0)),
+    ]).fit(X[INPUT_COLS], y)
+
+
+def _scalar_costs(area, multiplier):
+    # Kalkulator biaya lama di app.py (satu skenario), dengan pupuk ikut pengali harga
+    factor = 1.0 if area <= 2 else 0.95 if area <= 10 else 0.85
+    modal = sum(v * (multiplier if k in FERTILIZER_COMPONENTS else 1.0) for k, v in MODAL_AWAL.items())
+    rawat = sum(v * (multiplier if k in FERTILIZER_COMPONENTS else 1.0) for k, v in PERAWATAN.items())
+    return modal * factor * area, rawat * factor * area
+
+
+def test_vectorized_sweep_matches_per_row_predict_loop(pipeline):
+    areas, years, multipliers = [0.5, 2.0, 7.5, 25.0], [2024, 2027], [0.8, 1.0, 1.5]
+    result = run_scenarios(pipeline, "Aceh", "A", "Padi", DEFAULTS, areas, years, multipliers, selling_price=6500)
+    assert len(result) == len(areas) * len(years) * len(multipliers)
+
+    expected = []
+    for area in areas:
+        for year in years:
+            for multiplier in multipliers:
+                defaults = {**DEFAULTS, "Year": year}
+                for col in PRICE_COLS:
+                    defaults[col] = DEFAULTS[col] * multiplier
+                production = pipeline.predict(input_frame([input_row("Aceh", "A", "Padi", area, defaults)]))[0]
+                modal, rawat = _scalar_costs(area, multiplier)
+                expected.append({
+                    "Area_Ha": area, "Year": year, "Pengali_Harga_Pupuk": multiplier,
+                    "Produksi_KgHa": production, "Total_Biaya_Rp": modal + rawat,
+                    "Margin_Rp": production * area * 6500 - (modal + rawat),
+                })
+    expected = pd.DataFrame(expected)
+
+    pd.testing.assert_frame_equal(result[expected.columns], expected, check_dtype=False)
+    # Model memang bereaksi terhadap tahun dan harga, jadi kolom itu benar-benar diuji
+    assert result.groupby("Year")["Produksi_KgHa"].nunique().gt(1).all()
+    assert result["Produksi_KgHa"].nunique() > len(areas)
@@ -0,0 +1,109 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recommender import DOSE_COLS, SimilarityRecommender
+from service import MicroBatcher, PredictionService
+
+
+def test_concurrent_identical_requests_share_one_call():
+    calls = []
+    release = threading.Event()
+
+    def handler(items):
+        calls.append(list(items))
+        release.wait(5)
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(handler, max_batch=8, max_wait=0.001)
+    first = batcher.submit("a", 21)
+    # Selama "a" masih diproses, request identik menunggu Future yang sama
+    futures = [batcher.submit("a", 21) for _ in range(5)]
+    release.set()
+
+    assert [f.result(5) for f in [first] + futures] == [42] * 6
+    assert all(f is first for f in futures)
+    assert calls == [[21]]
+    assert batcher.stats["coalesced"] == 5
+
+
+def test_concurrent_requests_are_merged_into_one_batch():
+    batch_sizes = []
+    batcher = MicroBatcher(lambda items: batch_sizes.append(len(items)) or list(items),
+                           max_batch=16, max_wait=0.5)
+    start = threading.Barrier(8)
+    results = {}
+
+    def client(i):
+        start.wait()
+        results[i] = batcher.submit(i, i).result(5)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: i for i in range(8)}
+    assert sum(batch_sizes) == 8
+    assert len(batch_sizes) < 8
+
+
+def test_one_bad_item_does_not_fail_the_batch():
+    def handler(items):
+        if "rusak" in items:
+            raise ValueError("item rusak")
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(handler, max_batch=8, max_wait=0.2)
+    futures = {item: batcher.submit(item, item) for item in ["padi", "rusak", "jagung"]}
+
+    assert futures["padi"].result(5) == "PADI"
+    assert futures["jagung"].result(5) == "JAGUNG"
+    with pytest.raises(ValueError, match="item rusak"):
+        futures["rusak"].result(5)
+    assert batcher.stats["batches"] == 1
+    assert batcher.stats["retried"] == 3
+
+
+class _ProductionModel:
+    def predict(self, frame):
+        if (frame["Commodity"] == "Rusak").any():
+            raise ValueError("komoditas rusak")
+        return np.full(len(frame), 1000.0)
+
+
+def _service():
+    lookup = pd.DataFrame({
+        "Province": ["Aceh", "Aceh"], "District": ["Aceh Besar", "Aceh Besar"],
+        "Commodity": ["Padi", "Rusak"], "Rain_mm": [2000.0, 2000.0], "Temp_C": [27.0, 27.0],
+        "Humidity_pct": [80.0, 80.0], "Area_Ha": [1.0, 1.0], "Soil_pH": [5.1, 5.1],
+        "Soil_N_index": [3, 3], "Soil_P_index": [3, 3], "Soil_K_index": [3, 3],
+    })
+    history = pd.DataFrame({
+        "Commodity": ["Padi"] * 4, "Province": ["Aceh"] * 4,
+        "Soil_pH": [5.0, 5.1, 5.2, 5.1], "Temp_C": [26.0, 27.0, 28.0, 27.5],
+    })
+    history[DOSE_COLS] = 100.0
+    models = {"production": _ProductionModel(), "recommender": SimilarityRecommender().fit(history)}
+    return PredictionService(models, lookup, max_batch=8, max_wait=0.2)
+
+
+def test_service_isolates_failing_request():
+    service = _service()
+    futures = [
+        service.batcher.submit(key, key) for key in [
+            ("Aceh", "Aceh Besar", "Padi", 2.0),
+            ("Aceh", "Aceh Besar", "Rusak", 1.0),
+            ("Aceh", "Aceh Besar", "Padi", 3.0),
+        ]
+    ]
+
+    first, third = futures[0].result(5), futures[2].result(5)
+    assert first["total_produksi_kg"] == 2000.0
+    assert first["rekomendasi"]["status"] == "success"
+    assert third["total_produksi_kg"] == 3000.0
+    with pytest.raises(ValueError, match="komoditas rusak"):
+        futures[1].result(5)
@@ -0,0 +1,22 @@
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+
+from tuning import successive_halving
+
+
+def test_failing_trial_is_recorded_instead_of_stopping_the_search():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(300, 4))
+    y = pd.DataFrame({"a": X[:, 0] * 3 + rng.normal(size=300)})
+    # "salah" bukan nilai max_features yang valid: fit melempar ValueError
+    spaces = {"Random Forest": (RandomForestRegressor, {"random_state": 0}, {"max_features": [1.0, "salah"]})}
+
+    best, history = successive_halving(X, y, ["a"], spaces=spaces, n_candidates=2, min_resource=5,
+                                       max_resource=15, time_budget=60, max_workers=2)
+
+    failed = history[history["Error"].notna()]
+    assert len(failed) > 0
+    assert failed["Error"].str.contains("max_features").all()
+    assert np.isneginf(failed["R2_Val"]).all()
+    assert best["a"][1]["max_features"] == 1.0
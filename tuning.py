@@ -0,0 +1,361 @@
+# Pencarian hyperparameter dengan successive halving untuk regresor TUMBUH
+#
+# Setiap target punya satu braket: sejumlah konfigurasi acak dari RandomForest,
+# XGBoost dan LightGBM dilatih dengan sedikit pohon (n_estimators = resource), lalu
+# hanya 1/eta terbaik (R2 validasi) yang naik ke ronde berikutnya dengan pohon eta
+# kali lebih banyak. Biaya tiap ronde kira-kira sama, jauh lebih murah daripada grid.
+#
+# Matriks hasil preprocessing (model_compare.prepare_matrices) dipakai ulang: split
+# fit/validasi ditulis sekali ke .npy dan dibuka read-only (memory map) oleh setiap
+# worker, semua trial satu ronde (semua target) berjalan paralel di pool proses.
+#
+# Anggaran:
+# - time_budget (detik) untuk tahap pencarian. Ronde berikutnya hanya dimulai jika
+#   perkiraan waktunya (dari waktu fit ronde sebelumnya) masih muat. Saat anggaran
+#   habis, proses worker yang masih menjalankan trial dihentikan paksa, sehingga fit
+#   ulang pemenang dan pengukuran latensinya tidak berebut CPU dengan trial lama.
+# - memory_budget_mb dibagi rata ke worker dan dipasang sebagai RLIMIT_DATA (Unix).
+#   Trial yang melewatinya gagal dengan MemoryError dan tersingkir dari braket.
+#   Matriks memory map tidak ikut terhitung.
+# Trial yang gagal (exception apa pun saat fit/prediksi: MemoryError, XGBoostError,
+# ValueError dari kombinasi parameter yang tidak valid, ...) dicatat di riwayat dan
+# tersingkir. Jika worker mati (BrokenProcessPool), pool dibuat ulang dan trial yang
+# terdampak diulang satu per satu; trial yang mematikan worker lagi dicatat gagal.
+#
+# Konfigurasi terbaik per target lalu dilatih ulang pada seluruh data train dan
+# dievaluasi di data test dengan model_compare.evaluate_model (R2, RMSE, latensi satu
+# baris, ukuran model). Jika baseline diberikan (mis. RandomForest default), baseline
+# dilatih dan dinilai pada split fit/validasi yang sama dengan pencarian, dan hasil
+# tuning hanya dipakai bila R2 validasinya lebih tinggi. Data test hanya dipakai untuk
+# laporan akhir, tidak untuk memilih model.
+
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import r2_score
+from sklearn.model_selection import ParameterSampler, train_test_split
+
+from model_compare import _init_worker, _with_threads, _worker_data, evaluate_model
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    from xgboost import XGBRegressor
+except ImportError:
+    XGBRegressor = None
+
+try:
+    from lightgbm import LGBMRegressor
+except ImportError:
+    LGBMRegressor = None
+
+
+N_CANDIDATES = 8
+ETA = 3
+MIN_RESOURCE = 25
+MAX_RESOURCE = 400
+TIME_BUDGET = 600
+VALIDATION_SIZE = 0.2
+
+# {nama: (kelas estimator, parameter tetap, ruang pencarian)}; n_estimators adalah resource
+SEARCH_SPACES = {
+    "Random Forest": (RandomForestRegressor, {"random_state": 42}, {
+        "max_depth": [None, 10, 20, 30],
+        "min_samples_leaf": [1, 2, 4, 8],
+        "max_features": [1.0, 0.5, 0.3, "sqrt"],
+        "max_samples": [None, 0.8, 0.5],
+    }),
+    "XGBoost": (XGBRegressor, {"random_state": 42}, {
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+        "max_depth": [4, 6, 8, 10],
+        "min_child_weight": [1, 3, 5],
+        "subsample": [0.7, 0.85, 1.0],
+        "colsample_bytree": [0.5, 0.7, 1.0],
+    }),
+    "LightGBM": (LGBMRegressor, {"random_state": 42, "verbose": -1, "subsample_freq": 1}, {
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+        "num_leaves": [15, 31, 63, 127],
+        "min_child_samples": [5, 10, 20, 40],
+        "subsample": [0.7, 0.85, 1.0],
+        "colsample_bytree": [0.5, 0.7, 1.0],
+    }),
+}
+
+
+def available_spaces():
+    """Ruang pencarian yang library-nya terpasang."""
+    return {name: space for name, space in SEARCH_SPACES.items() if space[0] is not None}
+
+
+def sample_candidates(spaces, n_candidates=N_CANDIDATES, random_state=42):
+    """Daftar (nama model, params) acak, n_candidates per model."""
+    candidates = []
+    for name, (_, _, space) in spaces.items():
+        for params in ParameterSampler(space, n_candidates, random_state=random_state):
+            candidates.append((name, params))
+    return candidates
+
+
+def build_model(spaces, name, params, n_estimators):
+    estimator, fixed, _ = spaces[name]
+    return estimator(**fixed, **params, n_estimators=n_estimators)
+
+
+def _init_trial_worker(data_dir, memory_limit):
+    _init_worker(data_dir)
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_DATA, (memory_limit, memory_limit))
+
+
+def _run_trial(model, target_index):
+    """Fit pada split fit, R2 pada split validasi (matriks worker)."""
+    start = time.perf_counter()
+    try:
+        model.fit(_worker_data["X_train"], _worker_data["y_train"][:, target_index])
+        score = r2_score(_worker_data["y_test"][:, target_index], model.predict(_worker_data["X_test"]))
+        error = None
+    except Exception as e:
+        # Kegagalan satu trial dicatat sebagai trial gagal, bukan menghentikan pencarian
+        score, error = -np.inf, f"{type(e).__name__}: {e}"
+    return score, time.perf_counter() - start, error
+
+
+class _TrialPool:
+    """
+    ProcessPoolExecutor untuk trial yang worker-nya bisa dihentikan paksa.
+    shutdown(cancel_futures=True) hanya membatalkan trial yang masih antre, jadi proses
+    worker (anak proses yang muncul setelah pool dibuat) di-terminate langsung.
+    """
+
+    def __init__(self, max_workers, initargs):
+        self.max_workers = max_workers
+        self.initargs = initargs
+        self._other_children = set(multiprocessing.active_children())
+        self.executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_trial_worker,
+                                            initargs=initargs)
+
+    def submit(self, *args):
+        return self.executor.submit(*args)
+
+    def restart(self):
+        self.terminate()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=_init_trial_worker,
+                                            initargs=self.initargs)
+
+    def terminate(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        workers = set(multiprocessing.active_children()) - self._other_children
+        for process in workers:
+            process.terminate()
+        for process in workers:
+            process.join()
+
+
+def _run_rung(pool, jobs, deadline):
+    """
+    Jalankan trial satu ronde (jobs: key -> (model, target_index)) sampai selesai atau
+    deadline. Jika worker mati, pool dibuat ulang dan sisa trial dijalankan satu per satu,
+    sehingga hanya trial penyebabnya yang tercatat gagal.
+    Return: (hasil per key, jumlah trial yang belum selesai).
+    """
+    results, queue, serial = {}, [], False
+    futures = {pool.submit(_run_trial, *job): key for key, job in jobs.items()}
+    while futures or queue:
+        if not futures:
+            key = queue.pop(0)
+            futures = {pool.submit(_run_trial, *jobs[key]): key}
+        done, _ = wait(futures, timeout=max(0.0, deadline - time.perf_counter()), return_when=FIRST_COMPLETED)
+        if not done:
+            break
+        broken = False
+        for future in done:
+            key = futures.pop(future)
+            try:
+                results[key] = future.result()
+            except BrokenProcessPool:
+                broken = True
+                if serial:
+                    results[key] = (-np.inf, 0.0, "BrokenProcessPool")
+                else:
+                    queue.append(key)
+        if broken:
+            pool.restart()
+            for future, key in futures.items():
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    results[key] = future.result()
+                else:
+                    queue.append(key)
+            if not serial:
+                print(f"Worker berhenti mendadak: pool dibuat ulang, {len(queue)} trial diulang satu per satu")
+            futures, serial = {}, True
+    return results, len(futures) + len(queue)
+
+
+def _save_matrices(data_dir, arrays):
+    for name, array in arrays.items():
+        np.save(os.path.join(data_dir, name + ".npy"), np.ascontiguousarray(array, dtype=np.float64))
+
+
+def _validation_split(n_rows, validation_size=VALIDATION_SIZE, random_state=42):
+    """Indeks (fit, validasi) di dalam data train; sama untuk pencarian dan baseline."""
+    return train_test_split(np.arange(n_rows), test_size=validation_size, random_state=random_state)
+
+
+def successive_halving(Xt_train, y_train, targets, spaces=None, n_candidates=N_CANDIDATES, eta=ETA,
+                       min_resource=MIN_RESOURCE, max_resource=MAX_RESOURCE, time_budget=TIME_BUDGET,
+                       memory_budget_mb=None, max_workers=None, validation_size=VALIDATION_SIZE,
+                       random_state=42):
+    """
+    Successive halving per target di atas matriks train hasil prepare_matrices.
+    Split validasi diambil dari Xt_train (data test tidak disentuh).
+
+    Kandidat yang tersisa terus naik ronde sampai max_resource atau anggaran habis.
+    Mengembalikan (best, history): best = {target: (nama model, params, n_estimators,
+    R2 validasi)}, history = DataFrame semua trial (Target, Candidate, Model, Params,
+    Rung, N_Estimators, R2_Val, Fit_s, Error).
+    """
+    spaces = available_spaces() if spaces is None else spaces
+    targets = list(targets)
+    start = time.perf_counter()
+    deadline = start + time_budget
+
+    fit_idx, val_idx = _validation_split(len(Xt_train), validation_size, random_state)
+    y_values = y_train[targets].to_numpy(dtype=np.float64)
+
+    candidates = sample_candidates(spaces, n_candidates, random_state)
+    brackets = {target: list(range(len(candidates))) for target in targets}
+    scores, fit_times = {}, {}
+    history = []
+
+    max_workers = min(max_workers or os.cpu_count(), len(candidates) * len(targets))
+    threads_per_task = max(1, os.cpu_count() // max_workers)
+    memory_limit = int(memory_budget_mb * 2**20 / max_workers) if memory_budget_mb else None
+
+    data_dir = tempfile.mkdtemp(prefix="tumbuh_tuning_")
+    pool = None
+    try:
+        _save_matrices(data_dir, {
+            "X_train": Xt_train[fit_idx], "X_test": Xt_train[val_idx],
+            "y_train": y_values[fit_idx], "y_test": y_values[val_idx],
+        })
+        pool = _TrialPool(max_workers, (data_dir, memory_limit))
+
+        rung, resource_now, rung_cost = 0, min_resource, None
+        while True:
+            # Perkiraan waktu ronde ini dari waktu fit ronde sebelumnya
+            if rung_cost is not None:
+                remaining = deadline - time.perf_counter()
+                if rung_cost / max_workers > remaining:
+                    print(f"Anggaran waktu: ronde {rung} ({resource_now} pohon) dilewati, "
+                          f"perkiraan {rung_cost / max_workers:.0f} s > sisa {remaining:.0f} s")
+                    break
+
+            jobs = {}
+            for target in targets:
+                for i in brackets[target]:
+                    name, params = candidates[i]
+                    model = _with_threads(build_model(spaces, name, params, resource_now), threads_per_task)
+                    jobs[(target, i)] = (model, targets.index(target))
+            results, unfinished = _run_rung(pool, jobs, deadline)
+            for (target, i), (score, fit_s, error) in results.items():
+                scores[(target, i)] = score
+                fit_times[(target, i)] = fit_s
+                history.append({
+                    "Target": target, "Candidate": i, "Model": candidates[i][0], "Params": candidates[i][1],
+                    "Rung": rung, "N_Estimators": resource_now, "R2_Val": score, "Fit_s": fit_s, "Error": error,
+                })
+            if unfinished:
+                print(f"Anggaran waktu habis di ronde {rung}: {unfinished} trial diabaikan")
+                break
+
+            # Hanya 1/eta terbaik per target yang lanjut, dengan pohon eta kali lebih banyak
+            next_resource = min(resource_now * eta, max_resource)
+            if next_resource == resource_now:
+                break
+            rung_cost = 0.0
+            for target in targets:
+                # Trial yang gagal (Error terisi) tidak ikut naik ronde
+                ranked = sorted((i for i in brackets[target] if np.isfinite(scores[(target, i)])),
+                                key=lambda i: scores[(target, i)], reverse=True)
+                brackets[target] = ranked[:max(1, math.ceil(len(ranked) / eta))]
+                rung_cost += sum(fit_times[(target, i)] for i in brackets[target]) * next_resource / resource_now
+            if not any(brackets.values()):
+                break
+            rung, resource_now = rung + 1, next_resource
+    finally:
+        if pool is not None:
+            pool.terminate()
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    # Pemenang = kandidat terbaik di ronde tertinggi yang punya trial berhasil;
+    # n_estimators = ronde dengan R2 validasi tertinggi bagi kandidat itu (boosting bisa
+    # overfit dengan pohon lebih banyak, dan ronde yang gagal karena memori terlewati)
+    history = pd.DataFrame(history)
+    best = {}
+    for target in targets:
+        if history.empty:
+            break
+        ok = history[(history["Target"] == target) & np.isfinite(history["R2_Val"])]
+        if ok.empty:
+            continue
+        last = ok[ok["Rung"] == ok["Rung"].max()]
+        i = last.loc[last["R2_Val"].idxmax(), "Candidate"]
+        trials = ok[ok["Candidate"] == i]
+        top = trials.loc[trials["R2_Val"].idxmax()]
+        name, params = candidates[i]
+        best[target] = (name, params, int(top["N_Estimators"]), float(top["R2_Val"]))
+    print(f"Pencarian selesai dalam {time.perf_counter() - start:.1f} s ({len(history)} trial)")
+    return best, history
+
+
+def tune_models(Xt_train, Xt_test, y_train, y_test, targets, spaces=None, baseline=None, **search_kwargs):
+    """
+    Successive halving lalu fit ulang konfigurasi terbaik per target pada seluruh data
+    train (semua core, satu target per kali). Mengembalikan (summary, models, history):
+    summary = DataFrame Target, Model, Params, N_Estimators, R2_Val, R2_Score, RMSE,
+    Fit_s, Predict_1_Row_ms, Predict_Test_s, Size_MB (metrik dari data test);
+    models = {target: estimator fitted}.
+    Jika baseline diberikan, clone-nya dinilai pada split validasi pencarian (kolom
+    R2_Val_Baseline) dan models[target] berisi baseline kecuali R2_Val hasil tuning lebih
+    tinggi (kolom Dipakai). R2_Baseline (data test) hanya untuk laporan.
+    """
+    spaces = available_spaces() if spaces is None else spaces
+    targets = list(targets)
+    best, history = successive_halving(Xt_train, y_train, targets, spaces=spaces, **search_kwargs)
+    fit_idx, val_idx = _validation_split(len(Xt_train), search_kwargs.get("validation_size", VALIDATION_SIZE),
+                                         search_kwargs.get("random_state", 42))
+
+    y_train_values = y_train[targets].to_numpy(dtype=np.float64)
+    y_test_values = y_test[targets].to_numpy(dtype=np.float64)
+    models, rows = {}, []
+    for target, (name, params, n_estimators, score) in best.items():
+        model = _with_threads(build_model(spaces, name, params, n_estimators), -1)
+        metrics = evaluate_model(model, targets.index(target), Xt_train, Xt_test, y_train_values, y_test_values)
+        row = {"Target": target, "Model": name, "Params": params, "N_Estimators": n_estimators,
+               "R2_Val": score, **metrics}
+        models[target] = model
+        if baseline is not None:
+            y_target = y_train_values[:, targets.index(target)]
+            baseline_val = clone(baseline).fit(Xt_train[fit_idx], y_target[fit_idx])
+            row["R2_Val_Baseline"] = r2_score(y_target[val_idx], baseline_val.predict(Xt_train[val_idx]))
+            baseline_model = clone(baseline)
+            row["R2_Baseline"] = evaluate_model(baseline_model, targets.index(target), Xt_train, Xt_test,
+                                                y_train_values, y_test_values)["R2_Score"]
+            row["Dipakai"] = "tuning" if score > row["R2_Val_Baseline"] else "baseline"
+            if row["Dipakai"] == "baseline":
+                models[target] = baseline_model
+        rows.append(row)
+    return pd.DataFrame(rows), models, history